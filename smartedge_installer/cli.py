@@ -1,26 +1,315 @@
-from smartedge_installer.constants import ROLE_CHOICES
-from smartedge_installer.core.coordinator import CoordinatorInstaller
-from smartedge_installer.core.access_point import AccessPointInstaller
-from smartedge_installer.core.node import NodeInstaller
+import argparse
+from smartedge_installer.constants import ROLE_ALIASES, ROLE_CHOICES
+from smartedge_installer.core.roles import all_roles, get_role, role_for_installer
 
-def main():
+# Only argparse and the role table are imported up front: installer modules (and the logging
+# backend) load when a command needs them, so --help and status return almost instantly.
+
+
+def resolve_role(value):
+    role = get_role(value)
+    if role is None:
+        raise argparse.ArgumentTypeError(
+            f"invalid role '{value}' (choose from {', '.join(list(ROLE_ALIASES) + list(ROLE_CHOICES))})"
+        )
+    return role
+
+
+def add_install_options(parser, suppress_defaults=False):
+    # Accepted both before and after "install"; the subcommand copy must not reset values given before it
+    defaults = {"default": argparse.SUPPRESS} if suppress_defaults else {}
+    parser.add_argument("--bundle", metavar="PATH", **defaults,
+                        help="install offline from a bundle created with the 'bundle' command")
+    parser.add_argument("--force", action="store_true", **defaults,
+                        help="re-run every step, even if its inputs are unchanged since the last run")
+    parser.add_argument("--inventory", metavar="FILE", **defaults,
+                        help="headless mode: read this host's role and settings from a TOML/YAML/JSON inventory")
+    parser.add_argument("--host", **defaults, help="inventory entry to use (default: this machine's hostname)")
+    parser.add_argument("--registry-mirror", metavar="URL", **defaults,
+                        help="pull Docker Hub images through this mirror, e.g. http://10.0.0.1:5000")
+    parser.add_argument("--serve-registry-mirror", action="store_true", **defaults,
+                        help="run a pull-through Docker Hub cache on this machine for the rest of the LAN")
+    parser.add_argument("--resume", action="store_true", **defaults,
+                        help="after a failed run: skip every step that already completed and run the rest")
+    parser.add_argument("--rollback", action="store_true", **defaults,
+                        help="undo what earlier runs changed (packages, builds, venv, interfaces, containers)")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="smartedge-installer", description="SmartEdge Installer",
+                                     epilog="Without a command, installs a role (same as 'install').")
+    add_install_options(parser)
+    parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"], type=str.upper,
+                        help="console log level (default: $SMARTEDGE_LOG_LEVEL or DEBUG); "
+                             "the per-run log file always keeps everything")
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND")
+
+    install_parser = subparsers.add_parser("install", help="install a role on this machine (the default)")
+    install_parser.add_argument("--role", type=resolve_role, help="co, ap or sn (default: ask, or the inventory's)")
+    add_install_options(install_parser, suppress_defaults=True)
+
+    plan_parser = subparsers.add_parser("plan", help="dry run: show what an installation would still do here")
+    plan_parser.add_argument("--role", type=resolve_role, help="co, ap or sn (default: the inventory's)")
+    plan_parser.add_argument("--reports", metavar="DIR",
+                             help="run reports to estimate durations from (default: this machine's)")
+    plan_parser.add_argument("--json", action="store_true", help="machine-readable output")
+    add_install_options(plan_parser, suppress_defaults=True)
+
+    probe_parser = subparsers.add_parser("probe", help="check within a second whether this machine can take a role")
+    probe_parser.add_argument("--role", type=resolve_role, help="co, ap or sn (default: the inventory's)")
+    probe_parser.add_argument("--json", action="store_true", help="machine-readable output")
+    add_install_options(probe_parser, suppress_defaults=True)
+
+    status_parser = subparsers.add_parser("status", help="show what earlier runs installed on this machine")
+    status_parser.add_argument("--json", action="store_true", help="machine-readable output")
+
+    bundle_parser = subparsers.add_parser("bundle", help="download everything a role needs into one archive")
+    bundle_parser.add_argument("--role", required=True, type=resolve_role, help="co, ap or sn")
+    bundle_parser.add_argument("--output", help="archive path (default: smartedge-<role>-bundle.tar)")
+
+    export_parser = subparsers.add_parser("export", help="capture this machine's installed role as a snapshot")
+    export_parser.add_argument("--role", required=True, type=resolve_role, help="co, ap or sn")
+    export_parser.add_argument("--output", default="smartedge-snapshots", metavar="DIR",
+                               help="snapshot store; unchanged content is shared with its earlier snapshots "
+                                    "(default: smartedge-snapshots)")
+
+    import_parser = subparsers.add_parser("import", help="install a role from a snapshot taken with 'export'")
+    import_parser.add_argument("snapshot", help="snapshot manifest, or a store directory (its newest snapshot)")
+    import_parser.add_argument("--role", type=resolve_role, help="newest snapshot of this role in the store")
+    add_install_options(import_parser, suppress_defaults=True)
+
+    bench_parser = subparsers.add_parser("bench", help="measure whether an installed role performs well enough")
+    bench_parser.add_argument("--role", required=True, type=resolve_role, help="co, ap or sn")
+    bench_parser.add_argument("--thresholds", metavar="FILE",
+                              help='JSON pass/fail limits, e.g. {"bmv2_forwarding_pps": {"min": 20000}}')
+
+    subparsers.add_parser("pin-images", help="pin every role's Docker images to their current digests")
+
+    orchestrate_parser = subparsers.add_parser("orchestrate", help="provision every host of an inventory concurrently")
+    orchestrate_parser.add_argument("--inventory", required=True, metavar="FILE", dest="fleet_inventory")
+    orchestrate_parser.add_argument("--hosts", nargs="+", metavar="NAME", help="only provision these hosts")
+    orchestrate_parser.add_argument("--transport", choices=["ssh", "container"], default="ssh",
+                                    help="'container' provisions local Docker containers as stand-in hosts")
+    orchestrate_parser.add_argument("--concurrency", type=int, default=4, help="hosts provisioned at once")
+    return parser
+
+
+def prompt_for_role():
     print("\n🧠 SmartEdge Installer\n")
     print("Please select the role for this machine:\n")
-    for key, label in ROLE_CHOICES.items():
-        print(f"{key}. {label}")
-    
-    choice = input("\nEnter the number of the role to install: ").strip()
-    
-    installer = None
-    if choice == "1":
-        installer = CoordinatorInstaller()
-    elif choice == "2":
-        installer = AccessPointInstaller()
-    elif choice == "3":
-        installer = NodeInstaller()
-    else:
-        print("❌ Invalid choice. Exiting.")
+    for role in all_roles():
+        print(f"{role.choice}. {role.label}")
+
+    return get_role(input("\nEnter the number of the role to install: ").strip())
+
+
+def run_status(args):
+    import json
+    from smartedge_installer.core.status import collect_status, format_status
+    status = collect_status()
+    print(json.dumps(status, indent=2) if args.json else format_status(status))
+
+
+def run_bundle(args):
+    from smartedge_installer.core.bundle import create_bundle
+    create_bundle(args.role.installer(), args.output or f"smartedge-{args.role.alias}-bundle.tar")
+
+
+def run_export(args):
+    from smartedge_installer.core.snapshot import SnapshotError, export_snapshot
+    try:
+        export_snapshot(args.role.installer(), args.output)
+    except SnapshotError as e:
+        print(f"❌ Cannot export: {e}")
+        raise SystemExit(1)
+
+
+def run_import(args):
+    from smartedge_installer.core.snapshot import Snapshot, SnapshotError
+    from smartedge_installer.utils import logger as log_backend
+    if args.bundle:
+        print("❌ import installs from the snapshot; it cannot be combined with --bundle.")
+        raise SystemExit(2)
+    host = load_host(args)
+    try:
+        snapshot = Snapshot.open(args.snapshot, args.role.alias if args.role else None)
+        role = get_role(snapshot.alias)
+        if host and get_role(host.role) is not role:
+            raise SnapshotError(f"the inventory gives this host role {host.role}, the snapshot is {snapshot.alias}")
+        bundle = snapshot.restore(role.installer())
+    except (OSError, ValueError, SnapshotError) as e:
+        print(f"❌ Cannot import {args.snapshot}: {e}")
+        raise SystemExit(1)
+
+    installer = make_installer(role, host, args, bundle)
+    print(f"\n➡️  Importing {role.label} from {snapshot.manifest_path}")
+    installer.run()
+    problems = snapshot.verify(installer)
+    log_backend.flush()
+    if problems:
+        print("\n❌ This machine differs from the snapshot:")
+        print("\n".join(f"  - {problem}" for problem in problems))
+        raise SystemExit(1)
+    print(f"\n✅ This machine matches the snapshot of {snapshot.manifest['source_host']}.")
+
+
+def run_bench(args):
+    from smartedge_installer.core.benchmarks import BenchmarkSuite, load_thresholds
+    from smartedge_installer.utils import logger as log_backend
+    installer_cls = args.role.installer()
+    try:
+        thresholds = load_thresholds(args.thresholds)
+    except (OSError, ValueError) as e:
+        print(f"❌ Cannot read the thresholds file {args.thresholds}: {e}")
+        raise SystemExit(2)
+    suite = BenchmarkSuite(installer_cls.ROLE_ALIAS, installer_cls.BENCHMARKS, thresholds)
+    suite.run()
+    log_backend.flush()
+    print("\n" + suite.summary_table() + "\n")
+    suite.write_report()
+    if not suite.passed:
+        raise SystemExit(1)
+
+
+def run_pin_images(args):
+    from smartedge_installer.core.registry import ImageLock, pin_images
+    images = sorted({image for role in all_roles() for image in role.installer().DOCKER_IMAGES})
+    lock = ImageLock()
+    pin_images(images, lock)
+    print(f"📌 Pinned {len(images)} image(s) in {lock.path}")
+
+
+def run_orchestrate(args):
+    from smartedge_installer.core.inventory import Inventory, InventoryError
+    from smartedge_installer.core.orchestrator import Orchestrator
+    installer_args = ["--force"] if args.force else []
+    try:
+        inventory = Inventory.load(args.fleet_inventory)
+        # Unknown --hosts names fail here, before any host is touched
+        for name in args.hosts or ():
+            inventory.host(name)
+    except (OSError, InventoryError) as e:
+        print(f"❌ {e}")
+        raise SystemExit(2)
+    orchestrator = Orchestrator(inventory, transport=args.transport, concurrency=args.concurrency,
+                                installer_args=installer_args)
+    results = orchestrator.run(args.hosts)
+    if not all(result.ok for result in results):
+        raise SystemExit(1)
+
+
+def load_host(args):
+    if not args.inventory:
+        return None
+    from smartedge_installer.core.inventory import Inventory, InventoryError
+    try:
+        return Inventory.load(args.inventory).host(args.host)
+    except (OSError, InventoryError) as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
+
+
+def make_installer(role, host, args, bundle=None):
+    try:
+        if args.bundle:
+            from smartedge_installer.core.bundle import OfflineBundle
+            bundle = OfflineBundle(args.bundle)
+
+        return role.installer()(bundle=bundle, force=args.force, host=host,
+                                registry_mirror=args.registry_mirror,
+                                serve_registry_mirror=args.serve_registry_mirror,
+                                resume=args.resume)
+    except ValueError as e:
+        # A bundle of another format or for another role
+        print(f"❌ {e}")
+        raise SystemExit(2)
+
+
+def last_installed_role():
+    import json
+    from smartedge_installer.constants import JOURNAL_FILE
+    try:
+        with open(JOURNAL_FILE) as f:
+            return role_for_installer(json.load(f).get("last_role"))
+    except (OSError, ValueError):
+        return None
+
+
+def run_plan(args):
+    import json
+    from smartedge_installer.constants import REPORTS_DIR
+    from smartedge_installer.core.planner import InstallPlan
+    from smartedge_installer.utils import logger as log_backend
+    host = load_host(args)
+    role = get_role(host.role) if host else args.role
+    if role is None:
+        print("❌ plan needs --role (or --inventory).")
+        raise SystemExit(2)
+    plan = InstallPlan.build(make_installer(role, host, args), args.reports or REPORTS_DIR)
+    log_backend.flush()
+    print(json.dumps(plan.report(), indent=2) if args.json else plan.format())
+
+
+def run_probe(args):
+    import json
+    from smartedge_installer.core.probes import ReadinessReport
+    from smartedge_installer.utils import logger as log_backend
+    host = load_host(args)
+    role = get_role(host.role) if host else args.role
+    if role is None:
+        print("❌ probe needs --role (or --inventory).")
+        raise SystemExit(2)
+    readiness = ReadinessReport.run(make_installer(role, host, args))
+    log_backend.flush()
+    print(json.dumps(readiness.report(), indent=2) if args.json else readiness.summary_table())
+    if not readiness.ready:
+        raise SystemExit(1)
+
+
+def run_install(args):
+    if args.resume and (args.force or args.rollback):
+        print("❌ --resume cannot be combined with --force or --rollback.")
+        raise SystemExit(2)
+    host = load_host(args)
+    role = get_role(host.role) if host else getattr(args, "role", None)
+    if args.rollback:
+        role = role or last_installed_role()
+        if role is None:
+            print("❌ Nothing was installed on this machine yet; pass --role to roll back a specific role.")
+            raise SystemExit(1)
+        print(f"\n↩️  Rolling back: {role.label}")
+        make_installer(role, host, args).rollback()
         return
+    if role is None:
+        role = prompt_for_role()
+        if role is None:
+            print("❌ Invalid choice. Exiting.")
+            return
+
+    installer = make_installer(role, host, args)
 
-    print(f"\n➡️  Starting installation for: {ROLE_CHOICES[choice]}")
+    print(f"\n➡️  Starting installation for: {role.label}")
     installer.run()
+
+
+COMMANDS = {
+    None: run_install,
+    "install": run_install,
+    "plan": run_plan,
+    "probe": run_probe,
+    "status": run_status,
+    "bundle": run_bundle,
+    "export": run_export,
+    "import": run_import,
+    "bench": run_bench,
+    "pin-images": run_pin_images,
+    "orchestrate": run_orchestrate,
+}
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.log_level:
+        from smartedge_installer.utils import logger as log_backend
+        log_backend.set_level(args.log_level)
+    COMMANDS[args.command](args)
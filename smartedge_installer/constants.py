@@ -1,5 +1,36 @@
-ROLE_CHOICES = {
-    "1": "Coordinator",
-    "2": "Access Point",
-    "3": "Node",
-}
+import os
+
+# Every role: menu number, short name (command line and run.sh), label and its installer class.
+# Installer modules are only imported once their role is selected (see core/roles.py).
+ROLES = (
+    ("1", "co", "Coordinator", "smartedge_installer.core.coordinator:CoordinatorInstaller"),
+    ("2", "ap", "Access Point", "smartedge_installer.core.access_point:AccessPointInstaller"),
+    ("3", "sn", "Node", "smartedge_installer.core.node:NodeInstaller"),
+)
+
+ROLE_CHOICES = {choice: label for choice, _, label, _ in ROLES}
+
+# Short role names used on the command line and by run.sh
+ROLE_ALIASES = {alias: choice for choice, alias, _, _ in ROLES}
+
+PROGRAM_DIR = os.path.expanduser("~/smartedge_program")
+VENV_DIR = os.path.join(PROGRAM_DIR, ".venv")
+JOURNAL_FILE = os.path.join(PROGRAM_DIR, ".installer_state.json")
+REPORTS_DIR = os.path.join(PROGRAM_DIR, ".installer_reports")
+LOG_DIR = os.path.join(PROGRAM_DIR, ".installer_logs")
+# File manifests and interface records that undo actions in the journal refer to
+UNDO_DIR = os.path.join(PROGRAM_DIR, ".installer_undo")
+PROGRAM_REPO_URL = "https://github.com/zoxerus/smartedge.git"
+INSTALLER_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REQUIREMENTS_DIR = os.path.join(INSTALLER_ROOT, "smartedge_installer", "requirements")
+
+
+def _default_cache_dir():
+    # A cache/ folder shipped next to the installer (e.g. on the USB stick) wins over the local one
+    bundled = os.path.join(INSTALLER_ROOT, "cache")
+    if os.path.isdir(bundled):
+        return bundled
+    return os.path.expanduser("~/.cache/smartedge")
+
+
+CACHE_DIR = os.environ.get("SMARTEDGE_CACHE_DIR") or _default_cache_dir()
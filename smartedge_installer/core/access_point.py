@@ -1,77 +1,83 @@
 from smartedge_installer.core.base_installer import BaseInstaller
+from smartedge_installer.core.benchmarks import bench_bmv2
+from smartedge_installer.core.probes import PROBE_DOCKER_REGISTRY, probe_docker_daemon, probe_wireless_ap_mode
+from smartedge_installer.core.scheduler import Step
 import subprocess
 import os
 import shutil
-import venv
+from smartedge_installer.constants import PROGRAM_DIR, REQUIREMENTS_DIR
 from smartedge_installer.utils.logger import get_logger
+from smartedge_installer.utils.runner import query, run_command
 
 logger = get_logger("AccessPointInstaller")
 
-PROGRAM_DIR = os.path.expanduser("~/smartedge_program")
 VENV_DIR = os.path.join(PROGRAM_DIR, ".venv")
-REQUIREMENTS_FILE = os.path.expanduser("~/setup_smartedge/smartedge_installer/requirements/access_point.txt")
+REQUIREMENTS_FILE = os.path.join(REQUIREMENTS_DIR, "access_point.txt")
+APT_PACKAGES = ["docker.io", "net-tools", "screen", "python3-pip", "python3-venv", "iproute2"]
 LOOPBACK_ALIAS = "127.1.0.3"
 
 
+def container_ids():
+    result = query(["sudo", "docker", "ps", "-aq", "--no-trunc"])
+    return set(result.stdout.split())
+
+
 class AccessPointInstaller(BaseInstaller):
-    def __init__(self):
-        super().__init__()
+    DOCKER_IMAGES = ["p4lang/behavioral-model"]
+    REQUIREMENTS_FILE = REQUIREMENTS_FILE
+    ROLE_ALIAS = "ap"
+    BENCHMARKS = (bench_bmv2,)
+    LOOPBACK_ALIAS = LOOPBACK_ALIAS
+    PROBES = BaseInstaller.PROBES + (probe_wireless_ap_mode, probe_docker_daemon, PROBE_DOCKER_REGISTRY)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
         logger.info("AccessPointInstaller: Initialized.")
 
-    def run(self):
-        print("\n➡️  Starting installation for: Access Point")
-        self.pre_checks()
-        self.install_dependencies()
-        self.setup_virtualenv_and_install_python_deps()
-        self.configure_network()
-        self.validate_installation()
-        logger.info("AccessPointInstaller: ✅ Installation completed successfully.")
+    def steps(self):
+        return [
+            Step("pre_checks", self.pre_checks),
+            self.program_repo_step(),
+            Step("apt_packages", self.install_planned_packages, ["pre_checks"],
+                 apt_packages=APT_PACKAGES, inputs=self.apt_inputs, check=self.check_apt),
+            Step("registry_mirror", self.setup_registry_mirror, ["apt_packages"]),
+            Step("pull_bmv2", self.pull_bmv2_image, ["registry_mirror"],
+                 inputs=lambda: self.image_inputs("p4lang/behavioral-model"),
+                 check=lambda: self.check_image("p4lang/behavioral-model", tag="bmv2se")),
+            Step("python_venv", self.setup_virtualenv_and_install_python_deps, ["apt_packages"],
+                 inputs=self.venv_inputs, check=self.check_venv),
+            Step("configure_network", self.configure_network, ["python_venv"], exclusive=True,
+                 inputs=self.network_inputs, check=self.check_network),
+            Step("validate_installation", self.validate_installation,
+                 ["pull_bmv2", "configure_network", "program_repo"], exclusive=True),
+        ]
 
     def pre_checks(self):
         self.logger.info("Running pre-checks for Access Point...")
-        self.check_ubuntu_version()
-        self.check_disk_space(min_gb=2)
+        self.check_readiness()
 
     def install_dependencies(self):
         self.logger.info("Installing dependencies for Access Point...")
-        subprocess.run(["sudo", "apt-get", "install", "-y", "docker.io"])
-        subprocess.run(["sudo", "docker", "pull", "p4lang/behavioral-model"])
-        subprocess.run(["sudo", "docker", "tag", "p4lang/behavioral-model", "bmv2se"])
-        subprocess.run(["sudo", "apt-get", "install", "-y", "net-tools"])
-        apt_packages = [
-            "net-tools", "screen", "python3-pip", "python3-venv", "iproute2"
-        ]
-        self.install_apt_dependencies(apt_packages)
+        self.install_planned_packages()
+        self.pull_bmv2_image()
 
-    def setup_virtualenv_and_install_python_deps(self):
-        self.logger.info("Setting up virtual environment for Access Point...")
-        if not os.path.exists(VENV_DIR):
-            venv.create(VENV_DIR, with_pip=True)
-        pip_path = os.path.join(VENV_DIR, "bin", "pip")
-        subprocess.run([pip_path, "install", "--upgrade", "pip"])
-        subprocess.run([pip_path, "install", "-r", REQUIREMENTS_FILE], check=True)
+    def pull_bmv2_image(self):
+        self.pull_docker_image("p4lang/behavioral-model", tag="bmv2se")
 
     def configure_network(self):
         self.logger.info("Configuring network for Access Point...")
-        venv_python = os.path.expanduser("~/smartedge_program/.venv/bin/python")
-        script_path = os.path.expanduser("~/setup_smartedge/smartedge_installer/scripts/wireless_interface_prompt.py")
-        subprocess.run([venv_python, script_path])
-        try:
-            subprocess.run([
-                "sudo", "ip", "addr", "add", f"{LOOPBACK_ALIAS}/32",
-                "dev", "lo", "label", "lo:0"
-            ], check=True)
-            self.logger.info("Loopback alias lo:0 assigned.")
-        except subprocess.CalledProcessError as e:
-            self.logger.warning(f"Loopback alias already exists or failed to add: {e}")
+        self.run_interface_script("wireless_interface_prompt", self.INTERFACE_NAMES)
+
+    def validation_problems(self):
+        return [] if os.path.exists(VENV_DIR) else ["Virtual environment is missing!"]
 
     def validate_installation(self):
         self.logger.info("Validating Access Point setup...")
-        if os.path.exists(VENV_DIR):
-            self.logger.info("Virtual environment is present.")
-        else:
-            self.logger.error("Virtual environment is missing!")
+        problems = self.validation_problems()
+        if problems:
+            self.logger.error(problems[0])
             raise FileNotFoundError(".venv not found")
+        self.logger.info("Virtual environment is present.")
 
         if os.path.exists(REQUIREMENTS_FILE):
             self.logger.info("Requirements file is present.")
@@ -82,10 +88,17 @@ class AccessPointInstaller(BaseInstaller):
         if os.path.exists(bmv2_script_path):
             self.logger.info("Launching BMv2 Docker container...")
             try:
-                subprocess.run(["chmod", "+x", bmv2_script_path], check=True)
-                subprocess.run(["bash", bmv2_script_path], check=True)
+                run_command(["chmod", "+x", bmv2_script_path], "bmv2")
+                before = container_ids()
+                try:
+                    # The script's docker run may attach to the terminal
+                    run_command(["bash", bmv2_script_path], "bmv2", interactive=True)
+                finally:
+                    started = sorted(container_ids() - before)
+                    if started:
+                        self.record_undo("containers", ids=started)
                 self.logger.info("✅ BMv2 container launched successfully.")
-            except subprocess.CalledProcessError as e:
+            except subprocess.SubprocessError as e:
                 self.logger.error(f"❌ Failed to launch BMv2 container: {e}")
         else:
             self.logger.warning(f"⚠️ BMv2 launch script not found at {bmv2_script_path}")
@@ -1,29 +1,312 @@
 import abc
+from smartedge_installer.constants import INSTALLER_ROOT, PROGRAM_DIR, UNDO_DIR, VENV_DIR
+from smartedge_installer.core.bootstrap import (
+    BOOTSTRAP_APT_PACKAGES, CLONED, enable_universe, fetch_program_repo, program_repo_state
+)
+from smartedge_installer.core.image_prefetch import ImagePrefetcher
+from smartedge_installer.core.journal import StateJournal
+from smartedge_installer.core.package_plan import PackagePlan
+from smartedge_installer.core.planner import Action, apt_download_bytes
+from smartedge_installer.core.probes import (
+    PROBE_PYPI, NotReadyError, ReadinessReport, probe_apt_mirror, probe_disk_space, probe_memory, probe_os_release,
+    probe_program_repo
+)
+from smartedge_installer.core.registry import (
+    ImageLock, MIRROR_PORT, configure_docker_mirror, pull_pinned, repo_digests, start_mirror
+)
+from smartedge_installer.core.scheduler import Step, StepScheduler, current_step
+from smartedge_installer.core.undo import rollback
+from smartedge_installer.core.venv_manager import COMPLETE_MARKER, VenvManager
+from smartedge_installer.utils.build_cache import file_sha256
+from smartedge_installer.utils.interfaces import link_file_path, loopback_unit_path, systemd_running
+from smartedge_installer.utils import logger as log_backend
 from smartedge_installer.utils.logger import get_logger
+from smartedge_installer.utils.profiler import RunProfiler
+from smartedge_installer.utils.runner import NETWORK_POLICY, query, run_command
+import json
 import platform
 import shutil
 import subprocess
 import os
+import time
 logger = get_logger("BaseInstaller")
 
 
+def docker_image_id(image):
+    try:
+        result = query(["sudo", "docker", "image", "inspect", "--format", "{{.Id}}", image])
+    except FileNotFoundError:
+        return None
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def interface_macs():
+    macs = {}
+    for name in sorted(os.listdir("/sys/class/net")):
+        try:
+            with open(f"/sys/class/net/{name}/address") as f:
+                macs[name] = f.read().strip()
+        except OSError:
+            macs[name] = None
+    return macs
+
+
+def loopback_alias_present(ip):
+    result = query(["ip", "-o", "-4", "addr", "show", "dev", "lo"])
+    return f" {ip}/32 " in result.stdout
+
+
+def boot_config_present(names, loopback_alias):
+    """Whether the .link file of each of names and the loopback alias unit exist (see utils.interfaces)"""
+    paths = [link_file_path(name) for name in names] + ([loopback_unit_path()] if loopback_alias else [])
+    return {path: os.path.exists(path) for path in paths}
+
 
 class BaseInstaller(abc.ABC):
-    def __init__(self):
+    # Everything the role needs besides its steps' apt packages, so it can be bundled for offline installs
+    SYSTEM_PIP_PACKAGES = []
+    DOCKER_IMAGES = []
+    # Post-install benchmarks (functions from core.benchmarks) run by the 'bench' command
+    BENCHMARKS = ()
+    REQUIREMENTS_FILE = None
+    LOOPBACK_ALIAS = None
+    # Interfaces the role renames by MAC address
+    INTERFACE_NAMES = ("wlan0", "eth0")
+    MIN_FREE_DISK_GB = 2
+    # Free RAM the role needs while installing (a compile job, or pip building wheels)
+    MIN_MEMORY_MB = 512
+    # Readiness probes (core.probes) run concurrently as the first step and by the 'probe' command
+    PROBES = (probe_os_release, probe_disk_space, probe_memory, probe_apt_mirror, PROBE_PYPI, probe_program_repo)
+    # Role argument for the artifact's run.sh
+    ROLE_ALIAS = None
+
+    def __init__(self, bundle=None, force=False, host=None, registry_mirror=None, serve_registry_mirror=False,
+                 resume=False):
         self.logger = get_logger(self.__class__.__name__)
+        if bundle and bundle.manifest.get("role") != self.__class__.__name__:
+            # Otherwise it only fails part way through, on the first missing wheel or image
+            raise ValueError(f"{bundle.path} was made for {bundle.manifest.get('role')}, "
+                             f"not for {self.__class__.__name__}")
+        self.bundle = bundle
+        # force=True re-runs every step even if the journal says its inputs are unchanged
+        self.force = force
+        # resume=True skips every step that completed in an earlier (failed) run
+        self.resume = resume
+        # An inventory HostConfig switches the installer to headless mode: it never prompts
+        self.host = host
+        if host and host.loopback_alias:
+            self.LOOPBACK_ALIAS = host.loopback_alias
+        extra = host.extra if host else {}
+        self.registry_mirror = (registry_mirror or extra.get("registry_mirror")
+                                or os.environ.get("SMARTEDGE_REGISTRY_MIRROR"))
+        self.serve_registry_mirror = serve_registry_mirror or bool(extra.get("serve_registry_mirror"))
+        self.image_lock = ImageLock()
+        self.prefetcher = ImagePrefetcher(self.fetch_docker_image)
+        self.journal = StateJournal()
         self.logger.info("Initialized installer.")
 
     def run(self):
+        role = self.__class__.__name__
+        profiler = RunProfiler(role)
+        profiler.start()
+        try:
+            self.logger.info(f"📝 Logging this run to {log_backend.start_run_log(role)}")
+        except OSError as e:
+            self.logger.warning(f"⚠️ Could not create the run log file: {e}")
+        if not self.uses_registry_mirror():
+            # Otherwise the mirror step starts it, once Docker pulls through the mirror
+            self.start_image_prefetch()
+        self.journal.start_run(role)
         try:
             self.logger.info("Starting installation sequence.")
-            self.pre_checks()
-            self.install_dependencies()
-            self.configure_network()
-            self.validate_installation()
+            StepScheduler(self.steps(), journal=self.journal, role=role, profiler=profiler,
+                          force=self.force, resume=self.resume).run()
+            self.journal.finish_run(role, "ok")
             self.logger.info("✅ Installation completed successfully.")
-        except Exception as e:
+        except (Exception, KeyboardInterrupt) as e:
+            self.journal.finish_run(role, "failed")
             self.logger.error(f"❌ Installation failed: {e}")
+            self.logger.info("ℹ️ Fix the problem and run again with --resume to continue after the last completed "
+                             "step, or with --rollback to undo what this installation changed.")
             raise
+        finally:
+            self.prefetcher.stop()
+            profiler.stop()
+            log_backend.flush()
+            print("\n" + profiler.summary_table() + "\n")
+            try:
+                profiler.write_report()
+            except OSError as e:
+                self.logger.warning(f"⚠️ Could not write the run report: {e}")
+
+    def rollback(self):
+        """Undo the changes recorded by earlier runs of this role (newest first)"""
+        failed = rollback(self.journal, self.__class__.__name__)
+        if failed:
+            self.logger.error(f"❌ {len(failed)} change(s) could not be undone; they stay in the journal "
+                              f"for the next --rollback.")
+            raise SystemExit(1)
+        self.logger.info("✅ Rollback completed.")
+
+    def record_undo(self, kind, **details):
+        """Journal how to revert a change the current step made"""
+        step = current_step()
+        if step is not None:
+            self.journal.add_undo(self.__class__.__name__, step, {"kind": kind, **details})
+
+    def undo_file(self, name):
+        os.makedirs(UNDO_DIR, exist_ok=True)
+        return os.path.join(UNDO_DIR, f"{self.__class__.__name__}-{current_step()}-{time.strftime('%Y%m%d-%H%M%S')}-{name}")
+
+    def record_new_files(self, files, dirs, root="/"):
+        """Before installing files and dirs (relative to root), remember the ones that do not exist yet"""
+        new_files = [path for path in files if not os.path.lexists(os.path.join(root, path))]
+        new_dirs = [path for path in dirs if not os.path.lexists(os.path.join(root, path))]
+        if not new_files and not new_dirs:
+            return
+        manifest = self.undo_file("files.json")
+        with open(manifest, "w") as f:
+            json.dump({"root": root, "files": new_files, "dirs": new_dirs}, f)
+        self.record_undo("files", manifest=manifest)
+
+    def steps(self):
+        """Declare the installation steps and the steps each one depends on"""
+        return [
+            Step("pre_checks", self.pre_checks),
+            self.program_repo_step(),
+            Step("install_dependencies", self.install_dependencies, ["pre_checks"]),
+            Step("configure_network", self.configure_network, ["install_dependencies"], exclusive=True),
+            Step("validate_installation", self.validate_installation, ["configure_network", "program_repo"],
+                 exclusive=True),
+        ]
+
+    def program_repo_step(self):
+        """Clones (or updates) the SmartEdge repository while the apt transaction is still running"""
+        return Step("program_repo", self.fetch_program_repo, ["pre_checks"], apt_packages=BOOTSTRAP_APT_PACKAGES,
+                    check=self.check_program_repo)
+
+    def package_plan(self):
+        plan = PackagePlan()
+        for step in self.steps():
+            plan.add(step.apt_packages)
+        return plan
+
+    def install_planned_packages(self):
+        """Install the apt packages of every step in a single transaction"""
+        # A newly enabled apt source needs fresh indexes, however recent the last apt-get update was
+        refresh = not self.bundle and enable_universe()
+        installed = self.install_apt_dependencies(self.package_plan().packages, refresh)
+        if installed:
+            self.record_undo("apt_packages", packages=installed)
+
+    def apt_inputs(self):
+        plan = self.package_plan()
+        return {"packages": sorted(plan.packages), "missing": plan.missing()}
+
+    def image_inputs(self, image):
+        return {"image": image, "image_id": docker_image_id(image), "pinned": self.image_lock.digest(image)}
+
+    def venv_inputs(self):
+        venv_python = os.path.join(VENV_DIR, "bin", "python")
+        return {
+            "requirements_sha256": file_sha256(self.REQUIREMENTS_FILE),
+            "python": platform.python_version(),
+            "venv_present": os.path.exists(venv_python),
+        }
+
+    def network_inputs(self):
+        return {
+            "interfaces": interface_macs(),
+            "requested_macs": self.host.interface_macs() if self.host else None,
+            "loopback_alias": self.LOOPBACK_ALIAS,
+            "loopback_alias_present": loopback_alias_present(self.LOOPBACK_ALIAS),
+            "boot_config": boot_config_present(self.INTERFACE_NAMES, self.LOOPBACK_ALIAS),
+        }
+
+    def plan_blockers(self):
+        """Problems that would stop an installation (failed readiness probes), for the planner"""
+        return [f"{result.probe.name}: {result.detail}" for result in ReadinessReport.run(self).failures]
+
+    def fetch_program_repo(self):
+        fetch_program_repo(self.bundle)
+
+    def check_program_repo(self):
+        if program_repo_state() == CLONED:
+            return []
+        return [Action(f"clone the SmartEdge repository into {PROGRAM_DIR}", 0 if self.bundle else None)]
+
+    def check_apt(self):
+        missing = self.package_plan().missing()
+        if not missing:
+            return []
+        size = 0 if self.bundle else apt_download_bytes(missing)
+        return [Action(f"install {len(missing)} apt package(s): {', '.join(missing)}", size)]
+
+    def missing_pip_packages(self, pip_packages):
+        result = query(["python3", "-m", "pip", "show"] + list(pip_packages))
+        installed = {line.split(":", 1)[1].strip().lower() for line in result.stdout.splitlines()
+                     if line.startswith("Name:")}
+        return [package for package in pip_packages if package.lower() not in installed]
+
+    def check_pip(self, pip_packages):
+        missing = self.missing_pip_packages(pip_packages)
+        return [Action(f"pip install {' '.join(missing)}")] if missing else []
+
+    def check_image(self, image, tag=None):
+        if tag and docker_image_id(image) is not None and docker_image_id(tag) is None:
+            return [Action(f"tag Docker image {image} as {tag}", 0)]
+        pinned = self.image_lock.digest(image)
+        if docker_image_id(image) is None:
+            return [Action(f"{'load' if self.bundle else 'pull'} Docker image {image}"
+                           + (f" pinned to {pinned.rpartition('@')[2][:19]}" if pinned else ""),
+                           0 if self.bundle else None)]
+        # Images loaded from a bundle or snapshot carry no repo digest to compare
+        if pinned and not self.bundle and pinned not in repo_digests(image):
+            return [Action(f"re-pull Docker image {image}: the local copy is not the pinned digest", None)]
+        return []
+
+    def check_venv(self):
+        manager = VenvManager(self.REQUIREMENTS_FILE, find_links=self.bundle.wheelhouse if self.bundle else None)
+        if manager.is_current(VENV_DIR):
+            return []
+        if os.path.exists(os.path.join(manager.template, COMPLETE_MARKER)):
+            return [Action(f"create {VENV_DIR} from the cached venv template", 0)]
+        if os.path.exists(os.path.join(manager.wheelhouse, COMPLETE_MARKER)):
+            return [Action("build the venv template from the cached wheelhouse", 0)]
+        return [Action(f"build the wheelhouse for {os.path.basename(self.REQUIREMENTS_FILE)} and the venv",
+                       0 if self.bundle else None)]
+
+    def check_network(self):
+        actions = []
+        macs = interface_macs()
+        requested = self.host.interface_macs() if self.host else {}
+        for name in self.INTERFACE_NAMES:
+            wanted = requested.get(name)
+            if name not in macs:
+                actions.append(Action(f"rename an interface to '{name}'" + (f" (MAC {wanted})" if wanted else ""), 0))
+            elif wanted and (macs[name] or "").lower() != wanted.lower():
+                actions.append(Action(f"'{name}' has MAC {macs[name]}, expected {wanted}: rename interfaces", 0))
+        if self.LOOPBACK_ALIAS and not loopback_alias_present(self.LOOPBACK_ALIAS):
+            actions.append(Action(f"add loopback alias {self.LOOPBACK_ALIAS}/32", 0))
+        # Only renames get a .link file, and which names were renamed cannot be told from here, so only the
+        # loopback unit is checked; without systemd nothing can be persisted
+        if systemd_running():
+            for path, present in boot_config_present([], self.LOOPBACK_ALIAS).items():
+                if not present:
+                    actions.append(Action(f"write {path} to keep the configuration across reboots", 0))
+        return actions
+
+    def validation_problems(self):
+        """Role-specific problems validate_installation looks for, as one-line descriptions"""
+        return []
+
+    def verify_installation(self):
+        """Everything a step would still do on this machine plus the role's validation problems; [] when complete"""
+        problems = []
+        for step in self.steps():
+            if step.check is not None:
+                problems.extend(f"{step.name}: {action.summary}" for action in step.check())
+        return problems + self.validation_problems()
 
     @abc.abstractmethod
     def pre_checks(self):
@@ -45,44 +328,131 @@ class BaseInstaller(abc.ABC):
         """Run validation checks to confirm SmartEdge can operate"""
         pass
 
-    def check_ubuntu_version(self):
-        dist = platform.freedesktop_os_release().get("VERSION_ID", "")
-        if not dist.startswith("22.04") and not dist.startswith("24.04"):
-            logger.warning("⚠️  This installer supports Ubuntu 22.04 or 24.04 LTS only.")
-        else:
-            logger.info(f"Ubuntu version check passed: {dist}")
+    def ubuntu_version_supported(self):
+        try:
+            dist = platform.freedesktop_os_release().get("VERSION_ID", "")
+        except OSError:
+            dist = ""
+        return dist.startswith("22.04") or dist.startswith("24.04"), dist
 
-    def check_disk_space(self, min_gb=2):
+    def free_disk_gb(self):
         total, used, free = shutil.disk_usage("/")
-        free_gb = free // (2**30)
-        if free_gb < min_gb:
-            logger.error(f"❌ Not enough disk space. Required: {min_gb} GB, Available: {free_gb} GB")
-            raise SystemExit(1)
-        else:
-            logger.info(f"Disk space check passed: {free_gb} GB available")
+        return free // (2**30)
 
-    def install_apt_dependencies(self, packages):
+    def check_readiness(self):
+        """Run the role's probes at once; stop the installation within seconds if it cannot succeed"""
+        readiness = ReadinessReport.run(self)
+        log_backend.flush()
+        print("\n" + readiness.summary_table() + "\n")
+        try:
+            readiness.write_report()
+        except OSError as e:
+            self.logger.warning(f"⚠️ Could not write the readiness report: {e}")
+        if not readiness.ready:
+            raise NotReadyError("; ".join(f"{result.probe.name}: {result.detail}" for result in readiness.failures))
+        self.logger.info(f"✅ Readiness score {readiness.score}/100.")
+        return readiness
+
+    def install_apt_dependencies(self, packages, refresh=False):
         logger.info(f"📦 Installing system packages: {', '.join(packages)}")
         try:
-            subprocess.run(["sudo", "apt-get", "update"], check=True)
-            subprocess.run(["sudo", "apt-get", "install", "-y"] + packages, check=True)
+            installed = PackagePlan(packages).apply(self.bundle, refresh)
             logger.info("✅ System packages installed successfully.")
-        except subprocess.CalledProcessError as e:
+            return installed
+        except subprocess.SubprocessError as e:
             logger.error(f"❌ Failed to install system packages: {e}")
             raise
 
+    def fetch_docker_image(self, image):
+        if self.bundle:
+            self.bundle.load_image(image)
+        else:
+            pull_pinned(image, self.image_lock)
+
+    def start_image_prefetch(self):
+        # Images already on the host are left to their steps, which the journal usually skips
+        self.prefetcher.start(self.DOCKER_IMAGES, skip=lambda image: docker_image_id(image) is not None)
+
+    def pull_docker_image(self, image, tag=None):
+        self.prefetcher.wait(image)
+        if tag:
+            run_command(["sudo", "docker", "tag", image, tag], "docker")
+        logger.info(f"✅ Docker image {image} is available.")
+
+    def uses_registry_mirror(self):
+        return not self.bundle and bool(self.registry_mirror or self.serve_registry_mirror)
+
+    def setup_registry_mirror(self):
+        """Serve and/or use a LAN pull-through cache for Docker Hub images"""
+        if self.bundle:
+            return
+        mirror_url = self.registry_mirror
+        if self.serve_registry_mirror:
+            start_mirror()
+            mirror_url = mirror_url or f"http://localhost:{MIRROR_PORT}"
+        if mirror_url:
+            configure_docker_mirror(mirror_url)
+            self.start_image_prefetch()
+
     def install_pip_dependencies(self, pip_packages):
         logger.info(f"📦 Installing pip packages: {', '.join(pip_packages)}")
+        missing = self.missing_pip_packages(pip_packages)
         try:
-            subprocess.run(["python3", "-m", "pip", "install", "--upgrade", "pip"], check=True)
-            subprocess.run(["python3", "-m", "pip", "install"] + pip_packages, check=True)
+            run_command(["python3", "-m", "pip", "install", "--upgrade", "pip"] + self.pip_install_args(), "pip",
+                        **NETWORK_POLICY)
+            run_command(["python3", "-m", "pip", "install"] + self.pip_install_args() + pip_packages, "pip",
+                        **NETWORK_POLICY)
+            if missing:
+                self.record_undo("pip_packages", packages=missing)
             self.logger.info("✅ pip dependencies installed successfully.")
-        except subprocess.CalledProcessError as e:
+        except subprocess.SubprocessError as e:
             self.logger.error(f"❌ Failed to install pip packages: {e}")
             raise
 
+    def setup_virtualenv_and_install_python_deps(self):
+        self.logger.info("Setting up Python venv and installing Python dependencies...")
+        find_links = self.bundle.wheelhouse if self.bundle else None
+        if not os.path.exists(VENV_DIR):
+            self.record_undo("path", path=VENV_DIR)
+        VenvManager(self.REQUIREMENTS_FILE, find_links=find_links).create(VENV_DIR)
+
+    def run_interface_script(self, module, names):
+        """Rename interfaces and add the loopback alias in one netlink transaction (as root, in the venv)"""
+        command = ["sudo", os.path.join(VENV_DIR, "bin", "python"), "-m", f"smartedge_installer.scripts.{module}",
+                   "--loopback-alias", self.LOOPBACK_ALIAS]
+        if self.host is not None:
+            macs = {name: mac for name, mac in self.host.interface_macs().items() if name in names}
+            if not macs:
+                self.logger.info(f"No MAC addresses for {', '.join(names)} in the inventory. Leaving interfaces as they are.")
+                command.append("--no-prompt")
+            for name, mac in macs.items():
+                command += [f"--{name}-mac", mac]
+        record = self.undo_file("interfaces.json")
+        command += ["--record", record]
+        # The script may prompt; make sure our own output is on screen first
+        log_backend.flush()
+        run_command(command, "interfaces", interactive=True, cwd=INSTALLER_ROOT)
+        self.record_undo("interfaces", record=record)
+
+    def pip_install_args(self):
+        return self.bundle.pip_args() if self.bundle else []
+
+    def start_artifact(self):
+        args = self.host.artifact_args if self.host else "10"
+        command = f"cd {PROGRAM_DIR} && source .venv/bin/activate && source run.sh {self.ROLE_ALIAS} {args}"
+        run_command(["screen", "-dmS", "smartedge", "bash", "-c", command], "screen", stdout=subprocess.DEVNULL)
+        self.logger.info("🚀 Artifact started in the background. Attach with: screen -r smartedge")
+
     def post_install_prompt(self):
         self.logger.info("🚀 Installation complete.")
+        if self.host is not None:
+            if self.host.start_artifact:
+                self.start_artifact()
+            else:
+                self.logger.info("ℹ️ Installation completed. You can start the artifact manually later.")
+            return
+
+        log_backend.flush()
         response = input("👉 Do you want to start the artifact now? [y/N]: ").strip().lower()
 
         if response == 'y':
@@ -103,7 +473,7 @@ class BaseInstaller(abc.ABC):
             exec bash
             '''
 
-            subprocess.run(["bash", "-c", bash_command])
+            run_command(["bash", "-c", bash_command], "shell", check=False, interactive=True)
         else:
             self.logger.info("ℹ️ Installation completed. You can start the artifact manually later.")
 
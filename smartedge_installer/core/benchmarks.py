@@ -0,0 +1,293 @@
+import contextlib
+import json
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+from smartedge_installer.constants import INSTALLER_ROOT, REPORTS_DIR, VENV_DIR
+from smartedge_installer.utils.logger import get_logger
+from smartedge_installer.utils.runner import query, run_command
+
+logger = get_logger("Benchmarks")
+
+# "max": the measured value must not exceed it, "min": it must reach it.
+# Override with `bench --thresholds FILE` (a JSON object with the same shape).
+DEFAULT_THRESHOLDS = {
+    "cassandra_start_seconds": {"max": 120},
+    "cassandra_write_p99_ms": {"max": 20},
+    "cassandra_read_p99_ms": {"max": 20},
+    "bmv2_forwarding_pps": {"min": 5000},
+    "nikss_pipeline_load_seconds": {"max": 5},
+    "nikss_forwarding_pps": {"min": 100000},
+}
+TRAFFIC_SECONDS = float(os.environ.get("SMARTEDGE_BENCH_SECONDS", "5"))
+# A PSA-eBPF object built with p4c-ebpf; the NIKSS benchmarks are skipped without one
+NIKSS_PIPELINE = os.environ.get("SMARTEDGE_NIKSS_PIPELINE")
+BENCH_CONTAINER_PREFIX = "smartedge-bench-"
+BENCH_PIPELINE_ID = 99
+# Two veth pairs: frames go in at <prefix>0b, through the switch from port 0 to port 1, out at <prefix>1b
+VETH_PREFIX = "sebench"
+
+
+class BenchmarkSkipped(Exception):
+    pass
+
+
+def _run_json(command):
+    result = run_command(command, "bench", capture=True, cwd=INSTALLER_ROOT)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _venv_python():
+    return os.path.join(VENV_DIR, "bin", "python")
+
+
+@contextlib.contextmanager
+def veth_ports():
+    names = []
+    try:
+        for port in (0, 1):
+            switch_side, host_side = f"{VETH_PREFIX}{port}a", f"{VETH_PREFIX}{port}b"
+            run_command(["sudo", "ip", "link", "add", switch_side, "type", "veth", "peer", "name", host_side], "ip")
+            names.append(switch_side)
+            for name in (switch_side, host_side):
+                # No IPv6 autoconfiguration chatter in the counters
+                run_command(["sudo", "sysctl", "-qw", f"net.ipv6.conf.{name}.disable_ipv6=1"], "sysctl", check=False)
+                run_command(["sudo", "ip", "link", "set", name, "up"], "ip")
+        yield [f"{VETH_PREFIX}0a", f"{VETH_PREFIX}1a"]
+    finally:
+        for name in names:
+            query(["sudo", "ip", "link", "del", name])
+
+
+def forwarding_rate():
+    return _run_json(["sudo", "python3", "-m", "smartedge_installer.scripts.veth_traffic",
+                      "--tx", f"{VETH_PREFIX}0b", "--rx", f"{VETH_PREFIX}1b", "--seconds", str(TRAFFIC_SECONDS)])
+
+
+@contextlib.contextmanager
+def bench_container(name, args):
+    container = BENCH_CONTAINER_PREFIX + name
+    query(["sudo", "docker", "rm", "-f", container])
+    run_command(["sudo", "docker", "run", "-d", "--name", container] + args, "docker")
+    try:
+        yield container
+    finally:
+        query(["sudo", "docker", "rm", "-f", container])
+
+
+def _container_ip(container):
+    result = query(["sudo", "docker", "inspect", "-f",
+                    "{{range .NetworkSettings.Networks}}{{.IPAddress}}{{end}}", container], check=True)
+    return result.stdout.strip()
+
+
+def _wait_for_port(host, port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.5)
+    return False
+
+
+def bench_cassandra(thresholds):
+    """Cassandra container start time, then read/write latency through the Python driver"""
+    with bench_container("cassandra", ["cassandra:latest"]) as container:
+        started = time.monotonic()
+        host = _container_ip(container)
+        # Twice the pass limit, so a slow start is still measured (and failed) instead of aborted
+        start_limit = thresholds.get("cassandra_start_seconds") or {}
+        limit = start_limit.get("max", DEFAULT_THRESHOLDS["cassandra_start_seconds"]["max"]) * 2
+        # The CQL port only opens once the node accepts clients
+        if not _wait_for_port(host, 9042, limit):
+            raise RuntimeError(f"Cassandra did not accept connections within {limit}s")
+        results = {"cassandra_start_seconds": round(time.monotonic() - started, 2)}
+        results.update(_run_json([_venv_python(), "-m", "smartedge_installer.scripts.cassandra_latency",
+                                  "--host", host]))
+        return results
+
+
+# Forwards every packet from port 0 to port 1: the smallest program simple_switch will run
+BMV2_FORWARD_PROGRAM = {
+    "header_types": [
+        {"name": "scalars_0", "id": 0, "fields": []},
+        {"name": "standard_metadata", "id": 1, "fields": [
+            ["ingress_port", 9, False], ["egress_spec", 9, False], ["egress_port", 9, False],
+            ["instance_type", 32, False], ["packet_length", 32, False], ["enq_timestamp", 32, False],
+            ["enq_qdepth", 19, False], ["deq_timedelta", 32, False], ["deq_qdepth", 19, False],
+            ["ingress_global_timestamp", 48, False], ["egress_global_timestamp", 48, False],
+            ["mcast_grp", 16, False], ["egress_rid", 16, False], ["checksum_error", 1, False],
+            ["parser_error", 32, False], ["priority", 3, False], ["_padding", 3, False],
+        ]},
+    ],
+    "headers": [
+        {"name": "scalars", "id": 0, "header_type": "scalars_0", "metadata": True, "pi_omit": True},
+        {"name": "standard_metadata", "id": 1, "header_type": "standard_metadata", "metadata": True, "pi_omit": True},
+    ],
+    "header_stacks": [], "header_union_types": [], "header_unions": [], "header_union_stacks": [],
+    "field_lists": [], "errors": [["NoError", 0], ["PacketTooShort", 1]], "enums": [],
+    "parsers": [{"name": "parser", "id": 0, "init_state": "start", "parse_states": [{
+        "name": "start", "id": 0, "parser_ops": [], "transition_key": [],
+        "transitions": [{"type": "default", "value": None, "mask": None, "next_state": None}],
+    }]}],
+    "parse_vsets": [],
+    "deparsers": [{"name": "deparser", "id": 0, "order": [], "primitives": []}],
+    "meter_arrays": [], "counter_arrays": [], "register_arrays": [], "calculations": [], "learn_lists": [],
+    "actions": [{"name": "forward", "id": 0, "runtime_data": [], "primitives": [{
+        "op": "assign",
+        "parameters": [{"type": "field", "value": ["standard_metadata", "egress_spec"]},
+                       {"type": "hexstr", "value": "0x0001"}],
+    }]}],
+    "pipelines": [
+        {"name": "ingress", "id": 0, "init_table": "tbl_forward", "action_profiles": [], "conditionals": [],
+         "tables": [{
+             "name": "tbl_forward", "id": 0, "key": [], "match_type": "exact", "type": "simple",
+             "max_size": 1, "with_counters": False, "support_timeout": False, "direct_meters": None,
+             "action_ids": [0], "actions": ["forward"], "base_default_next": None,
+             "next_tables": {"forward": None},
+             "default_entry": {"action_id": 0, "action_const": True, "action_data": [],
+                               "action_entry_const": True},
+         }]},
+        {"name": "egress", "id": 1, "init_table": None, "tables": [], "action_profiles": [], "conditionals": []},
+    ],
+    "checksums": [], "force_arith": [], "extern_instances": [], "field_aliases": [],
+    "program": "smartedge_bench_forward.p4",
+    "__meta__": {"version": [2, 18], "compiler": "smartedge-installer"},
+}
+
+
+def bench_bmv2(thresholds):
+    """simple_switch forwarding rate between two veth ports"""
+    program_dir = tempfile.mkdtemp(prefix="smartedge-bench-")
+    try:
+        with open(os.path.join(program_dir, "forward.json"), "w") as f:
+            json.dump(BMV2_FORWARD_PROGRAM, f)
+        with veth_ports() as (port0, port1):
+            args = ["--privileged", "--network", "host", "-v", f"{program_dir}:/bench:ro", "p4lang/behavioral-model",
+                    "simple_switch", "--log-level", "off", "-i", f"0@{port0}", "-i", f"1@{port1}",
+                    "/bench/forward.json"]
+            with bench_container("bmv2", args):
+                # simple_switch opens its Thrift port once the ports are attached
+                if not _wait_for_port("127.0.0.1", 9090, 30):
+                    raise RuntimeError("simple_switch did not start within 30s")
+                traffic = forwarding_rate()
+        return {"bmv2_forwarding_pps": traffic["pps"]}
+    finally:
+        shutil.rmtree(program_dir, ignore_errors=True)
+
+
+def bench_nikss(thresholds):
+    """Time to load a PSA-eBPF pipeline with nikss-ctl, and its forwarding rate between two veth ports"""
+    if not shutil.which("nikss-ctl"):
+        raise BenchmarkSkipped("nikss-ctl is not installed")
+    if not NIKSS_PIPELINE or not os.path.exists(NIKSS_PIPELINE):
+        raise BenchmarkSkipped("set SMARTEDGE_NIKSS_PIPELINE to a PSA-eBPF object file")
+
+    pipeline = str(BENCH_PIPELINE_ID)
+    started = time.monotonic()
+    run_command(["sudo", "nikss-ctl", "pipeline", "load", "id", pipeline, NIKSS_PIPELINE], "nikss-ctl")
+    results = {"nikss_pipeline_load_seconds": round(time.monotonic() - started, 3)}
+    try:
+        with veth_ports() as ports:
+            for port in ports:
+                run_command(["sudo", "nikss-ctl", "add-port", "pipe", pipeline, "dev", port], "nikss-ctl")
+            results["nikss_forwarding_pps"] = forwarding_rate()["pps"]
+    finally:
+        run_command(["sudo", "nikss-ctl", "pipeline", "unload", "id", pipeline], "nikss-ctl", check=False)
+    return results
+
+
+def load_thresholds(path=None):
+    thresholds = {name: dict(limit) for name, limit in DEFAULT_THRESHOLDS.items()}
+    if path:
+        with open(path) as f:
+            overrides = json.load(f)
+        if not isinstance(overrides, dict) or not all(isinstance(limit, dict) for limit in overrides.values()):
+            raise ValueError('expected an object like {"bmv2_forwarding_pps": {"min": 20000}}')
+        thresholds.update(overrides)
+    return thresholds
+
+
+def check(value, limit):
+    if limit is None:
+        return None
+    if "max" in limit and value > limit["max"]:
+        return False
+    if "min" in limit and value < limit["min"]:
+        return False
+    return True
+
+
+class BenchmarkSuite:
+    """Runs a role's benchmarks and compares every measurement with its threshold"""
+
+    def __init__(self, role, benchmarks, thresholds=None):
+        self.role = role
+        self.benchmarks = list(benchmarks)
+        self.thresholds = thresholds if thresholds is not None else load_thresholds()
+        self.results = []
+        self.skipped = {}
+        self.errors = {}
+
+    def run(self):
+        # Each benchmark gets the loaded thresholds, e.g. to size its own wait limits
+        for benchmark in self.benchmarks:
+            name = benchmark.__name__
+            logger.info(f"⏱️ Running {name}...")
+            try:
+                measurements = benchmark(self.thresholds)
+            except BenchmarkSkipped as e:
+                logger.warning(f"⚠️ {name} skipped: {e}")
+                self.skipped[name] = str(e)
+                continue
+            except (OSError, RuntimeError, ValueError, subprocess.SubprocessError) as e:
+                logger.error(f"❌ {name} failed: {e}")
+                self.errors[name] = str(e)
+                continue
+            for metric, value in measurements.items():
+                limit = self.thresholds.get(metric)
+                self.results.append({"metric": metric, "value": value, "threshold": limit,
+                                     "passed": check(value, limit)})
+        return self.passed
+
+    @property
+    def passed(self):
+        return not self.errors and all(result["passed"] is not False for result in self.results)
+
+    def report(self):
+        return {
+            "role": self.role,
+            "host": socket.gethostname(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "passed": self.passed,
+            "results": self.results,
+            "skipped": self.skipped,
+            "errors": self.errors,
+        }
+
+    def write_report(self, directory=REPORTS_DIR):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"bench-{self.role}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+        logger.info(f"📊 Benchmark report written to {path}")
+        return path
+
+    def summary_table(self):
+        header = f"{'Metric':<30} {'Value':>12} {'Threshold':>14} {'Result':<7}"
+        lines = [header, "-" * len(header)]
+        for result in self.results:
+            limit = result["threshold"] or {}
+            threshold = f"<= {limit['max']}" if "max" in limit else (f">= {limit['min']}" if "min" in limit else "-")
+            status = {True: "pass", False: "FAIL", None: "-"}[result["passed"]]
+            lines.append(f"{result['metric']:<30} {result['value']:>12} {threshold:>14} {status:<7}")
+        for name, reason in self.skipped.items():
+            lines.append(f"{name:<30} {'skipped':>12}   {reason}")
+        for name, error in self.errors.items():
+            lines.append(f"{name:<30} {'error':>12}   {error}")
+        return "\n".join(lines)
@@ -0,0 +1,100 @@
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+from smartedge_installer.constants import PROGRAM_DIR, PROGRAM_REPO_URL
+from smartedge_installer.core.package_plan import PackagePlan, apt_source_files
+from smartedge_installer.utils.logger import get_logger
+from smartedge_installer.utils.runner import NETWORK_TIMEOUT, QUERY_TIMEOUT, run_command
+from smartedge_installer.utils.source_cache import LOW_SPEED_ARGS, SourceCache, clone_into
+
+logger = get_logger("Bootstrap")
+
+# What Bootstrap.sh used to install before handing over; now part of every role's package plan
+BOOTSTRAP_APT_PACKAGES = ["git", "python3-pip", "python3-venv", "curl"]
+if sys.version_info < (3, 11):
+    # tomllib is new in Python 3.11; TOML inventories need tomli on Ubuntu 22.04
+    BOOTSTRAP_APT_PACKAGES.append("python3-tomli")
+# The installer's own state, which may be in PROGRAM_DIR before the repository is cloned into it
+INSTALLER_ENTRIES = (".installer_", ".venv", ".nikss_fingerprint")
+# Keeps that state out of `git status` in the clone
+GIT_EXCLUDES = ["/.installer_*", "/.venv/", "/.nikss_fingerprint"]
+
+CLONED, MISSING, FOREIGN = "cloned", "missing", "foreign"
+
+
+def apt_components():
+    """Every component (main, universe, ...) some apt source enables, classic one-line or deb822"""
+    components = set()
+    for path in apt_source_files():
+        try:
+            with open(path) as f:
+                lines = f.read().splitlines()
+        except OSError:
+            continue
+        for line in lines:
+            # deb [options] uri suite component...
+            fields = re.sub(r"\[[^]]*\]", "", line.split("#", 1)[0]).split()
+            if fields[:1] == ["deb"]:
+                components.update(fields[3:])
+            elif fields[:1] == ["Components:"]:
+                components.update(fields[1:])
+    return components
+
+
+def enable_universe():
+    """Enable Ubuntu's universe component (docker.io, ccache, ...) unless a source has it; True if it changed"""
+    try:
+        os_id = platform.freedesktop_os_release().get("ID")
+    except OSError:
+        return False
+    if os_id != "ubuntu" or "universe" in apt_components():
+        return False
+    if not shutil.which("add-apt-repository"):
+        logger.warning("⚠️ The universe component is not enabled and add-apt-repository is missing.")
+        return False
+    logger.info("🔧 Enabling the universe apt component...")
+    # The package plan runs apt-get update once for everything
+    run_command(["sudo", "add-apt-repository", "--yes", "--no-update", "universe"], "apt", timeout=QUERY_TIMEOUT)
+    return True
+
+
+def program_repo_state(path=PROGRAM_DIR):
+    if os.path.isdir(os.path.join(path, ".git")):
+        return CLONED
+    if os.path.isdir(path) and any(not name.startswith(INSTALLER_ENTRIES) for name in os.listdir(path)):
+        return FOREIGN
+    return MISSING
+
+
+def fetch_program_repo(bundle=None, path=PROGRAM_DIR):
+    """Clone the SmartEdge repository into path, next to the installer's state, or update an existing clone"""
+    state = program_repo_state(path)
+    if state == FOREIGN:
+        raise RuntimeError(f"{path} exists but is not a git repository. Please delete or move it.")
+    if state == CLONED:
+        if bundle:
+            logger.info(f"✅ The SmartEdge repository is already cloned in {path}.")
+            return
+        logger.info(f"🔄 Updating the SmartEdge repository in {path}...")
+        try:
+            run_command(["git", *LOW_SPEED_ARGS, "-C", path, "pull", "--quiet"], "git", timeout=NETWORK_TIMEOUT)
+        except subprocess.SubprocessError as e:
+            logger.warning(f"⚠️ Could not update {path} ({e}); keeping the checked-out version.")
+        return
+
+    if not shutil.which("git"):
+        # Otherwise the clone would wait for the role's whole apt transaction
+        PackagePlan(["git"]).apply(bundle)
+    if bundle:
+        logger.info("📦 Cloning the SmartEdge repository from the offline bundle...")
+        clone_into(bundle.program_bundle(), path, PROGRAM_REPO_URL)
+    else:
+        logger.info("📥 Cloning the SmartEdge repository...")
+        # Through the source cache, shared with other hosts via the USB stick's cache/
+        SourceCache(PROGRAM_REPO_URL).clone(path)
+    with open(os.path.join(path, ".git", "info", "exclude"), "a") as f:
+        f.write("\n".join(GIT_EXCLUDES) + "\n")
+    logger.info(f"✅ SmartEdge repository cloned into {path}.")
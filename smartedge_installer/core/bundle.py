@@ -0,0 +1,187 @@
+import glob
+import hashlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from smartedge_installer.constants import CACHE_DIR, PROGRAM_DIR, PROGRAM_REPO_URL
+from smartedge_installer.core.package_plan import installed_packages
+from smartedge_installer.utils.build_cache import os_release
+from smartedge_installer.utils.logger import get_logger
+from smartedge_installer.utils.runner import NETWORK_POLICY, run_command
+from smartedge_installer.utils.source_cache import SourceCache
+
+logger = get_logger("OfflineBundle")
+
+BUNDLE_FORMAT = 1
+MANIFEST_NAME = "manifest.json"
+
+
+def _image_archive_name(image):
+    return image.replace("/", "_").replace(":", "_") + ".tar"
+
+
+def apt_dependency_closure(packages):
+    result = run_command(
+        ["apt-cache", "depends", "--recurse", "--no-recommends", "--no-suggests", "--no-conflicts",
+         "--no-breaks", "--no-replaces", "--no-enhances"] + packages,
+        "apt", capture=True, level=None
+    )
+    # Top-level lines are real package names; indented lines and <virtual> packages are skipped
+    closure = {line.strip() for line in result.stdout.splitlines()
+               if line and not line.startswith(" ") and not line.startswith("<")}
+    return sorted(closure)
+
+
+def write_program_bundle(path):
+    """The SmartEdge program repository as a git bundle: the local clone if there is one, else upstream"""
+    if os.path.isdir(os.path.join(PROGRAM_DIR, ".git")):
+        mirror_dir = path + ".git"
+        run_command(["git", "clone", "--bare", PROGRAM_DIR, mirror_dir], "git")
+        run_command(["git", "-C", mirror_dir, "bundle", "create", path, "--all"], "git")
+        shutil.rmtree(mirror_dir)
+    else:
+        sources = SourceCache(PROGRAM_REPO_URL)
+        sources.update()
+        sources.export_bundle(path)
+
+
+def create_bundle(installer_cls, output_path):
+    """Download everything one role needs into a single archive for offline installs"""
+    workdir = tempfile.mkdtemp(prefix="smartedge-bundle-")
+    try:
+        role = installer_cls.__name__
+        installer = installer_cls()
+        logger.info(f"📦 Creating offline bundle for {role} in {output_path}")
+
+        # Step 1: .deb files for the role's packages and their whole dependency closure
+        debs_dir = os.path.join(workdir, "debs")
+        os.makedirs(debs_dir)
+        apt_packages = installer.package_plan().packages
+        closure = apt_dependency_closure(apt_packages)
+        logger.info(f"Downloading {len(closure)} .deb files...")
+        run_command(["apt-get", "download"] + closure, "apt", cwd=debs_dir, **NETWORK_POLICY)
+
+        # Step 2: a wheelhouse built from the role's requirements (plus pip itself)
+        wheel_dir = os.path.join(workdir, "wheelhouse")
+        requirements_file = installer_cls.REQUIREMENTS_FILE
+        shutil.copy(requirements_file, os.path.join(workdir, "requirements.txt"))
+        logger.info(f"Building wheelhouse from {requirements_file}...")
+        run_command([sys.executable, "-m", "pip", "wheel", "-w", wheel_dir, "pip",
+                     "-r", requirements_file] + list(installer_cls.SYSTEM_PIP_PACKAGES), "pip", **NETWORK_POLICY)
+
+        # Step 3: docker image archives
+        images_dir = os.path.join(workdir, "images")
+        os.makedirs(images_dir)
+        for image in installer_cls.DOCKER_IMAGES:
+            logger.info(f"🐳 Saving Docker image {image}...")
+            run_command(["sudo", "docker", "pull", image], image, progress="docker", **NETWORK_POLICY)
+            with open(os.path.join(images_dir, _image_archive_name(image)), "wb") as f:
+                run_command(["sudo", "docker", "save", image], "docker", stdout=f)
+
+        # Step 4: the SmartEdge program repository and any cached source builds
+        write_program_bundle(os.path.join(workdir, "program.bundle"))
+
+        builds_dir = os.path.join(CACHE_DIR, "builds")
+        if os.path.isdir(builds_dir):
+            shutil.copytree(builds_dir, os.path.join(workdir, "cache", "builds"))
+
+        manifest = {
+            "format": BUNDLE_FORMAT,
+            "role": role,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "os_release": os_release(),
+            "python": platform.python_version(),
+            "apt_packages": apt_packages,
+            "docker_images": list(installer_cls.DOCKER_IMAGES),
+        }
+        with open(os.path.join(workdir, MANIFEST_NAME), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        # debs, wheels and image layers are already compressed, so a plain tar is the fastest option
+        run_command(["tar", "-cf", output_path, "-C", workdir] + sorted(os.listdir(workdir)), "tar")
+        logger.info(f"✅ Offline bundle written to {output_path}")
+        return output_path
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+class OfflineBundle:
+    """Installs apt packages, wheels and docker images from a bundle without network access"""
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        if os.path.isdir(self.path):
+            self.directory = self.path
+        else:
+            self.directory = self._extract()
+
+        with open(os.path.join(self.directory, MANIFEST_NAME)) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format") != BUNDLE_FORMAT:
+            raise ValueError(f"Unsupported bundle format in {self.path}")
+        if self.manifest.get("os_release") != os_release():
+            logger.warning(f"⚠️ Bundle was built on {self.manifest.get('os_release')}, "
+                           f"this host is {os_release()}.")
+
+        self.wheelhouse = os.path.join(self.directory, "wheelhouse")
+        self._apt_lock = threading.Lock()
+        self._apt_done = False
+        self._import_build_cache()
+
+    def _extract(self):
+        digest = hashlib.sha256(f"{self.path}:{os.path.getmtime(self.path)}".encode()).hexdigest()[:16]
+        directory = os.path.join(CACHE_DIR, "bundles", digest)
+        if not os.path.exists(os.path.join(directory, MANIFEST_NAME)):
+            logger.info(f"📂 Extracting offline bundle {self.path}...")
+            # tar writes the manifest first: extract next to the final path so an interrupted
+            # extraction is never mistaken for a complete one
+            tmp = directory + ".tmp"
+            shutil.rmtree(tmp, ignore_errors=True)
+            os.makedirs(tmp)
+            run_command(["tar", "-xf", self.path, "-C", tmp], "tar")
+            shutil.rmtree(directory, ignore_errors=True)
+            os.rename(tmp, directory)
+        return directory
+
+    def _import_build_cache(self):
+        bundled = os.path.join(self.directory, "cache", "builds")
+        if not os.path.isdir(bundled):
+            return
+        target = os.path.join(CACHE_DIR, "builds")
+        shutil.copytree(bundled, target, dirs_exist_ok=True)
+
+    def install_apt(self):
+        """Install the bundled .debs that are missing; returns the names of the packages installed"""
+        # Every step shares one bundle, so the .deb set only has to be installed once
+        with self._apt_lock:
+            if self._apt_done:
+                return []
+            debs = sorted(glob.glob(os.path.join(self.directory, "debs", "*.deb")))
+            names = {os.path.basename(deb).split("_")[0]: deb for deb in debs}
+            installed = installed_packages(list(names))
+            missing = {name: deb for name, deb in names.items() if name not in installed}
+            if missing:
+                logger.info(f"📦 Installing {len(missing)} packages from the offline bundle...")
+                run_command(["sudo", "apt-get", "install", "-y", "--no-download"] + list(missing.values()), "apt")
+            else:
+                logger.info("All bundled packages are already installed.")
+            self._apt_done = True
+            return list(missing)
+
+    def pip_args(self):
+        return ["--no-index", "--find-links", self.wheelhouse]
+
+    def load_image(self, image):
+        archive = os.path.join(self.directory, "images", _image_archive_name(image))
+        if not os.path.exists(archive):
+            raise FileNotFoundError(f"Docker image {image} is not part of the offline bundle")
+        logger.info(f"🐳 Loading Docker image {image} from the offline bundle...")
+        run_command(["sudo", "docker", "load", "-i", archive], "docker")
+
+    def program_bundle(self):
+        return os.path.join(self.directory, "program.bundle")
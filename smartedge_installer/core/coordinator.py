@@ -1,213 +1,169 @@
 import os
+import platform
+import shutil
 import subprocess
-import venv
-#import psutil
 from smartedge_installer.core.base_installer import BaseInstaller
+from smartedge_installer.core.benchmarks import bench_cassandra
+from smartedge_installer.core.planner import Action
+from smartedge_installer.core.probes import PROBE_DOCKER_REGISTRY, PROBE_GITHUB, probe_docker_daemon
+from smartedge_installer.core.scheduler import Step
+from smartedge_installer.constants import PROGRAM_DIR, REQUIREMENTS_DIR
+from smartedge_installer.utils.build_cache import (
+    BuildCache, compiler_version, os_release, install_staging_dir, make_staging_dir, remove_staging_dir,
+    staged_paths
+)
 from smartedge_installer.utils.logger import get_logger
+from smartedge_installer.utils.native_build import NativeBuild
+from smartedge_installer.utils.runner import run_command
+from smartedge_installer.utils.source_cache import SourceCache
 
 logger = get_logger("CoordinatorInstaller")
 
-
-def prompt_for_interface_rename():
-    #import psutil
-    print("\n🔧 Detecting network interfaces...\n")
-    interfaces = psutil.net_if_addrs().keys()
-    interfaces = [iface for iface in interfaces if not iface.startswith("lo")]
-    if not interfaces:
-        print("❌ No active network interfaces found.")
-        return
-
-    print("📡 Available network interfaces:")
-    for i, iface in enumerate(interfaces, start=1):
-        print(f"{i}. {iface}")
-
-    try:
-        selected = int(input("\nPlease select which interface to rename to 'eth0': "))
-        selected_iface = list(interfaces)[selected - 1]
-        print(f"🔄 Renaming '{selected_iface}' to 'eth0'...")
-
-        subprocess.run(["sudo", "ip", "link", "set", selected_iface, "down"], check=True)
-        subprocess.run(["sudo", "ip", "link", "set", selected_iface, "name", "eth0"], check=True)
-        subprocess.run(["sudo", "ip", "link", "set", "eth0", "up"], check=True)
-
-        print("✅ Interface renamed successfully.")
-    except (IndexError, ValueError):
-        print("❌ Invalid selection.")
-    except subprocess.CalledProcessError:
-        print("❌ Failed to rename interface. You may need to reboot or reconfigure.")
-
+THRIFT_TAG = "0.13.0"
+THRIFT_REPO_URL = "https://github.com/apache/thrift.git"
+THRIFT_CONFIGURE_FLAGS = [
+    "--with-cpp=yes", "--with-c_glib=no", "--with-java=no", "--with-ruby=no",
+    "--with-erlang=no", "--with-go=no", "--with-nodejs=no",
+    # The test suite and tutorial are what need the compiled Boost libraries
+    "--disable-tests", "--disable-tutorial",
+]
+# Peak resident size of one g++ job on the Thrift C++ library
+THRIFT_MEMORY_PER_JOB_MB = 1024
+BASE_APT_PACKAGES = ["docker.io", "net-tools", "python3-pip", "python3-venv", "screen"]
+THRIFT_BUILD_DEPS = [
+    "automake", "bison", "flex", "g++", "git",
+    # Header-only Boost is enough for the library and compiler
+    "libboost-dev", "libevent-dev", "libssl-dev",
+    "libtool", "make", "pkg-config", "ccache"
+]
 
 
 class CoordinatorInstaller(BaseInstaller):
-    def __init__(self):
-        super().__init__()
+    DOCKER_IMAGES = ["cassandra:latest", "p4lang/behavioral-model"]
+    REQUIREMENTS_FILE = os.path.join(REQUIREMENTS_DIR, "coordinator.txt")
+    ROLE_ALIAS = "co"
+    BENCHMARKS = (bench_cassandra,)
+    LOOPBACK_ALIAS = "127.1.0.2"
+    INTERFACE_NAMES = ("eth0",)
+    MIN_MEMORY_MB = THRIFT_MEMORY_PER_JOB_MB
+    PROBES = BaseInstaller.PROBES + (PROBE_GITHUB, probe_docker_daemon, PROBE_DOCKER_REGISTRY)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
         logger.info("CoordinatorInstaller: Initialized installer.")
 
-    def run(self):
-        print("\n➡️  Starting installation for: Coordinator")
-        logger.info("CoordinatorInstaller: Starting installation sequence.")
-
-        self.pre_checks()
-        self.install_dependencies()
-        self.setup_virtualenv_and_install_python_deps()
-        self.configure_network()
-        self.validate_installation()
-        logger.info("CoordinatorInstaller: ✅ Installation completed successfully.")
+    def steps(self):
+        return [
+            Step("pre_checks", self.pre_checks),
+            self.program_repo_step(),
+            Step("apt_packages", self.install_planned_packages, ["pre_checks"],
+                 apt_packages=BASE_APT_PACKAGES, inputs=self.apt_inputs, check=self.check_apt),
+            Step("registry_mirror", self.setup_registry_mirror, ["apt_packages"]),
+            Step("pull_cassandra", self.pull_cassandra_image, ["registry_mirror"],
+                 inputs=lambda: self.image_inputs("cassandra:latest"),
+                 check=lambda: self.check_image("cassandra:latest")),
+            Step("pull_bmv2", self.pull_bmv2_image, ["registry_mirror"],
+                 inputs=lambda: self.image_inputs("p4lang/behavioral-model"),
+                 check=lambda: self.check_image("p4lang/behavioral-model")),
+            # The Thrift sources are checked out inside the program repository
+            Step("install_thrift", self.install_thrift, ["apt_packages", "program_repo"],
+                 apt_packages=THRIFT_BUILD_DEPS, inputs=self.thrift_inputs, check=self.check_thrift),
+            Step("python_venv", self.setup_virtualenv_and_install_python_deps, ["apt_packages"],
+                 inputs=self.venv_inputs, check=self.check_venv),
+            Step("configure_network", self.configure_network, ["python_venv"], exclusive=True,
+                 inputs=self.network_inputs, check=self.check_network),
+            Step("validate_installation", self.validate_installation,
+                 ["pull_cassandra", "pull_bmv2", "install_thrift", "configure_network", "program_repo"],
+                 exclusive=True),
+        ]
 
     def pre_checks(self):
         logger.info("CoordinatorInstaller: Running pre-checks for Coordinator...")
-        self.check_ubuntu_version()
-        self.check_disk_space()
-
-    def install_thrift(self):
-        logger.info("CoordinatorInstaller: Installing Apache Thrift (C++ + Python)...")
+        self.check_readiness()
 
-        try:
-            subprocess.run(["thrift", "--version"], check=True, stdout=subprocess.DEVNULL)
-            logger.info("Apache Thrift is already installed.")
-            return
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            logger.info("Apache Thrift not found. Proceeding with installation...")
-
-        deps = [
-            "automake", "bison", "flex", "g++", "git",
-            "libboost-all-dev", "libevent-dev", "libssl-dev",
-            "libtool", "make", "pkg-config"
-        ]
-        subprocess.run(["sudo", "apt-get", "install", "-y"] + deps, check=True)
-
-        smartedge_path = os.path.expanduser("~/smartedge_program")
-        thrift_dir = os.path.join(smartedge_path, "ci")
-        thrift_script = os.path.join(thrift_dir, "install-thrift.sh")
-
-        if not os.path.exists(thrift_dir):
-            os.makedirs(thrift_dir)
-
-        # Write the script content into install-thrift.sh
-        script_content = """#!/bin/sh
+    def install_dependencies(self):
+        logger.info("CoordinatorInstaller: Installing dependencies for Coordinator...")
+        self.install_planned_packages()
+        self.pull_cassandra_image()
+        self.pull_bmv2_image()
+        self.install_thrift()
 
-        THIS_DIR=$( cd \"$( dirname \"${BASH_SOURCE[0]}\" )\" && pwd )
+    def pull_cassandra_image(self):
+        self.pull_docker_image("cassandra:latest")
 
-        set -e
+    def pull_bmv2_image(self):
+        self.pull_docker_image("p4lang/behavioral-model")
 
-        # Clone thrift source
-        cd $THIS_DIR
-        git clone -b 0.13.0 https://github.com/apache/thrift.git thrift-0.13.0
-        cd thrift-0.13.0
-        ./bootstrap.sh
-        ./configure --with-cpp=yes --with-c_glib=no --with-java=no --with-ruby=no --with-erlang=no --with-go=no --with-nodejs=no
-        make -j2 && sudo make install
-        cd lib/py
-        sudo python3 setup.py install
-        cd ../../..
-        """
-        with open(thrift_script, "w") as f:
-            f.write(script_content)
+    def thrift_inputs(self):
+        return {"tag": THRIFT_TAG, "configure_flags": THRIFT_CONFIGURE_FLAGS, "thrift": shutil.which("thrift")}
 
-        os.chmod(thrift_script, 0o755)
+    def thrift_build_inputs(self):
+        return {
+            "tag": THRIFT_TAG,
+            "configure_flags": THRIFT_CONFIGURE_FLAGS,
+            "compiler": compiler_version("g++"),
+            "os_release": os_release(),
+            "python": platform.python_version(),
+        }
 
-        subprocess.run(["sudo", "bash", thrift_script], check=True)
-        logger.info("✅ Apache Thrift installed successfully.")
+    def check_thrift(self):
+        if shutil.which("thrift"):
+            return []
+        cache = BuildCache("thrift")
+        if cache.has(cache.key(self.thrift_build_inputs())):
+            return [Action(f"restore Apache Thrift {THRIFT_TAG} from the build cache", 0)]
+        return [Action(f"build Apache Thrift {THRIFT_TAG} from source")]
 
-    def install_dependencies(self):
-        logger.info("CoordinatorInstaller: Installing dependencies for Coordinator...")
-        subprocess.run(["sudo", "apt-get", "update"])
-        subprocess.run(["sudo", "apt-get", "install", "-y", "docker.io"])
-
-        # Start Cassandra container
-        subprocess.run(["sudo", "docker", "pull", "cassandra:latest"])
-        # Start BMv2 container
-        subprocess.run(["sudo", "docker", "pull", "p4lang/behavioral-model"])
-        subprocess.run(["sudo", "apt-get", "install", "-y", "net-tools"])
-        self.install_apt_dependencies(["docker.io", "net-tools", "python3-pip", "python3-venv", "screen"])
-        self.install_thrift()
-    
     def install_thrift(self):
         logger.info("CoordinatorInstaller: Installing Apache Thrift (C++ + Python)...")
 
         try:
-            subprocess.run(["thrift", "--version"], check=True, stdout=subprocess.DEVNULL)
+            run_command(["thrift", "--version"], "thrift", level=None, timeout=30)
             logger.info("Apache Thrift is already installed.")
             return
-        except (subprocess.CalledProcessError, FileNotFoundError):
+        except (subprocess.SubprocessError, FileNotFoundError):
             logger.info("Apache Thrift not found. Proceeding with installation...")
 
-        deps = [
-            "automake", "bison", "flex", "g++", "git",
-            "libboost-all-dev", "libevent-dev", "libssl-dev",
-            "libtool", "make", "pkg-config"
-        ]
-        subprocess.run(["sudo", "apt-get", "install", "-y"] + deps, check=True)
-
-        smartedge_path = os.path.expanduser("~/smartedge_program")
-        thrift_dir = os.path.join(smartedge_path, "ci")
-        thrift_script = os.path.join(thrift_dir, "install-thrift.sh")
-
-        if not os.path.exists(thrift_dir):
-            os.makedirs(thrift_dir)
-
-        # Write the script content into install-thrift.sh
-        script_content = """#!/bin/sh
-
-        THIS_DIR=$( cd \"$( dirname \"${BASH_SOURCE[0]}\" )\" && pwd )
 
-        set -e
-
-        # Clone thrift source
-        cd $THIS_DIR
-        git clone -b 0.13.0 https://github.com/apache/thrift.git thrift-0.13.0
-        cd thrift-0.13.0
-        ./bootstrap.sh
-        ./configure --with-cpp=yes --with-c_glib=no --with-java=no --with-ruby=no --with-erlang=no --with-go=no --with-nodejs=no
-        make -j2 && sudo make install
-        cd lib/py
-        sudo python3 setup.py install
-        cd ../../..
-        """
-        with open(thrift_script, "w") as f:
-            f.write(script_content)
-
-        os.chmod(thrift_script, 0o755)
+        cache = BuildCache("thrift")
+        inputs = self.thrift_build_inputs()
+        key = cache.key(inputs)
+        if cache.has(key):
+            self.record_new_files(*cache.members(key))
+        if cache.restore(key):
+            logger.info("✅ Apache Thrift restored from the build cache.")
+            return
 
-        subprocess.run(["sudo", "bash", thrift_script], check=True)
+        self.build_thrift(cache, key, inputs)
         logger.info("✅ Apache Thrift installed successfully.")
-        
-    
-
-    def setup_virtualenv_and_install_python_deps(self):
-        logger.info("CoordinatorInstaller: Setting up Python venv and installing Python dependencies...")
-        project_dir = os.path.expanduser("~/smartedge_program")
-        venv_dir = os.path.join(project_dir, ".venv")
-
-        if not os.path.exists(venv_dir):
-            venv.create(venv_dir, with_pip=True)
 
-        pip_path = os.path.join(venv_dir, "bin", "pip")
-
-        # UPDATED: path to requirements inside setup_smartedge
-        requirements_path = os.path.expanduser(
-            "~/setup_smartedge/smartedge_installer/requirements/coordinator.txt"
-        )
-
-        subprocess.run([pip_path, "install", "--upgrade", "pip"])
-        subprocess.run([pip_path, "install", "-r", requirements_path])
+    def build_thrift(self, cache, key, inputs):
+        source_dir = os.path.join(PROGRAM_DIR, "ci", f"thrift-{THRIFT_TAG}")
+        SourceCache(THRIFT_REPO_URL).checkout(THRIFT_TAG, source_dir, pinned=True)
 
+        # Install into a staging tree first so the result can be packed into the cache
+        staging_dir = make_staging_dir("thrift")
+        try:
+            build = NativeBuild("thrift", source_dir, THRIFT_MEMORY_PER_JOB_MB)
+            build.run("bootstrap", ["./bootstrap.sh"])
+            build.run("configure", ["./configure"] + THRIFT_CONFIGURE_FLAGS)
+            build.make("compile")
+            build.make("install", "install", f"DESTDIR={staging_dir}")
+            build.run("python", ["python3", "setup.py", "install", f"--root={staging_dir}"],
+                      cwd=os.path.join(source_dir, "lib", "py"))
+
+            self.record_new_files(*staged_paths(staging_dir))
+            install_staging_dir(staging_dir)
+            try:
+                cache.store(key, staging_dir, inputs, build.summary())
+            except (OSError, subprocess.CalledProcessError) as e:
+                logger.warning(f"⚠️ Could not store the Thrift build in the cache: {e}")
+        finally:
+            remove_staging_dir(staging_dir)
 
     def configure_network(self):
         logger.info("CoordinatorInstaller: Configuring network for Coordinator...")
-        venv_python = os.path.expanduser("~/smartedge_program/.venv/bin/python")
-        script_path = os.path.expanduser("~/setup_smartedge/smartedge_installer/scripts/interface_prompt.py")
-        subprocess.run([venv_python, script_path])
-        try:
-            logger.info("CoordinatorInstaller: Adding loopback alias lo:0 with IP 127.1.0.2/32")
-            subprocess.run(
-                ["sudo", "ip", "addr", "add", "127.1.0.2/32", "dev", "lo", "label", "lo:0"],
-                check=True
-            )
-            logger.info("✅ Loopback alias lo:0 configured successfully.")
-        except subprocess.CalledProcessError as e:
-            logger.error(f"❌ Failed to configure loopback alias: {e}")
-
+        self.run_interface_script("interface_prompt", self.INTERFACE_NAMES)
 
     def validate_installation(self):
         logger.info("CoordinatorInstaller: Validating Coordinator setup...")
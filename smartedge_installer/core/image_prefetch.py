@@ -0,0 +1,103 @@
+import os
+import subprocess
+import threading
+import time
+from smartedge_installer.utils.logger import get_logger
+from smartedge_installer.utils.runner import query
+
+logger = get_logger("ImagePrefetcher")
+
+PREFETCH_RETRIES = int(os.environ.get("SMARTEDGE_PULL_RETRIES", "3"))
+RETRY_BACKOFF = 5.0
+DAEMON_POLL_INTERVAL = 1.0
+
+
+def docker_daemon_available():
+    # -n: a background poll must never sit on a sudo password prompt
+    try:
+        result = query(["sudo", "-n", "docker", "info"])
+    except FileNotFoundError:
+        return False
+    return result.returncode == 0
+
+
+class _Fetch:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.done = False
+        self.error = None
+
+
+class ImagePrefetcher:
+    """Fetches a role's Docker images in the background as soon as the daemon is up
+
+    Pull steps call wait(image): it returns once the prefetch has finished, or fetches
+    the image itself if the prefetch has not got to it yet.
+    """
+
+    def __init__(self, fetch, retries=PREFETCH_RETRIES, backoff=RETRY_BACKOFF):
+        self.fetch = fetch
+        self.retries = retries
+        self.backoff = backoff
+        self._fetches = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def _entry(self, image):
+        with self._lock:
+            return self._fetches.setdefault(image, _Fetch())
+
+    def start(self, images, skip=None):
+        """Start fetching images once Docker answers; images for which skip(image) is true are left alone"""
+        thread = threading.Thread(target=self._prefetch, args=(list(images), skip), name="prefetch", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+
+    def _prefetch(self, images, skip):
+        while not docker_daemon_available():
+            if self._stop.wait(DAEMON_POLL_INTERVAL):
+                return
+        images = [image for image in images if not (skip and skip(image))]
+        if not images:
+            return
+        logger.info(f"⏬ Prefetching {len(images)} Docker image(s): {', '.join(images)}")
+        for image in images:
+            thread = threading.Thread(target=self._prefetch_one, args=(image,), name=f"prefetch-{image}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _prefetch_one(self, image):
+        try:
+            self.wait(image)
+        except Exception as e:
+            # Reported again by the step that needs the image
+            logger.warning(f"⚠️ Prefetch of {image} failed: {e}")
+
+    def _fetch_with_retries(self, image):
+        for attempt in range(1, self.retries + 1):
+            try:
+                self.fetch(image)
+                return
+            except (subprocess.SubprocessError, OSError) as e:
+                if attempt == self.retries or self._stop.is_set():
+                    raise
+                delay = self.backoff * 2 ** (attempt - 1)
+                logger.warning(f"⚠️ Fetching {image} failed ({e}); retrying in {delay:.0f}s "
+                               f"(attempt {attempt + 1}/{self.retries})")
+                time.sleep(delay)
+
+    def wait(self, image):
+        entry = self._entry(image)
+        with entry.lock:
+            if not entry.done:
+                try:
+                    self._fetch_with_retries(image)
+                except Exception as e:
+                    entry.error = e
+                entry.done = True
+        if entry.error:
+            raise entry.error
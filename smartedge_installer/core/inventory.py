@@ -0,0 +1,125 @@
+import json
+import os
+import re
+import socket
+from smartedge_installer.constants import ROLE_ALIASES, ROLE_CHOICES
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11 (Ubuntu 22.04)
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+MAC_PATTERN = re.compile(r"^[0-9a-f]{2}(:[0-9a-f]{2}){5}$")
+
+
+class InventoryError(ValueError):
+    pass
+
+
+class HostConfig:
+    def __init__(self, name, role, eth0_mac=None, wlan0_mac=None, loopback_alias=None,
+                 start_artifact=False, artifact_args="10", **extra):
+        self.name = name
+        self.role = _resolve_role(name, role)
+        self.eth0_mac = _normalise_mac(name, "eth0_mac", eth0_mac)
+        self.wlan0_mac = _normalise_mac(name, "wlan0_mac", wlan0_mac)
+        self.loopback_alias = loopback_alias
+        self.start_artifact = bool(start_artifact)
+        self.artifact_args = str(artifact_args)
+        # Settings used by other features (registry mirror, SSH address, ...)
+        self.extra = extra
+
+    def interface_macs(self):
+        macs = {}
+        if self.wlan0_mac:
+            macs["wlan0"] = self.wlan0_mac
+        if self.eth0_mac:
+            macs["eth0"] = self.eth0_mac
+        return macs
+
+    def __repr__(self):
+        return f"HostConfig({self.name!r}, role={ROLE_CHOICES[self.role]!r})"
+
+
+def _resolve_role(host, role):
+    choice = ROLE_ALIASES.get(str(role), str(role))
+    if choice not in ROLE_CHOICES:
+        raise InventoryError(f"Host '{host}': unknown role '{role}' (use co, ap or sn)")
+    return choice
+
+
+def _normalise_mac(host, field, mac):
+    if mac is None:
+        return None
+    if not isinstance(mac, str):
+        # YAML reads an unquoted 52:54:00:12:34:56 as a base-60 integer
+        raise InventoryError(f"Host '{host}': {field} must be a quoted string, e.g. \"52:54:00:12:34:56\"")
+    mac = mac.strip().lower().replace("-", ":")
+    if not MAC_PATTERN.match(mac):
+        raise InventoryError(f"Host '{host}': {field} '{mac}' is not a valid MAC address")
+    return mac
+
+
+def _parse(path):
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, "rb") as f:
+        content = f.read()
+
+    # TOMLDecodeError, JSONDecodeError and UnicodeDecodeError are all ValueErrors
+    errors = (ValueError, yaml.YAMLError) if yaml is not None else (ValueError,)
+    try:
+        if extension == ".toml":
+            if tomllib is None:
+                raise InventoryError("Reading TOML inventories needs Python 3.11+ or the 'tomli' package")
+            return tomllib.loads(content.decode())
+        if extension in (".yaml", ".yml"):
+            if yaml is None:
+                raise InventoryError("Reading YAML inventories needs the 'PyYAML' package")
+            return yaml.safe_load(content) or {}
+        if extension == ".json":
+            return json.loads(content)
+    except InventoryError:
+        raise
+    except errors as e:
+        raise InventoryError(f"{path} is not valid {extension[1:].upper()}: {e}")
+    raise InventoryError(f"Unsupported inventory format '{extension}' (use .toml, .yaml or .json)")
+
+
+class Inventory:
+    """Declarative description of every SmartEdge host: its role, interfaces and loopback alias"""
+
+    def __init__(self, hosts, path=None):
+        self.hosts = hosts
+        self.path = path
+
+    @classmethod
+    def load(cls, path):
+        data = _parse(path)
+        defaults = data.get("defaults", {})
+        hosts = {}
+        for name, settings in (data.get("hosts") or {}).items():
+            merged = dict(defaults, **(settings or {}))
+            if "role" not in merged:
+                raise InventoryError(f"Host '{name}' has no role")
+            hosts[name] = HostConfig(name, **merged)
+        if not hosts:
+            raise InventoryError(f"Inventory {path} does not define any hosts")
+        return cls(hosts, path)
+
+    def host(self, name=None):
+        candidates = [name] if name else [socket.gethostname(), socket.getfqdn()]
+        for candidate in candidates:
+            if candidate in self.hosts:
+                return self.hosts[candidate]
+            short = candidate.split(".")[0]
+            if short in self.hosts:
+                return self.hosts[short]
+        raise InventoryError(f"Host '{candidates[0]}' is not in inventory {self.path}")
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from smartedge_installer.constants import JOURNAL_FILE
+from smartedge_installer.utils.logger import get_logger
+
+logger = get_logger("StateJournal")
+
+JOURNAL_VERSION = 1
+
+
+def inputs_hash(inputs):
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class StateJournal:
+    """Records the inputs and outcome of every completed step so unchanged steps can be skipped"""
+
+    def __init__(self, path=JOURNAL_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self.data = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            if data.get("version") == JOURNAL_VERSION:
+                return data
+            logger.warning(f"⚠️ Ignoring state journal {self.path} with unknown version.")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Could not read state journal {self.path}: {e}")
+        return {"version": JOURNAL_VERSION, "roles": {}}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.data, f, indent=2, default=str)
+        os.replace(tmp_path, self.path)
+
+    def steps(self, role):
+        return self.data["roles"].get(role, {}).get("steps", {})
+
+    def entry(self, role, step):
+        return self.steps(role).get(step)
+
+    def role_data(self, role):
+        return self.data["roles"].setdefault(role, {})
+
+    def is_checkpoint(self, role, step):
+        """Whether the step completed in an earlier run, whatever its inputs are now (for --resume)"""
+        entry = self.entry(role, step)
+        return bool(entry) and entry.get("outcome") == "ok"
+
+    def start_run(self, role):
+        with self._lock:
+            self.role_data(role)["last_run"] = {"started_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "outcome": "running"}
+            self.data["last_role"] = role
+            self._save()
+
+    def finish_run(self, role, outcome):
+        with self._lock:
+            self.role_data(role).setdefault("last_run", {}).update(
+                outcome=outcome, finished_at=time.strftime("%Y-%m-%dT%H:%M:%S"))
+            self._save()
+
+    def add_undo(self, role, step, action):
+        """Remember how to revert one change a step made; saved at once so a crash cannot lose it"""
+        with self._lock:
+            undo = self.role_data(role).setdefault("undo", [])
+            entry = {"step": step, "action": action}
+            if entry not in undo:
+                undo.append(entry)
+                self._save()
+
+    def undo_entries(self, role):
+        return list(self.data["roles"].get(role, {}).get("undo", []))
+
+    def remove_undo(self, role, entry):
+        with self._lock:
+            undo = self.role_data(role).get("undo", [])
+            if entry in undo:
+                undo.remove(entry)
+                self._save()
+
+    def forget_role(self, role):
+        """Drop the role's checkpoints after a rollback; undo actions that could not run are kept"""
+        with self._lock:
+            remaining = self.data["roles"].pop(role, {}).get("undo")
+            if remaining:
+                self.data["roles"][role] = {"undo": remaining}
+            elif self.data.get("last_role") == role:
+                self.data.pop("last_role")
+            self._save()
+
+    def is_current(self, role, step, inputs):
+        entry = self.entry(role, step)
+        return bool(entry) and entry.get("outcome") == "ok" and entry.get("inputs_hash") == inputs_hash(inputs)
+
+    def record(self, role, step, inputs, outcome, duration=None, error=None):
+        with self._lock:
+            steps = self.role_data(role).setdefault("steps", {})
+            steps[step] = {
+                "inputs": inputs,
+                "inputs_hash": inputs_hash(inputs),
+                "outcome": outcome,
+                "error": str(error) if error else None,
+                "duration": round(duration, 3) if duration is not None else None,
+                "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            }
+            self._save()
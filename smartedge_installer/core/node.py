@@ -1,49 +1,80 @@
 from smartedge_installer.core.base_installer import BaseInstaller
+from smartedge_installer.core.benchmarks import bench_nikss
+from smartedge_installer.core.planner import Action
+from smartedge_installer.core.probes import PROBE_GITHUB, probe_kernel_bpf, probe_wireless
+from smartedge_installer.core.scheduler import Step
+from smartedge_installer.constants import PROGRAM_DIR, REQUIREMENTS_DIR
+from smartedge_installer.utils.build_cache import (
+    BuildCache, compiler_version, os_release, install_staging_dir, make_staging_dir, remove_staging_dir,
+    staged_paths
+)
 from smartedge_installer.utils.logger import get_logger
+from smartedge_installer.utils.native_build import NativeBuild, build_jobs, ccache_env
+from smartedge_installer.utils.runner import query, run_command
+from smartedge_installer.utils.source_cache import SourceCache
 import subprocess
-import venv
 import os
+import platform
+import shutil
 import logging
 logger = get_logger("NodeInstaller")
 
+NIKSS_REPO_URL = "https://github.com/NIKSS-vSwitch/nikss.git"
+NIKSS_DIR = os.path.expanduser("~/nikss")
+NIKSS_FINGERPRINT_FILE = os.path.join(PROGRAM_DIR, ".nikss_fingerprint")
+BASE_APT_PACKAGES = ["net-tools", "screen", "python3-pip", "python3-venv", "iproute2", "ethtool"]
+NIKSS_BUILD_DEPS = ["make", "cmake", "gcc", "git", "libgmp-dev", "libelf-dev", "zlib1g-dev", "libjansson-dev",
+                    "ccache"]
+NIKSS_MEMORY_PER_JOB_MB = 512
+
 class NodeInstaller(BaseInstaller):
-    def __init__(self):
-        super().__init__()
+    SYSTEM_PIP_PACKAGES = ["psutil"]
+    REQUIREMENTS_FILE = os.path.join(REQUIREMENTS_DIR, "node.txt")
+    ROLE_ALIAS = "sn"
+    BENCHMARKS = (bench_nikss,)
+    LOOPBACK_ALIAS = "127.1.0.2"
+    MIN_MEMORY_MB = NIKSS_MEMORY_PER_JOB_MB
+    PROBES = BaseInstaller.PROBES + (PROBE_GITHUB, probe_kernel_bpf, probe_wireless)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
         logger.info("NodeInstaller: Initialized installer.")
 
-    def run(self):
-        print("\n➡️  Starting installation for: Node")
-        logger.info("NodeInstaller: Starting installation sequence.")
-
-        self.pre_checks()
-        self.install_dependencies()
-        self.setup_virtualenv_and_install_python_deps()
-        self.configure_network()
-        self.validate_installation()
-        logger.info("NodeInstaller: ✅ Installation completed successfully.")
+    def steps(self):
+        return [
+            Step("pre_checks", self.pre_checks),
+            self.program_repo_step(),
+            Step("apt_packages", self.install_planned_packages, ["pre_checks"],
+                 apt_packages=BASE_APT_PACKAGES, inputs=self.apt_inputs, check=self.check_apt),
+            Step("pip_packages", self.install_system_pip_packages, ["apt_packages"],
+                 inputs=lambda: {"packages": self.SYSTEM_PIP_PACKAGES, "python": platform.python_version()},
+                 check=lambda: self.check_pip(self.SYSTEM_PIP_PACKAGES)),
+            Step("install_nikss", self.install_nikss, ["apt_packages"], apt_packages=NIKSS_BUILD_DEPS,
+                 check=self.check_nikss),
+            Step("python_venv", self.setup_virtualenv_and_install_python_deps, ["apt_packages"],
+                 inputs=self.venv_inputs, check=self.check_venv),
+            Step("configure_network", self.configure_network, ["python_venv"], exclusive=True,
+                 inputs=self.network_inputs, check=self.check_network),
+            Step("validate_installation", self.validate_installation,
+                 ["pip_packages", "install_nikss", "configure_network", "program_repo"], exclusive=True),
+        ]
 
     def pre_checks(self):
         self.logger.info("Running pre-checks for Node...")
         # Ensure script is not run as root
         if os.geteuid() == 0:
             self.logger.warning("It is recommended to run the installer as a normal user with sudo access, not as root.")
+        self.check_readiness()
 
     def install_dependencies(self):
         self.logger.info("Installing dependencies for Node...")
-
-        apt_packages = [
-            "net-tools", "screen", "python3-pip", "python3-venv", "iproute2", "ethtool",
-            "make", "cmake", "gcc", "git", "libgmp-dev", "libelf-dev", "zlib1g-dev", "libjansson-dev"
-        ]
-        self.install_apt_dependencies(apt_packages)
-
-        pip_packages = [
-            "psutil"
-        ]
-        self.install_pip_dependencies(pip_packages)
-
+        self.install_planned_packages()
+        self.install_system_pip_packages()
         self.install_nikss()
 
+    def install_system_pip_packages(self):
+        self.install_pip_dependencies(self.SYSTEM_PIP_PACKAGES)
+
     def install_nikss(self):
         self.logger.info("Installing NIKSS from source...")
         try:
@@ -54,50 +85,127 @@ class NodeInstaller(BaseInstaller):
                 self.logger.error(f"NIKSS installation script not found at {install_script}")
                 return
 
-            subprocess.run(["bash", install_script], check=True)
+            commit = self.resolve_nikss_commit()
+            if commit is None:
+                self.logger.warning("Could not resolve the NIKSS commit. Building without the cache.")
+                # The package plan already installed the build dependencies; the script must not run apt again
+                env = dict(os.environ, NIKSS_DIR=NIKSS_DIR, NIKSS_SKIP_APT="1",
+                           NIKSS_JOBS=str(build_jobs(NIKSS_MEMORY_PER_JOB_MB)), **ccache_env(NIKSS_DIR))
+                run_command(["bash", install_script], "nikss", progress="make", env=env)
+                self.logger.info("NIKSS installed successfully.")
+                return
+
+            cache = BuildCache("nikss")
+            inputs = self.nikss_build_inputs(commit)
+            key = cache.key(inputs)
+
+            if self.read_nikss_fingerprint() == key and shutil.which("nikss-ctl"):
+                self.logger.info("✅ NIKSS is already installed for this fingerprint. Nothing to build.")
+                return
+
+            if cache.has(key):
+                self.record_new_files(*cache.members(key))
+            if not cache.restore(key):
+                staging_dir = make_staging_dir("nikss")
+                try:
+                    SourceCache(NIKSS_REPO_URL).checkout(commit, NIKSS_DIR, submodules=True)
+                    build = self.build_nikss(staging_dir)
+                    self.record_new_files(*staged_paths(staging_dir))
+                    install_staging_dir(staging_dir)
+                    try:
+                        cache.store(key, staging_dir, inputs, build.summary())
+                    except (OSError, subprocess.CalledProcessError) as e:
+                        self.logger.warning(f"⚠️ Could not store the NIKSS build in the cache: {e}")
+                finally:
+                    remove_staging_dir(staging_dir)
+
+            self.write_nikss_fingerprint(key)
             self.logger.info("NIKSS installed successfully.")
-        except subprocess.CalledProcessError as e:
+        except subprocess.SubprocessError as e:
+            # Fail the step, so the journal keeps no checkpoint for a missing NIKSS
             self.logger.error(f"Failed to install NIKSS: {e}")
+            raise
+
+    def build_nikss(self, staging_dir):
+        """Same build as install_nikss.sh, staged into staging_dir and timed per target"""
+        build = NativeBuild("nikss", NIKSS_DIR, NIKSS_MEMORY_PER_JOB_MB)
+        build.run("libbpf", ["./build_libbpf.sh"])
+        build_dir = os.path.join(NIKSS_DIR, "build")
+        os.makedirs(build_dir, exist_ok=True)
+        build.run("cmake", ["cmake", "-DCMAKE_BUILD_TYPE=Release", ".."], cwd=build_dir)
+        build.make("compile", cwd=build_dir)
+        build.make("install", "install", f"DESTDIR={staging_dir}", cwd=build_dir)
+        ld_conf_dir = os.path.join(staging_dir, "etc", "ld.so.conf.d")
+        os.makedirs(ld_conf_dir, exist_ok=True)
+        with open(os.path.join(ld_conf_dir, "nikss.conf"), "w") as f:
+            f.write("/usr/local/lib\n")
+        return build
+
+    def nikss_build_inputs(self, commit):
+        return {
+            "commit": commit,
+            "kernel": platform.release(),
+            "compiler": compiler_version("gcc"),
+            "os_release": os_release(),
+        }
+
+    def check_nikss(self):
+        commit = self.resolve_nikss_commit()
+        if commit is None:
+            return [Action("build NIKSS from source (commit unknown, no build cache)")]
+        cache = BuildCache("nikss")
+        key = cache.key(self.nikss_build_inputs(commit))
+        if self.read_nikss_fingerprint() == key and shutil.which("nikss-ctl"):
+            return []
+        if cache.has(key):
+            return [Action(f"restore NIKSS {commit[:12]} from the build cache", 0)]
+        return [Action(f"build NIKSS {commit[:12]} for kernel {platform.release()} from source")]
+
+    def resolve_nikss_commit(self):
+        if self.bundle:
+            # Offline: use the commit of a bundled build that matches this host
+            cached = BuildCache("nikss").find(kernel=platform.release(), compiler=compiler_version("gcc"),
+                                              os_release=os_release())
+            return cached["inputs"]["commit"] if cached else None
+
+        try:
+            result = query(["git", "ls-remote", NIKSS_REPO_URL, "HEAD"], timeout=30, check=True)
+            if result.stdout.strip():
+                return result.stdout.split()[0]
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired, FileNotFoundError):
+            pass
+
+        # Offline: fall back to whatever an existing clone has checked out
+        if os.path.isdir(os.path.join(NIKSS_DIR, ".git")):
+            result = query(["git", "-C", NIKSS_DIR, "rev-parse", "HEAD"])
+            if result.returncode == 0:
+                return result.stdout.strip()
+        return None
+
+    def read_nikss_fingerprint(self):
+        try:
+            with open(NIKSS_FINGERPRINT_FILE) as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    def write_nikss_fingerprint(self, key):
+        os.makedirs(os.path.dirname(NIKSS_FINGERPRINT_FILE), exist_ok=True)
+        with open(NIKSS_FINGERPRINT_FILE, "w") as f:
+            f.write(key + "\n")
 
     def configure_network(self):
         self.logger.info("No specific network configuration needed for Node at this stage.")
-        venv_python = os.path.expanduser("~/smartedge_program/.venv/bin/python")
-        script_path = os.path.expanduser("~/setup_smartedge/smartedge_installer/scripts/node_interface_prompt.py")
-        subprocess.run([venv_python, script_path])
-        try:
-            logger.info("NodeInstaller: Adding loopback alias lo:0 with IP 127.1.0.2/32")
-            subprocess.run(
-                ["sudo", "ip", "addr", "add", "127.1.0.2/32", "dev", "lo", "label", "lo:0"],
-                check=True
-            )
-            logger.info("✅ Loopback alias lo:0 configured successfully.")
-        except subprocess.CalledProcessError as e:
-            logger.error(f"❌ Failed to configure loopback alias: {e}")
+        self.run_interface_script("node_interface_prompt", self.INTERFACE_NAMES)
 
     def validate_installation(self):
         self.logger.info("Validating Node setup...")
-        # Check if nikss-ctl is available
-        result = subprocess.run(["which", "nikss-ctl"], stdout=subprocess.PIPE)
-        if result.returncode == 0:
+        problems = self.validation_problems()
+        for problem in problems:
+            self.logger.warning(f"❌ {problem}")
+        if not problems:
             self.logger.info("✅ nikss-ctl is correctly installed.")
-        else:
-            self.logger.warning("❌ nikss-ctl was not found in PATH.")
         self.post_install_prompt()
 
-    def setup_virtualenv_and_install_python_deps(self):
-        logger.info("NodeInstaller: Setting up Python venv and installing Python dependencies...")
-        project_dir = os.path.expanduser("~/smartedge_program")
-        venv_dir = os.path.join(project_dir, ".venv")
-
-        if not os.path.exists(venv_dir):
-            venv.create(venv_dir, with_pip=True)
-
-        pip_path = os.path.join(venv_dir, "bin", "pip")
-
-        # UPDATED: path to requirements inside setup_smartedge
-        requirements_path = os.path.expanduser(
-            "~/setup_smartedge/smartedge_installer/requirements/node.txt"
-        )
-
-        subprocess.run([pip_path, "install", "--upgrade", "pip"])
-        subprocess.run([pip_path, "install", "-r", requirements_path])
+    def validation_problems(self):
+        return [] if shutil.which("nikss-ctl") else ["nikss-ctl was not found in PATH."]
@@ -0,0 +1,187 @@
+import os
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from smartedge_installer.constants import INSTALLER_ROOT, ROLE_CHOICES
+from smartedge_installer.utils.logger import get_logger
+from smartedge_installer.utils.runner import NETWORK_TIMEOUT, query, run_command
+
+logger = get_logger("Orchestrator")
+
+REMOTE_INSTALLER_DIR = "setup_smartedge"
+PUSH_EXCLUDES = [".git", "__pycache__", "*.pyc", "cache"]
+STAND_IN_IMAGE = "ubuntu:22.04"
+
+_print_lock = threading.Lock()
+
+
+def role_order(hosts):
+    """Roles of hosts in registration order (coordinators, access points, nodes, then roles added with
+    register_role); roles the registry does not know come last"""
+    roles = {host.role for host in hosts}
+    return [role for role in ROLE_CHOICES if role in roles] + sorted(roles - set(ROLE_CHOICES))
+
+
+def _printer(prefix):
+    def print_line(line):
+        with _print_lock:
+            sys.stdout.write(f"{prefix}{line}\n")
+            sys.stdout.flush()
+    return print_line
+
+
+def _tar_command(source):
+    command = ["tar", "-C", source, "-cf", "-"]
+    for pattern in PUSH_EXCLUDES:
+        command.append(f"--exclude={pattern}")
+    return command + ["."]
+
+
+def _pipe(producer_cmd, consumer_cmd):
+    # The tar stream is binary, so only the consumer's own output goes through the runner
+    producer = subprocess.Popen(producer_cmd, stdout=subprocess.PIPE)
+    consumer = run_command(consumer_cmd, consumer_cmd[0], check=False, stdin=producer.stdout)
+    producer.stdout.close()
+    if producer.wait() != 0 or consumer.returncode != 0:
+        raise RuntimeError(f"Failed to copy files with {' '.join(consumer_cmd[:2])}")
+
+
+class Transport:
+    def __init__(self, host):
+        self.host = host
+
+    def command(self, shell_command):
+        """Return the argv that runs shell_command on the host"""
+        raise NotImplementedError
+
+    def prepare(self):
+        pass
+
+    def push(self, source, dest):
+        _pipe(_tar_command(source), self.command(f"mkdir -p {dest} && tar -C {dest} -xf -"))
+
+    def push_file(self, path, dest, name):
+        _pipe(["tar", "-C", os.path.dirname(path), "-cf", "-", f"--transform=s|.*|{name}|", os.path.basename(path)],
+              self.command(f"mkdir -p {dest} && tar -C {dest} -xf -"))
+
+    def run(self, shell_command, prefix):
+        return run_command(self.command(shell_command), "remote", check=False, level=None,
+                           on_line=_printer(prefix)).returncode
+
+
+class SSHTransport(Transport):
+    """Runs the installer on a remote machine over ssh"""
+
+    def __init__(self, host):
+        super().__init__(host)
+        address = host.extra.get("address", host.name)
+        user = host.extra.get("ssh_user")
+        self.target = f"{user}@{address}" if user else address
+
+    def command(self, shell_command):
+        return ["ssh", "-o", "BatchMode=yes", self.target, shell_command]
+
+
+class ContainerTransport(Transport):
+    """Local stand-in for a real host: one privileged Docker container per inventory entry"""
+
+    def __init__(self, host):
+        super().__init__(host)
+        self.container = host.extra.get("container", f"smartedge-{host.name}")
+
+    def command(self, shell_command):
+        return ["sudo", "docker", "exec", "-i", self.container, "bash", "-lc", shell_command]
+
+    def prepare(self):
+        running = query(["sudo", "docker", "inspect", "-f", "{{.State.Running}}", self.container])
+        if running.stdout.strip() == "true":
+            return
+        if running.returncode == 0:
+            run_command(["sudo", "docker", "start", self.container], "docker")
+            return
+        run_command(["sudo", "docker", "run", "-d", "--privileged", "--hostname", self.host.name,
+                     "--name", self.container, STAND_IN_IMAGE, "sleep", "infinity"], "docker")
+        # A bare Ubuntu image lacks the tools a freshly installed host has
+        packages = "sudo python3 python3-tomli iproute2 iputils-ping"
+        run_command(self.command(f"apt-get update && apt-get install -y {packages}"), "apt", timeout=NETWORK_TIMEOUT)
+
+
+TRANSPORTS = {
+    "ssh": SSHTransport,
+    "container": ContainerTransport,
+}
+
+
+class HostResult:
+    def __init__(self, host, returncode, duration, error=None):
+        self.host = host
+        self.returncode = returncode
+        self.duration = duration
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.returncode == 0 and self.error is None
+
+
+class Orchestrator:
+    """Provisions every inventory host concurrently, one role wave at a time"""
+
+    def __init__(self, inventory, transport="ssh", concurrency=4, installer_args=()):
+        self.inventory = inventory
+        self.transport_cls = TRANSPORTS[transport]
+        self.concurrency = concurrency
+        self.installer_args = list(installer_args)
+
+    def inventory_name(self):
+        return "inventory" + os.path.splitext(self.inventory.path)[1]
+
+    def remote_command(self, host):
+        args = ["--inventory", self.inventory_name(), "--host", host.name] + self.installer_args
+        return f"cd ~/{REMOTE_INSTALLER_DIR} && bash Bootstrap.sh {' '.join(shlex.quote(a) for a in args)}"
+
+    def provision(self, host):
+        prefix = f"[{host.name}] "
+        started = time.monotonic()
+        transport = self.transport_cls(host)
+        try:
+            transport.prepare()
+            transport.push(INSTALLER_ROOT, f"~/{REMOTE_INSTALLER_DIR}")
+            transport.push_file(os.path.abspath(self.inventory.path), f"~/{REMOTE_INSTALLER_DIR}",
+                                self.inventory_name())
+            returncode = transport.run(self.remote_command(host), prefix)
+            return HostResult(host, returncode, time.monotonic() - started)
+        except (OSError, RuntimeError, subprocess.SubprocessError) as e:
+            logger.error(f"{prefix}❌ {e}")
+            return HostResult(host, None, time.monotonic() - started, e)
+
+    def run(self, host_names=None):
+        hosts = [self.inventory.host(name) for name in host_names] if host_names \
+            else list(self.inventory.hosts.values())
+        results = []
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="host") as pool:
+            for role in role_order(hosts):
+                wave = [host for host in hosts if host.role == role]
+                if not wave:
+                    continue
+                logger.info(f"🚀 Provisioning {len(wave)} {ROLE_CHOICES.get(role, role)} host(s): "
+                            f"{', '.join(host.name for host in wave)}")
+                wave_results = list(pool.map(self.provision, wave))
+                results.extend(wave_results)
+                failed = [result.host.name for result in wave_results if not result.ok]
+                if failed:
+                    # Later roles need the earlier ones (nodes and APs register with the coordinator)
+                    logger.error(f"❌ {ROLE_CHOICES[role]} provisioning failed on {', '.join(failed)}. "
+                                 f"Stopping before the remaining roles.")
+                    break
+        self.print_summary(results)
+        return results
+
+    def print_summary(self, results):
+        print(f"\n{'Host':<24} {'Role':<14} {'Result':<8} {'Time (s)':>9}")
+        for result in results:
+            status = "ok" if result.ok else "failed"
+            print(f"{result.host.name:<24} {ROLE_CHOICES[result.host.role]:<14} {status:<8} {result.duration:>9.1f}")
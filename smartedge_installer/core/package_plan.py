@@ -0,0 +1,81 @@
+import glob
+import os
+import threading
+import time
+from smartedge_installer.utils.logger import get_logger
+from smartedge_installer.utils.runner import NETWORK_POLICY, QUERY_TIMEOUT, query, run_command
+
+logger = get_logger("PackagePlan")
+
+APT_LISTS_DIR = "/var/lib/apt/lists"
+# Package indexes refreshed more recently than this are reused instead of running apt-get update again
+APT_UPDATE_MAX_AGE = 60 * 60
+
+_apt_lock = threading.Lock()
+
+
+def installed_packages(packages, timeout=QUERY_TIMEOUT):
+    if not packages:
+        return set()
+    result = query(["dpkg-query", "-W", "-f", "${Package}\t${db:Status-Abbrev}\n"] + list(packages),
+                   timeout=timeout)
+    installed = set()
+    for line in result.stdout.splitlines():
+        name, _, status = line.partition("\t")
+        if status.startswith("ii"):
+            installed.add(name.split(":")[0])
+    return installed
+
+
+def apt_source_files():
+    """Classic one-line and deb822 apt source files, main list first"""
+    return ["/etc/apt/sources.list"] + sorted(glob.glob("/etc/apt/sources.list.d/*.list")
+                                              + glob.glob("/etc/apt/sources.list.d/*.sources"))
+
+
+def apt_lists_age():
+    try:
+        return time.time() - os.path.getmtime(APT_LISTS_DIR)
+    except OSError:
+        return None
+
+
+class PackagePlan:
+    """Collects the apt packages of every step and installs the missing ones in one transaction"""
+
+    def __init__(self, packages=()):
+        self.packages = []
+        self.add(packages)
+
+    def add(self, packages):
+        for package in packages:
+            if package not in self.packages:
+                self.packages.append(package)
+
+    def missing(self, timeout=QUERY_TIMEOUT):
+        installed = installed_packages(self.packages, timeout)
+        return [package for package in self.packages if package not in installed]
+
+    def apply(self, bundle=None, refresh=False):
+        """Install what is missing; returns the packages this call installed
+
+        refresh runs apt-get update whatever the age of the indexes (e.g. after an apt source was added).
+        """
+        if bundle:
+            return bundle.install_apt()
+
+        # apt holds a global lock anyway; serialise here so parallel steps never race for it
+        with _apt_lock:
+            missing = self.missing()
+            if not missing:
+                logger.info(f"✅ All {len(self.packages)} system packages are already installed.")
+                return []
+
+            logger.info(f"📦 Installing {len(missing)} of {len(self.packages)} system packages: {', '.join(missing)}")
+            age = apt_lists_age()
+            if refresh or age is None or age > APT_UPDATE_MAX_AGE:
+                run_command(["sudo", "apt-get", "update"], "apt", **NETWORK_POLICY)
+            else:
+                logger.info(f"Package indexes are {int(age // 60)} minutes old. Skipping apt-get update.")
+            run_command(["sudo", "apt-get", "install", "-y"] + missing, "apt", **NETWORK_POLICY)
+            return missing
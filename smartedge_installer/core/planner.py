@@ -0,0 +1,178 @@
+import glob
+import json
+import os
+import statistics
+import subprocess
+from smartedge_installer.constants import REPORTS_DIR
+from smartedge_installer.utils.logger import get_logger
+from smartedge_installer.utils.runner import query
+
+logger = get_logger("Planner")
+
+# Past runs consulted for duration and download estimates
+HISTORY_RUNS = 10
+
+
+class Action:
+    """Something a step still has to do on this machine"""
+
+    def __init__(self, summary, download_bytes=None):
+        self.summary = summary
+        # None when the size cannot be known in advance (e.g. a source build)
+        self.download_bytes = download_bytes
+
+    def __repr__(self):
+        return f"Action({self.summary!r})"
+
+
+def apt_download_bytes(packages):
+    """Bytes apt would download to install packages and their dependencies (None if unknown)"""
+    try:
+        result = query(["apt-get", "install", "--print-uris", "-qq", "-y"] + list(packages))
+    except FileNotFoundError:
+        return None
+    if result.returncode != 0:
+        return None
+    # Each line: 'URI' file_name size hash
+    return sum(int(fields[2]) for fields in (line.split() for line in result.stdout.splitlines())
+               if len(fields) >= 3 and fields[0].startswith("'") and fields[2].isdigit())
+
+
+def past_step_costs(role, reports_dir=REPORTS_DIR, runs=HISTORY_RUNS):
+    """Median duration and download of each step over the last runs that actually executed it"""
+    paths = sorted(glob.glob(os.path.join(reports_dir, f"run-{role}-*.json")))[-runs:]
+    samples = {}
+    for path in paths:
+        try:
+            with open(path) as f:
+                report = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for record in report.get("steps", []):
+            if record.get("status") == "ok" and record.get("duration") is not None:
+                samples.setdefault(record["name"], []).append(record)
+    return {
+        name: {
+            "seconds": statistics.median(record["duration"] for record in records),
+            "download_bytes": statistics.median(record.get("net_rx_bytes", 0) for record in records),
+            "runs": len(records),
+        }
+        for name, records in samples.items()
+    }
+
+
+def _format_bytes(value):
+    if value is None:
+        return "?"
+    return f"{value / 2**20:.1f} MB"
+
+
+class InstallPlan:
+    """What an installation would do on this machine, without doing any of it"""
+
+    def __init__(self, role, steps, costs, blockers=()):
+        self.role = role
+        self.steps = steps
+        self.costs = costs
+        self.blockers = list(blockers)
+        # step name -> list of Actions; None for steps without a check, which always run
+        self.actions = {}
+
+    @classmethod
+    def build(cls, installer, reports_dir=REPORTS_DIR):
+        role = installer.__class__.__name__
+        plan = cls(role, installer.steps(), past_step_costs(role, reports_dir), installer.plan_blockers())
+        for step in plan.steps:
+            if step.check is None:
+                plan.actions[step.name] = None
+                continue
+            try:
+                plan.actions[step.name] = list(step.check())
+            except (OSError, subprocess.SubprocessError) as e:
+                logger.warning(f"⚠️ Could not inspect the state of '{step.name}': {e}")
+                plan.actions[step.name] = [Action(f"state unknown ({e}); the step will run")]
+        return plan
+
+    def pending(self):
+        return [step for step in self.steps if self.actions[step.name]]
+
+    def step_seconds(self, name):
+        actions = self.actions[name]
+        if actions is not None and not actions:
+            return 0.0
+        cost = self.costs.get(name)
+        return cost["seconds"] if cost else None
+
+    def step_download(self, name):
+        actions = self.actions[name]
+        if not actions:
+            return 0
+        sizes = [action.download_bytes for action in actions]
+        if all(size is not None for size in sizes):
+            return sum(sizes)
+        cost = self.costs.get(name)
+        return cost["download_bytes"] if cost else None
+
+    def estimated_seconds(self):
+        """Longest dependency chain, since independent steps run in parallel (None if a step has no history)"""
+        finish = {}
+        for step in self.steps:
+            own = self.step_seconds(step.name)
+            if own is None and self.actions[step.name] is None:
+                # Checks and prompts without history: quick compared to the real work
+                own = 0.0
+            elif own is None:
+                return None
+            finish[step.name] = own + max((finish[dep] for dep in step.depends_on), default=0.0)
+        return max(finish.values(), default=0.0)
+
+    def download_bytes(self):
+        sizes = [self.step_download(step.name) for step in self.pending()]
+        return None if None in sizes else sum(sizes)
+
+    def report(self):
+        return {
+            "role": self.role,
+            "blockers": self.blockers,
+            "pending": [step.name for step in self.pending()],
+            "estimated_seconds": self.estimated_seconds(),
+            "download_bytes": self.download_bytes(),
+            "steps": [
+                {
+                    "name": step.name,
+                    "state": ("always runs" if self.actions[step.name] is None
+                              else "pending" if self.actions[step.name] else "up to date"),
+                    "actions": [action.summary for action in self.actions[step.name] or []],
+                    "estimated_seconds": self.step_seconds(step.name),
+                    "download_bytes": self.step_download(step.name),
+                }
+                for step in self.steps
+            ],
+        }
+
+    def format(self):
+        lines = [f"Plan for {self.role}:"]
+        for blocker in self.blockers:
+            lines.append(f"  ⛔ {blocker}")
+        for step in self.steps:
+            actions = self.actions[step.name]
+            if actions == []:
+                lines.append(f"  ✅ {step.name}: up to date")
+                continue
+            seconds = self.step_seconds(step.name)
+            estimate = f"~{seconds:.0f}s" if seconds is not None else "no history"
+            if actions is None:
+                lines.append(f"  🔁 {step.name}: always runs ({estimate})")
+                continue
+            lines.append(f"  ▶️  {step.name} ({estimate}, download {_format_bytes(self.step_download(step.name))}):")
+            lines.extend(f"       - {action.summary}" for action in actions)
+
+        pending = self.pending()
+        if not pending:
+            lines.append("Nothing to install; a run would only repeat the checks.")
+            return "\n".join(lines)
+        total = self.estimated_seconds()
+        lines.append(f"{len(pending)} step(s) to run, about "
+                     f"{f'{total / 60:.1f} min' if total is not None else '? (no run history for every step)'}, "
+                     f"download {_format_bytes(self.download_bytes())}.")
+        return "\n".join(lines)
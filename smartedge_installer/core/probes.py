@@ -0,0 +1,428 @@
+import concurrent.futures
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import time
+import urllib.parse
+import urllib.request
+from smartedge_installer.constants import PROGRAM_DIR, PROGRAM_REPO_URL, REPORTS_DIR
+from smartedge_installer.core.bootstrap import CLONED, FOREIGN, program_repo_state
+from smartedge_installer.core.package_plan import apt_source_files
+from smartedge_installer.utils.logger import get_logger
+from smartedge_installer.utils.native_build import available_memory_mb
+from smartedge_installer.utils.runner import query
+from smartedge_installer.utils.source_cache import SourceCache
+
+logger = get_logger("Readiness")
+
+# Seconds each probe may take; every probe runs at the same time, so this is also roughly the total
+LOCAL_BUDGET = float(os.environ.get("SMARTEDGE_PROBE_BUDGET", "0.5"))
+NETWORK_BUDGET = LOCAL_BUDGET * 1.6
+# Below this the apt mirror is reported as slow
+MIN_MIRROR_MBPS = float(os.environ.get("SMARTEDGE_MIN_MIRROR_MBPS", "1"))
+# NIKSS needs BPF ring buffers and the other program types of Linux 5.8
+MIN_NIKSS_KERNEL = (5, 8)
+
+OK, WARN, FAIL, SKIP, TIMEOUT = "ok", "warn", "fail", "skip", "timeout"
+# Share of its weight each outcome adds to the score; an unanswered probe counts half
+SCORES = {OK: 1.0, SKIP: 1.0, WARN: 0.5, TIMEOUT: 0.5, FAIL: 0.0}
+
+
+class ProbeWarning(Exception):
+    pass
+
+
+class ProbeFailure(Exception):
+    """The installation would fail (or is pointless) on this host"""
+    pass
+
+
+class ProbeSkipped(Exception):
+    pass
+
+
+class NotReadyError(RuntimeError):
+    pass
+
+
+class Probe:
+    def __init__(self, name, func, budget=LOCAL_BUDGET, weight=1):
+        self.name = name
+        # func(installer, budget) returns a one-line finding or raises one of the Probe* exceptions
+        self.func = func
+        self.budget = budget
+        self.weight = weight
+
+    def __repr__(self):
+        return f"Probe({self.name!r})"
+
+
+def probe(name, budget=LOCAL_BUDGET, weight=1):
+    return lambda func: Probe(name, func, budget, weight)
+
+
+def _read_text(path):
+    try:
+        with open(path) as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+@probe("os_release", weight=2)
+def probe_os_release(installer, budget):
+    supported, dist = installer.ubuntu_version_supported()
+    if not supported:
+        # As before: other releases are not refused, only unsupported
+        raise ProbeWarning(f"OS version {dist or 'unknown'} is not supported (Ubuntu 22.04 or 24.04 LTS only)")
+    return f"Ubuntu {dist}"
+
+
+@probe("disk_space", weight=3)
+def probe_disk_space(installer, budget):
+    free_gb = installer.free_disk_gb()
+    if free_gb < installer.MIN_FREE_DISK_GB:
+        raise ProbeFailure(f"only {free_gb} GB free on /, {installer.MIN_FREE_DISK_GB} GB required")
+    return f"{free_gb} GB free on /"
+
+
+@probe("memory", weight=2)
+def probe_memory(installer, budget):
+    available = available_memory_mb()
+    if available is None:
+        raise ProbeSkipped("/proc/meminfo is not readable")
+    needed = installer.MIN_MEMORY_MB
+    if available >= needed:
+        return f"{available} MB available, {needed} MB needed"
+    swap = 0
+    for line in (_read_text("/proc/meminfo") or "").splitlines():
+        if line.startswith("SwapFree:"):
+            swap = int(line.split()[1]) // 1024
+    if available + swap >= needed:
+        raise ProbeWarning(f"{available} MB available, {needed} MB needed: compiling will swap and be slow")
+    raise ProbeFailure(f"{available} MB available (+{swap} MB swap), {needed} MB needed")
+
+
+def _kernel_config():
+    release = platform.release()
+    config = _read_text(f"/boot/config-{release}")
+    if config is None and os.path.exists("/proc/config.gz"):
+        import gzip
+        with gzip.open("/proc/config.gz", "rt") as f:
+            config = f.read()
+    if config is None:
+        return None
+    return dict(line.split("=", 1) for line in config.splitlines() if line.startswith("CONFIG_") and "=" in line)
+
+
+@probe("kernel_bpf", weight=3)
+def probe_kernel_bpf(installer, budget):
+    release = platform.release()
+    version = tuple(int(part) for part in release.split("-")[0].split(".")[:2] if part.isdigit())
+    if version < MIN_NIKSS_KERNEL:
+        raise ProbeFailure(f"kernel {release} is too old for NIKSS "
+                           f"(needs {'.'.join(map(str, MIN_NIKSS_KERNEL))} or newer)")
+    config = _kernel_config()
+    if config is not None:
+        missing = [option for option in ("CONFIG_BPF_SYSCALL", "CONFIG_BPF_JIT") if config.get(option) != "y"]
+        if missing:
+            raise ProbeFailure(f"kernel {release} is built without {', '.join(missing)}")
+    if not os.path.exists("/sys/kernel/btf/vmlinux"):
+        raise ProbeWarning(f"kernel {release} has BPF but no BTF (/sys/kernel/btf/vmlinux)")
+    if config is None:
+        raise ProbeWarning(f"kernel {release} has BTF; its build config could not be read")
+    return f"kernel {release} with BPF, JIT and BTF"
+
+
+def wireless_interfaces():
+    return sorted(name for name in os.listdir("/sys/class/net")
+                  if os.path.exists(f"/sys/class/net/{name}/wireless")
+                  or os.path.exists(f"/sys/class/net/{name}/phy80211"))
+
+
+def ap_capable_phys(iw_list):
+    """Names of the wiphys whose 'Supported interface modes' in `iw list` output include AP"""
+    phys, phy, in_modes = [], None, False
+    for line in iw_list.splitlines():
+        stripped = line.strip()
+        if line.startswith("Wiphy "):
+            phy, in_modes = line.split()[1], False
+        elif stripped == "Supported interface modes:":
+            in_modes = True
+        elif in_modes and stripped.startswith("* "):
+            if stripped[2:] == "AP" and phy not in phys:
+                phys.append(phy)
+        else:
+            in_modes = False
+    return phys
+
+
+@probe("wireless", weight=1)
+def probe_wireless(installer, budget):
+    interfaces = wireless_interfaces()
+    if not interfaces:
+        raise ProbeWarning("no wireless interface found for wlan0")
+    return f"wireless: {', '.join(interfaces)}"
+
+
+@probe("wireless_ap_mode", weight=3)
+def probe_wireless_ap_mode(installer, budget):
+    interfaces = wireless_interfaces()
+    if not interfaces:
+        raise ProbeFailure("no wireless interface found; the access point needs one that supports AP mode")
+    if not shutil.which("iw"):
+        raise ProbeWarning(f"wireless: {', '.join(interfaces)}; install 'iw' to check for AP mode")
+    result = query(["iw", "list"], timeout=budget)
+    phys = ap_capable_phys(result.stdout)
+    if not phys:
+        raise ProbeFailure(f"none of the wireless interfaces ({', '.join(interfaces)}) supports AP mode")
+    return f"AP mode supported by {', '.join(phys)}"
+
+
+@probe("docker_daemon", weight=2)
+def probe_docker_daemon(installer, budget):
+    if not shutil.which("docker"):
+        raise ProbeSkipped("Docker is not installed yet (the apt step installs it)")
+    # -n: never wait for a password prompt inside a probe
+    result = query(["sudo", "-n", "docker", "info", "--format", "{{.ServerVersion}} {{.Driver}}"], timeout=budget)
+    if result.returncode != 0:
+        error = (result.stderr.strip().splitlines() or ["no output"])[-1]
+        if "password is required" in error:
+            raise ProbeSkipped("needs a sudo password")
+        raise ProbeFailure(f"the Docker daemon is not healthy: {error}")
+    version, _, driver = result.stdout.strip().partition(" ")
+    if driver == "vfs":
+        raise ProbeWarning(f"Docker {version} uses the vfs storage driver: image pulls copy every layer")
+    return f"Docker {version} ({driver})"
+
+
+def _connect(host, port, budget):
+    started = time.monotonic()
+    with socket.create_connection((host, port), timeout=budget):
+        return time.monotonic() - started
+
+
+def apt_mirror():
+    """First http(s) URI of the apt sources (classic one-line or deb822), or None"""
+    for path in apt_source_files():
+        for line in (_read_text(path) or "").splitlines():
+            fields = line.split("#", 1)[0].split()
+            if fields[:1] == ["deb"]:
+                uris = [field for field in fields[1:] if not field.startswith("[")]
+            elif fields[:1] == ["URIs:"]:
+                uris = fields[1:]
+            else:
+                continue
+            for uri in uris:
+                if uri.startswith(("http://", "https://")):
+                    return uri.rstrip("/")
+    return None
+
+
+def measure_download(url, budget):
+    """Bytes per second reading url until budget runs out (a rough figure that includes TCP slow start)"""
+    deadline = time.monotonic() + budget
+    with urllib.request.urlopen(url, timeout=budget) as response:
+        started = time.monotonic()
+        received = 0
+        while time.monotonic() < deadline:
+            chunk = response.read(64 * 1024)
+            if not chunk:
+                break
+            received += len(chunk)
+    elapsed = time.monotonic() - started
+    return received / elapsed if elapsed > 0 else None
+
+
+@probe("apt_mirror", budget=NETWORK_BUDGET, weight=3)
+def probe_apt_mirror(installer, budget):
+    if installer.bundle:
+        raise ProbeSkipped("offline install from a bundle")
+    deadline = time.monotonic() + budget
+    mirror = apt_mirror()
+    if mirror is None:
+        raise ProbeWarning("no http(s) apt source found")
+    url = urllib.parse.urlparse(mirror)
+    try:
+        _connect(url.hostname, url.port or (443 if url.scheme == "https" else 80), budget / 2)
+    except OSError as e:
+        try:
+            # Bounded by what is left of the budget: dpkg-query on a busy disk must not hold up the report
+            missing = installer.package_plan().missing(timeout=max(deadline - time.monotonic(), 0.05))
+        except subprocess.SubprocessError:
+            raise ProbeFailure(f"apt mirror {url.hostname} is unreachable ({e})")
+        if missing:
+            raise ProbeFailure(f"apt mirror {url.hostname} is unreachable ({e}) and "
+                               f"{len(missing)} package(s) are missing")
+        raise ProbeWarning(f"apt mirror {url.hostname} is unreachable ({e}); every package is installed")
+    codename = platform.freedesktop_os_release().get("VERSION_CODENAME")
+    try:
+        arch = query(["dpkg", "--print-architecture"], timeout=max(deadline - time.monotonic(), 0.05)).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        arch = None
+    if not codename or not arch:
+        return f"{url.hostname} reachable"
+    try:
+        # The index this host's apt actually reads (arm64 mirrors often live elsewhere, e.g. ports.ubuntu.com)
+        rate = measure_download(f"{mirror}/dists/{codename}/main/binary-{arch}/Packages.gz",
+                                max(deadline - time.monotonic(), 0.05))
+    except OSError as e:
+        raise ProbeWarning(f"{url.hostname} reachable, but the download test failed: {e}")
+    if rate is None:
+        return f"{url.hostname} reachable"
+    if rate < MIN_MIRROR_MBPS * 2**20:
+        raise ProbeWarning(f"{url.hostname} is slow: {rate / 2**20:.2f} MB/s")
+    return f"{url.hostname} at {rate / 2**20:.1f} MB/s"
+
+
+@probe("program_repo", budget=NETWORK_BUDGET, weight=2)
+def probe_program_repo(installer, budget):
+    state = program_repo_state()
+    if state == FOREIGN:
+        raise ProbeFailure(f"{PROGRAM_DIR} exists but is not a git repository; delete or move it")
+    if state == CLONED:
+        return f"cloned in {PROGRAM_DIR}"
+    if installer.bundle:
+        return "cloned from the offline bundle"
+    if os.path.isdir(SourceCache(PROGRAM_REPO_URL).path):
+        return "cloned from the source cache"
+    url = urllib.parse.urlparse(PROGRAM_REPO_URL)
+    try:
+        seconds = _connect(url.hostname, url.port or 443, budget)
+    except OSError as e:
+        raise ProbeFailure(f"{url.hostname} is unreachable ({e}) and the SmartEdge repository is not cloned yet")
+    return f"cloned from {url.hostname} (answered in {seconds * 1000:.0f} ms)"
+
+
+def endpoint_probe(name, address, failure, weight=1):
+    """Reachability of address ("host:port", or a callable(installer) returning one or None to skip)"""
+    def check(installer, budget):
+        if installer.bundle:
+            raise ProbeSkipped("offline install from a bundle")
+        target = address(installer) if callable(address) else address
+        if target is None:
+            raise ProbeSkipped("not used by this installation")
+        host, _, port = target.rpartition(":")
+        try:
+            seconds = _connect(host, int(port), budget)
+        except OSError as e:
+            raise failure(f"{host}:{port} is unreachable: {e}")
+        return f"{host} answered in {seconds * 1000:.0f} ms"
+    return Probe(name, check, NETWORK_BUDGET, weight)
+
+
+def _registry_address(installer):
+    if installer.registry_mirror:
+        url = urllib.parse.urlparse(installer.registry_mirror)
+        return f"{url.hostname}:{url.port or (443 if url.scheme == 'https' else 80)}"
+    return "registry-1.docker.io:443"
+
+
+# Without Docker Hub (or the mirror) the image pulls fail; the others have caches to fall back on
+PROBE_DOCKER_REGISTRY = endpoint_probe("docker_registry", _registry_address, ProbeFailure, weight=3)
+PROBE_PYPI = endpoint_probe("pypi", "files.pythonhosted.org:443", ProbeWarning, weight=2)
+PROBE_GITHUB = endpoint_probe("github", "github.com:443", ProbeWarning)
+
+
+class ProbeResult:
+    def __init__(self, probe, status, detail, seconds):
+        self.probe = probe
+        self.status = status
+        self.detail = detail
+        self.seconds = seconds
+
+    def as_dict(self):
+        return {"name": self.probe.name, "status": self.status, "detail": self.detail,
+                "seconds": round(self.seconds, 3), "weight": self.probe.weight}
+
+
+def _run_probe(probe, installer):
+    started = time.monotonic()
+    try:
+        status, detail = OK, probe.func(installer, probe.budget)
+    except ProbeWarning as e:
+        status, detail = WARN, str(e)
+    except ProbeFailure as e:
+        status, detail = FAIL, str(e)
+    except ProbeSkipped as e:
+        status, detail = SKIP, str(e)
+    except subprocess.TimeoutExpired:
+        status, detail = TIMEOUT, f"no answer within {probe.budget:.1f}s"
+    except Exception as e:
+        # A broken probe must never be what stops an installation
+        status, detail = WARN, f"probe error: {e}"
+    return ProbeResult(probe, status, detail, time.monotonic() - started)
+
+
+class ReadinessReport:
+    """Outcome of one concurrent run of a role's probes"""
+
+    def __init__(self, role, results, seconds):
+        self.role = role
+        self.results = results
+        self.seconds = seconds
+
+    @classmethod
+    def run(cls, installer, probes=None):
+        probes = list(installer.PROBES if probes is None else probes)
+        started = time.monotonic()
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(probes)), thread_name_prefix="probe")
+        futures = [(probe, pool.submit(_run_probe, probe, installer)) for probe in probes]
+        results = []
+        for probe, future in futures:
+            remaining = probe.budget - (time.monotonic() - started)
+            try:
+                # A little slack for the probe to report its own timeout first
+                results.append(future.result(timeout=max(remaining, 0) + 0.1))
+            except concurrent.futures.TimeoutError:
+                results.append(ProbeResult(probe, TIMEOUT, f"no answer within {probe.budget:.1f}s", probe.budget))
+        # Stragglers finish (their own timeouts are bounded by the budget) without holding up the report
+        pool.shutdown(wait=False, cancel_futures=True)
+        for result in results:
+            logger.debug(f"🩺 {result.probe.name}: {result.status} ({result.detail})")
+        return cls(installer.ROLE_ALIAS, results, time.monotonic() - started)
+
+    @property
+    def score(self):
+        total = sum(result.probe.weight for result in self.results)
+        if not total:
+            return 100
+        return round(100 * sum(result.probe.weight * SCORES[result.status] for result in self.results) / total)
+
+    @property
+    def failures(self):
+        return [result for result in self.results if result.status == FAIL]
+
+    @property
+    def ready(self):
+        return not self.failures
+
+    def report(self):
+        return {
+            "role": self.role,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "ready": self.ready,
+            "score": self.score,
+            "seconds": round(self.seconds, 3),
+            "probes": [result.as_dict() for result in self.results],
+        }
+
+    def write_report(self, directory=REPORTS_DIR):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"readiness-{self.role}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+        return path
+
+    def summary_table(self):
+        header = f"{'Probe':<18} {'Result':<8} {'Time (s)':>8}  Detail"
+        lines = [header, "-" * 72]
+        for result in self.results:
+            lines.append(f"{result.probe.name:<18} {result.status:<8} {result.seconds:>8.2f}  {result.detail}")
+        lines.append("-" * 72)
+        verdict = "ready" if self.ready else "NOT READY"
+        lines.append(f"Readiness score {self.score}/100 ({verdict}) in {self.seconds:.2f}s")
+        return "\n".join(lines)
@@ -0,0 +1,157 @@
+import json
+import os
+import subprocess
+import threading
+from smartedge_installer.constants import CACHE_DIR, INSTALLER_ROOT
+from smartedge_installer.utils.logger import get_logger
+from smartedge_installer.utils.runner import NETWORK_POLICY, NETWORK_TIMEOUT, STALL_TIMEOUT, query, run_command
+
+logger = get_logger("RegistryMirror")
+
+MIRROR_CONTAINER = "smartedge-registry"
+MIRROR_IMAGE = "registry:2"
+MIRROR_PORT = 5000
+MIRROR_DATA_DIR = os.path.join(CACHE_DIR, "registry")
+UPSTREAM_REGISTRY = "https://registry-1.docker.io"
+DOCKER_DAEMON_CONFIG = "/etc/docker/daemon.json"
+# Shipped with the installer so every host pulls exactly the same image content
+IMAGE_LOCK_FILE = os.path.join(INSTALLER_ROOT, "images.lock.json")
+
+
+def start_mirror():
+    """Start (or reuse) a pull-through cache of Docker Hub on this host"""
+    state = query(["sudo", "docker", "inspect", "-f", "{{.State.Running}}", MIRROR_CONTAINER])
+    if state.stdout.strip() == "true":
+        logger.info("Registry mirror is already running.")
+        return
+    if state.returncode == 0:
+        run_command(["sudo", "docker", "start", MIRROR_CONTAINER], "docker")
+        return
+
+    logger.info(f"🪞 Starting Docker Hub pull-through cache on port {MIRROR_PORT}...")
+    os.makedirs(MIRROR_DATA_DIR, exist_ok=True)
+    run_command([
+        "sudo", "docker", "run", "-d", "--restart=always", "--name", MIRROR_CONTAINER,
+        "-p", f"{MIRROR_PORT}:5000",
+        "-e", f"REGISTRY_PROXY_REMOTEURL={UPSTREAM_REGISTRY}",
+        "-v", f"{MIRROR_DATA_DIR}:/var/lib/registry",
+        MIRROR_IMAGE,
+    ], "docker", **NETWORK_POLICY)
+
+
+def configure_docker_mirror(mirror_url):
+    """Point the local Docker daemon at a registry mirror, restarting it only if the config changed"""
+    result = query(["sudo", "cat", DOCKER_DAEMON_CONFIG])
+    try:
+        config = json.loads(result.stdout) if result.returncode == 0 and result.stdout.strip() else {}
+    except ValueError as e:
+        # Never overwrite a hand-edited file we cannot parse; the settings in it would be lost
+        raise RuntimeError(f"{DOCKER_DAEMON_CONFIG} is not valid JSON ({e}); fix it and re-run the installer")
+    if not isinstance(config, dict):
+        raise RuntimeError(f"{DOCKER_DAEMON_CONFIG} must contain a JSON object; fix it and re-run the installer")
+
+    mirrors = config.setdefault("registry-mirrors", [])
+    changed = mirror_url not in mirrors
+    if changed:
+        mirrors.insert(0, mirror_url)
+    # LAN mirrors are plain HTTP
+    if mirror_url.startswith("http://"):
+        insecure = config.setdefault("insecure-registries", [])
+        address = mirror_url[len("http://"):].rstrip("/")
+        if address not in insecure:
+            insecure.append(address)
+            changed = True
+
+    if not changed:
+        logger.info(f"Docker already uses the registry mirror {mirror_url}.")
+        return
+
+    logger.info(f"🪞 Configuring Docker to pull through {mirror_url}...")
+    run_command(["sudo", "mkdir", "-p", os.path.dirname(DOCKER_DAEMON_CONFIG)], "docker")
+    run_command(["sudo", "tee", DOCKER_DAEMON_CONFIG], "docker", input=json.dumps(config, indent=2) + "\n",
+                stdout=subprocess.DEVNULL)
+    run_command(["sudo", "systemctl", "restart", "docker"], "docker", timeout=120)
+
+
+def repo_digests(image):
+    result = query(["sudo", "docker", "image", "inspect", "--format", "{{json .RepoDigests}}", image])
+    if result.returncode != 0:
+        return []
+    return json.loads(result.stdout or "[]") or []
+
+
+def repo_digest(image):
+    digests = repo_digests(image)
+    return digests[0] if digests else None
+
+
+class ImageLock:
+    """Maps image tags to content digests so every host runs the same image"""
+
+    def __init__(self, path=IMAGE_LOCK_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path) as f:
+                self.images = json.load(f)
+        except FileNotFoundError:
+            self.images = {}
+
+    def digest(self, image):
+        return self.images.get(image)
+
+    def record(self, image, digest):
+        with self._lock:
+            if self.images.get(image) == digest:
+                return
+            self.images[image] = digest
+            try:
+                with open(self.path + ".tmp", "w") as f:
+                    json.dump(self.images, f, indent=2, sort_keys=True)
+                os.replace(self.path + ".tmp", self.path)
+                logger.info(f"📌 Pinned {image} to {digest}")
+            except OSError as e:
+                logger.warning(f"⚠️ Could not update {self.path}: {e}")
+
+
+def image_size(image):
+    result = query(["sudo", "docker", "image", "inspect", "--format", "{{.Size}}", image])
+    return int(result.stdout.strip()) if result.returncode == 0 and result.stdout.strip().isdigit() else 0
+
+
+def docker_pull(ref, label=None):
+    """docker pull with per-layer progress and the resulting throughput in the log"""
+    label = label or ref
+    # No retries here: the image prefetcher retries whole fetches
+    result = run_command(["sudo", "docker", "pull", ref], label, progress="docker", timeout=NETWORK_TIMEOUT,
+                         stall_timeout=STALL_TIMEOUT)
+    elapsed = result.seconds
+    size = image_size(ref)
+    logger.info(f"🐳 {label}: {size / 2**20:.1f} MB in {elapsed:.1f}s ({size / 2**20 / max(elapsed, 0.001):.1f} MB/s)")
+
+
+def pull_pinned(image, lock, tag=None):
+    """Pull an image by its pinned digest (pinning it on first use) and tag it with its usual name"""
+    pinned = lock.digest(image)
+    if pinned:
+        logger.info(f"🐳 Pulling Docker image {image} pinned to {pinned}")
+        docker_pull(pinned, image)
+        run_command(["sudo", "docker", "tag", pinned, image], "docker")
+    else:
+        logger.info(f"🐳 Pulling Docker image: {image}")
+        docker_pull(image)
+        digest = repo_digest(image)
+        if digest:
+            lock.record(image, digest)
+    if tag:
+        run_command(["sudo", "docker", "tag", image, tag], "docker")
+
+
+def pin_images(images, lock):
+    """Resolve the current digest of each tag and record it in the lock file"""
+    for image in images:
+        run_command(["sudo", "docker", "pull", image], image, progress="docker", **NETWORK_POLICY)
+        digest = repo_digest(image)
+        if digest is None:
+            raise RuntimeError(f"Docker did not report a digest for {image}")
+        lock.record(image, digest)
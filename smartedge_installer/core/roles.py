@@ -0,0 +1,59 @@
+import importlib
+from smartedge_installer.constants import ROLE_ALIASES, ROLE_CHOICES, ROLES
+
+
+class Role:
+    """One installable role; its installer module is imported on first use"""
+
+    def __init__(self, choice, alias, label, target):
+        self.choice = choice
+        self.alias = alias
+        self.label = label
+        # "package.module:ClassName"
+        self.target = target
+        self._installer = None
+
+    @property
+    def class_name(self):
+        # Journal entries and run reports are keyed by the installer class name
+        return self.target.rpartition(":")[2]
+
+    def installer(self):
+        if self._installer is None:
+            module_name, _, class_name = self.target.partition(":")
+            self._installer = getattr(importlib.import_module(module_name), class_name)
+        return self._installer
+
+    def __repr__(self):
+        return f"Role({self.alias!r}, {self.target!r})"
+
+
+REGISTRY = {}
+
+
+def register_role(choice, alias, label, target):
+    """Add a role; target names its installer class as "module:Class" and is not imported here"""
+    role = Role(choice, alias, label, target)
+    REGISTRY[choice] = role
+    # Keep the menu and alias tables (used by the inventory and the orchestrator) in step
+    ROLE_CHOICES[choice] = label
+    ROLE_ALIASES[alias] = choice
+    return role
+
+
+for _role in ROLES:
+    register_role(*_role)
+
+
+def get_role(value):
+    """Role for a menu number or short name, or None"""
+    return REGISTRY.get(ROLE_ALIASES.get(value, value))
+
+
+def role_for_installer(class_name):
+    """Role whose installer class is called class_name (the key of journal entries), or None"""
+    return next((role for role in REGISTRY.values() if role.class_name == class_name), None)
+
+
+def all_roles():
+    return list(REGISTRY.values())
@@ -0,0 +1,167 @@
+import contextlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from smartedge_installer.utils.logger import get_logger
+
+logger = get_logger("StepScheduler")
+
+DEFAULT_MAX_WORKERS = int(os.environ.get("SMARTEDGE_MAX_WORKERS", "4"))
+
+# Name of the step the calling worker thread is running, so steps can record undo actions against it
+_current = threading.local()
+
+
+def current_step():
+    return getattr(_current, "step", None)
+
+
+class Step:
+    def __init__(self, name, func, depends_on=(), exclusive=False, apt_packages=(), inputs=None, check=None):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+        # Exclusive steps (interactive prompts) run while no other step is running
+        self.exclusive = exclusive
+        # System packages the step needs; installers collect them into one PackagePlan
+        self.apt_packages = tuple(apt_packages)
+        # Callable describing the state the step depends on; steps without one always run
+        self.inputs = inputs
+        # Read-only callable returning the planner Actions the step would still take on this machine
+        self.check = check
+
+    def __repr__(self):
+        return f"Step({self.name!r}, depends_on={list(self.depends_on)})"
+
+
+class StepFailedError(Exception):
+    def __init__(self, failed, skipped):
+        self.failed = failed
+        self.skipped = skipped
+        names = ", ".join(f"{name} ({err})" for name, err in failed.items())
+        super().__init__(f"{len(failed)} step(s) failed: {names}")
+
+
+class StepScheduler:
+    """Run installer steps in a worker pool, respecting their dependencies"""
+
+    def __init__(self, steps, max_workers=None, journal=None, role=None, profiler=None, force=False, resume=False):
+        self.steps = list(steps)
+        self.max_workers = max_workers or DEFAULT_MAX_WORKERS
+        self.journal = journal
+        self.role = role
+        self.profiler = profiler
+        # force: run steps even if their inputs are unchanged (outcomes are still journaled)
+        self.force = force
+        # resume: trust the checkpoints of an interrupted run and only run what did not complete
+        self.resume = resume
+        self._validate()
+
+    def _validate(self):
+        names = [step.name for step in self.steps]
+        duplicates = {name for name in names if names.count(name) > 1}
+        if duplicates:
+            raise ValueError(f"Duplicate step names: {', '.join(sorted(duplicates))}")
+
+        for step in self.steps:
+            unknown = [dep for dep in step.depends_on if dep not in names]
+            if unknown:
+                raise ValueError(f"Step '{step.name}' depends on unknown step(s): {', '.join(unknown)}")
+
+        # Kahn's algorithm: anything left over is part of a cycle
+        remaining = {step.name: set(step.depends_on) for step in self.steps}
+        while True:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                break
+            for name in ready:
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+        if remaining:
+            raise ValueError(f"Dependency cycle between steps: {', '.join(sorted(remaining))}")
+
+    def _execute(self, step):
+        profiled = self.profiler.step(step.name) if self.profiler else contextlib.nullcontext({})
+        _current.step = step.name
+        try:
+            with profiled as record:
+                self._execute_step(step, record)
+        finally:
+            _current.step = None
+
+    def _execute_step(self, step, record):
+        if self.journal is None:
+            step.func()
+            return
+
+        if self.resume and self.journal.is_checkpoint(self.role, step.name):
+            logger.info(f"⏭️  Step '{step.name}' completed in an earlier run. Resuming after it.")
+            record["status"] = "skipped"
+            return
+
+        if not self.force and step.inputs is not None and self.journal.is_current(self.role, step.name, step.inputs()):
+            logger.info(f"⏭️  Step '{step.name}' is unchanged since the last run. Skipping.")
+            record["status"] = "skipped"
+            return
+
+        # Steps without inputs are journaled too: their outcome is the checkpoint --resume relies on
+        inputs = step.inputs or dict
+        started = time.monotonic()
+        try:
+            step.func()
+        except (Exception, SystemExit) as e:
+            self.journal.record(self.role, step.name, inputs(), "failed", time.monotonic() - started, e)
+            raise
+        # Inputs are captured after the step so the next run compares against the state it produced
+        self.journal.record(self.role, step.name, inputs(), "ok", time.monotonic() - started)
+
+    def run(self):
+        pending = list(self.steps)
+        done = []
+        failed = {}
+        skipped = []
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="step") as pool:
+            while pending or running:
+                # A failed or skipped dependency blocks every step downstream of it
+                for step in list(pending):
+                    blocked = [dep for dep in step.depends_on if dep in failed or dep in skipped]
+                    if blocked:
+                        logger.warning(f"⏭️  Skipping '{step.name}' because {', '.join(blocked)} did not complete.")
+                        skipped.append(step.name)
+                        pending.remove(step)
+
+                exclusive_running = any(step.exclusive for step in running.values())
+                for step in list(pending):
+                    if exclusive_running:
+                        break
+                    if not all(dep in done for dep in step.depends_on):
+                        continue
+                    if step.exclusive and running:
+                        continue
+                    logger.info(f"▶️  Starting step '{step.name}'")
+                    running[pool.submit(self._execute, step)] = step
+                    pending.remove(step)
+                    if step.exclusive:
+                        exclusive_running = True
+
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    step = running.pop(future)
+                    try:
+                        future.result()
+                        done.append(step.name)
+                        logger.info(f"✅ Step '{step.name}' finished.")
+                    except (Exception, SystemExit) as e:
+                        failed[step.name] = e
+                        logger.error(f"❌ Step '{step.name}' failed: {e}")
+
+        if failed:
+            raise StepFailedError(failed, skipped)
+        return done
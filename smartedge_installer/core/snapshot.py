@@ -0,0 +1,509 @@
+import glob
+import gzip
+import hashlib
+import json
+import os
+import platform
+import shutil
+import socket
+import stat
+import subprocess
+import tarfile
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from smartedge_installer.constants import CACHE_DIR
+from smartedge_installer.core.base_installer import docker_image_id, interface_macs
+from smartedge_installer.core.bundle import (
+    BUNDLE_FORMAT, MANIFEST_NAME, OfflineBundle, apt_dependency_closure, write_program_bundle
+)
+from smartedge_installer.core.package_plan import PackagePlan
+from smartedge_installer.core.venv_manager import COMPLETE_MARKER, VenvManager, python_abi
+from smartedge_installer.utils.build_cache import cache_lock, file_sha256, os_release
+from smartedge_installer.utils.logger import get_logger
+from smartedge_installer.utils.runner import NETWORK_POLICY, query, run_command
+
+logger = get_logger("Snapshot")
+
+SNAPSHOT_FORMAT = 1
+OBJECTS_DIR = "objects"
+APT_ARCHIVES_DIR = "/var/cache/apt/archives"
+# Imported snapshots are unpacked here in the offline bundle layout
+IMPORT_DIR = os.path.join(CACHE_DIR, "snapshots")
+# Files are copied in parallel: one stream rarely saturates an SSD or a USB 3 stick
+COPY_WORKERS = int(os.environ.get("SMARTEDGE_COPY_WORKERS", "8"))
+CHUNK_BYTES = 1024 * 1024
+# Objects are gzipped only when their first block shrinks by at least this share. .debs, wheels and
+# compressed image layers do not, and storing those as they are keeps imports at disk speed.
+SAMPLE_BYTES = 256 * 1024
+MIN_COMPRESSION_GAIN = 0.1
+# Locks and half-written files of the caches are not part of a snapshot
+SKIPPED_SUFFIXES = (".lock", ".tmp", ".part")
+
+
+class SnapshotError(RuntimeError):
+    pass
+
+
+def _compressible(sample):
+    return len(sample) >= 512 and len(zlib.compress(sample, 1)) < len(sample) * (1 - MIN_COMPRESSION_GAIN)
+
+
+class ObjectStore:
+    """Content-addressed files (by the sha256 of their content), shared by every snapshot in one directory"""
+
+    def __init__(self, root):
+        self.root = os.path.join(root, OBJECTS_DIR)
+
+    def _path(self, digest, compressed):
+        return os.path.join(self.root, digest[:2], digest + (".gz" if compressed else ""))
+
+    def find(self, digest):
+        for compressed in (False, True):
+            path = self._path(digest, compressed)
+            if os.path.exists(path):
+                return path, compressed
+        return None
+
+    def put(self, fileobj):
+        """Store what fileobj yields; returns its digest, its size and the bytes this call added to the store"""
+        os.makedirs(self.root, exist_ok=True)
+        sample = fileobj.read(SAMPLE_BYTES)
+        compressed = _compressible(sample)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".incoming-")
+        digest, size = hashlib.sha256(), 0
+        try:
+            with os.fdopen(fd, "wb") as raw:
+                out = gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=1, mtime=0) if compressed else raw
+                chunk = sample
+                while chunk:
+                    digest.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+                    chunk = fileobj.read(CHUNK_BYTES)
+                if compressed:
+                    out.close()
+            digest = digest.hexdigest()
+            if self.find(digest):
+                os.remove(tmp_path)
+                return digest, size, 0
+            path = self._path(digest, compressed)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # mkstemp creates 0600; a store on a shared stick must stay readable for other users
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+            return digest, size, os.path.getsize(path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def put_file(self, path):
+        # Hashing first turns re-exporting an unchanged file into a read instead of a write
+        digest = file_sha256(path)
+        if self.find(digest):
+            return digest, os.path.getsize(path), 0
+        with open(path, "rb") as f:
+            return self.put(f)
+
+    def open(self, digest):
+        found = self.find(digest)
+        if found is None:
+            raise SnapshotError(f"object {digest} is missing from the snapshot store {self.root}")
+        path, compressed = found
+        return gzip.open(path, "rb") if compressed else open(path, "rb")
+
+    def copy(self, digest, dest, mode):
+        """Write an object to dest, checking it against its digest; dest is either complete or absent"""
+        check = hashlib.sha256()
+        part = dest + ".part"
+        with self.open(digest) as source, open(part, "wb") as out:
+            for chunk in iter(lambda: source.read(CHUNK_BYTES), b""):
+                check.update(chunk)
+                out.write(chunk)
+        if check.hexdigest() != digest:
+            os.remove(part)
+            raise SnapshotError(f"{dest}: the stored content does not match object {digest}")
+        os.chmod(part, mode)
+        os.replace(part, dest)
+
+
+def capture_tree(store, root, pool):
+    """Store every file under root; returns the tree's entries and the bytes added to the store"""
+    entries, files = [], []
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in sorted(dirnames + filenames):
+            path = os.path.join(dirpath, name)
+            st = os.lstat(path)
+            entry = {"path": os.path.relpath(path, root), "mode": stat.S_IMODE(st.st_mode)}
+            if stat.S_ISLNK(st.st_mode):
+                entry.update(type="symlink", target=os.readlink(path))
+            elif stat.S_ISDIR(st.st_mode):
+                entry["type"] = "dir"
+            elif stat.S_ISREG(st.st_mode) and not name.endswith(SKIPPED_SUFFIXES):
+                entry["type"] = "file"
+                files.append((entry, path))
+            else:
+                continue
+            entries.append(entry)
+        # Symlinked directories are recorded as links, not followed
+        dirnames[:] = [name for name in dirnames if not os.path.islink(os.path.join(dirpath, name))]
+
+    stored = 0
+    for (entry, _), (digest, size, added) in zip(files, pool.map(lambda item: store.put_file(item[1]), files)):
+        entry.update(object=digest, size=size)
+        stored += added
+    return entries, stored
+
+
+def restore_tree(store, entries, dest, pool):
+    """Recreate a captured tree under dest, copying its files in parallel"""
+    os.makedirs(dest, exist_ok=True)
+    for entry in entries:
+        if entry["type"] == "dir":
+            os.makedirs(os.path.join(dest, entry["path"]), exist_ok=True)
+    files = [entry for entry in entries if entry["type"] == "file"]
+    list(pool.map(lambda entry: store.copy(entry["object"], os.path.join(dest, entry["path"]), entry["mode"]),
+                  files))
+    for entry in entries:
+        path = os.path.join(dest, entry["path"])
+        if entry["type"] == "symlink":
+            if os.path.lexists(path):
+                os.remove(path)
+            os.symlink(entry["target"], path)
+    # Deepest first, so a read-only directory does not block the ones inside it
+    for entry in sorted((entry for entry in entries if entry["type"] == "dir"), key=lambda e: e["path"],
+                        reverse=True):
+        os.chmod(os.path.join(dest, entry["path"]), entry["mode"])
+
+
+def restore_cache_dir(store, trees, dest, pool):
+    """Restore trees into a cache directory at once: a crash must not leave a .complete marker behind"""
+    tmp = dest + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    for entries in trees:
+        restore_tree(store, entries, tmp, pool)
+    shutil.rmtree(dest, ignore_errors=True)
+    os.rename(tmp, dest)
+
+
+def restore_builds(store, entries, pool):
+    """Merge the snapshot's build cache entries into the live cache, each artifact before its metadata
+
+    BuildCache.has() needs both files, so a crash part way never exposes an artifact without its metadata.
+    """
+    builds = os.path.join(CACHE_DIR, "builds")
+    os.makedirs(builds, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=CACHE_DIR, prefix=".builds-")
+    try:
+        restore_tree(store, entries, staging, pool)
+        for name in sorted(os.listdir(staging)):
+            source = os.path.join(staging, name)
+            if not os.path.isdir(source):
+                continue
+            os.makedirs(os.path.join(builds, name), exist_ok=True)
+            for metadata in sorted(glob.glob(os.path.join(source, "*.json"))):
+                key = os.path.basename(metadata)[:-len(".json")]
+                artifact = os.path.join(source, f"{key}.tar.gz")
+                if not os.path.exists(artifact):
+                    continue
+                target = os.path.join(builds, name, key)
+                with cache_lock(target + ".tar.gz"):
+                    os.replace(artifact, target + ".tar.gz")
+                    os.replace(metadata, target + ".json")
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def capture_images(store, images):
+    """One `docker save` of every image, so shared layers are read once, stored member by member"""
+    saver = subprocess.Popen(["sudo", "docker", "save"] + list(images), stdout=subprocess.PIPE)
+    entries, stored = [], 0
+    with tarfile.open(fileobj=saver.stdout, mode="r|") as archive:
+        for member in archive:
+            entry = {"path": member.name, "mode": member.mode}
+            if member.isdir():
+                entry["type"] = "dir"
+            elif member.issym():
+                entry.update(type="symlink", target=member.linkname)
+            elif member.isfile():
+                digest, size, added = store.put(archive.extractfile(member))
+                entry.update(type="file", object=digest, size=size)
+                stored += added
+            else:
+                continue
+            entries.append(entry)
+    if saver.wait() != 0:
+        raise subprocess.CalledProcessError(saver.returncode, saver.args)
+    return entries, stored
+
+
+def load_images(store, entries):
+    """Stream the stored `docker save` archive back into `docker load` without writing it to disk"""
+    loader = subprocess.Popen(["sudo", "docker", "load"], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                              stderr=subprocess.STDOUT)
+    output = []
+    # Drained while the archive is written, so a chatty docker load cannot fill the pipe and stall us
+    reader = threading.Thread(target=lambda: output.extend(loader.stdout.read().decode(errors="replace")
+                                                           .splitlines()), daemon=True)
+    reader.start()
+    try:
+        with tarfile.open(fileobj=loader.stdin, mode="w|") as archive:
+            for entry in entries:
+                info = tarfile.TarInfo(entry["path"])
+                info.mode = entry["mode"]
+                if entry["type"] == "dir":
+                    info.type = tarfile.DIRTYPE
+                    archive.addfile(info)
+                elif entry["type"] == "symlink":
+                    info.type = tarfile.SYMTYPE
+                    info.linkname = entry["target"]
+                    archive.addfile(info)
+                else:
+                    info.size = entry["size"]
+                    with store.open(entry["object"]) as f:
+                        archive.addfile(info, f)
+    except BrokenPipeError:
+        # docker load gave up early; its output says why
+        pass
+    finally:
+        try:
+            loader.stdin.close()
+        except BrokenPipeError:
+            pass
+    reader.join()
+    for line in output:
+        logger.info(f"🐳 {line}")
+    if loader.wait() != 0:
+        raise subprocess.CalledProcessError(loader.returncode, loader.args, output="\n".join(output))
+
+
+def installed_versions(packages):
+    """Installed version and architecture of each of packages (the dpkg selection of the snapshot)"""
+    result = query(["dpkg-query", "-W", "-f", "${Package}\t${Version}\t${Architecture}\t${db:Status-Abbrev}\n"]
+                   + list(packages))
+    versions = {}
+    for line in result.stdout.splitlines():
+        fields = line.split("\t")
+        if len(fields) == 4 and fields[3].startswith("ii"):
+            versions[fields[0]] = (fields[1], fields[2])
+    return versions
+
+
+def collect_debs(versions, dest):
+    """The installed .deb of every package: from apt's archive cache, else downloaded"""
+    os.makedirs(dest, exist_ok=True)
+    missing = []
+    for name, (version, arch) in sorted(versions.items()):
+        cached = os.path.join(APT_ARCHIVES_DIR, f"{name}_{version.replace(':', '%3a')}_{arch}.deb")
+        if not os.path.exists(cached):
+            missing.append(f"{name}={version}")
+        elif os.stat(cached).st_dev == os.stat(dest).st_dev:
+            os.link(cached, os.path.join(dest, os.path.basename(cached)))
+        else:
+            shutil.copy(cached, dest)
+
+    if missing:
+        logger.info(f"Downloading {len(missing)} .deb files apt no longer has in its cache...")
+        result = run_command(["apt-get", "download"] + missing, "apt", check=False, cwd=dest, **NETWORK_POLICY)
+        if result.returncode != 0:
+            logger.warning("⚠️ Some .deb files could not be downloaded; importing hosts will fetch those with apt.")
+
+
+def export_snapshot(installer_cls, output_dir):
+    """Capture a completely installed role into the snapshot store output_dir; returns the manifest path"""
+    installer = installer_cls()
+    problems = installer.verify_installation()
+    if problems:
+        raise SnapshotError("the role is not completely installed on this machine: " + "; ".join(problems))
+
+    role = installer_cls.__name__
+    logger.info(f"📸 Exporting a snapshot of {role} to {output_dir}")
+    started = time.monotonic()
+    store = ObjectStore(output_dir)
+    manager = VenvManager(installer_cls.REQUIREMENTS_FILE)
+    plan = installer.package_plan()
+    versions = installed_versions(apt_dependency_closure(plan.packages))
+    trees, stored = {}, 0
+    workdir = tempfile.mkdtemp(prefix="smartedge-snapshot-")
+    try:
+        collect_debs(versions, os.path.join(workdir, "debs"))
+        write_program_bundle(os.path.join(workdir, "program", "program.bundle"))
+        if installer_cls.SYSTEM_PIP_PACKAGES:
+            run_command(["python3", "-m", "pip", "wheel", "-w", os.path.join(workdir, "wheels"),
+                         "--find-links", manager.wheelhouse] + list(installer_cls.SYSTEM_PIP_PACKAGES), "pip",
+                        **NETWORK_POLICY)
+        sources = {
+            "debs": os.path.join(workdir, "debs"),
+            "program": os.path.join(workdir, "program"),
+            "system_wheels": os.path.join(workdir, "wheels"),
+            "wheelhouse": manager.wheelhouse,
+            "venv_template": manager.template,
+            "builds": os.path.join(CACHE_DIR, "builds"),
+        }
+        with ThreadPoolExecutor(max_workers=COPY_WORKERS, thread_name_prefix="snapshot") as pool:
+            for name, path in sources.items():
+                if os.path.isdir(path):
+                    trees[name], added = capture_tree(store, path, pool)
+                    stored += added
+        if installer_cls.DOCKER_IMAGES:
+            logger.info(f"🐳 Saving {len(installer_cls.DOCKER_IMAGES)} Docker image(s)...")
+            trees["images"], added = capture_images(store, installer_cls.DOCKER_IMAGES)
+            stored += added
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    macs = interface_macs()
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "role": role,
+        "alias": installer_cls.ROLE_ALIAS,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "source_host": socket.gethostname(),
+        "os_release": os_release(),
+        "kernel": platform.release(),
+        "python_abi": python_abi(),
+        "venv_key": manager.key,
+        "venv_template": manager.template,
+        "apt_packages": plan.packages,
+        "packages": {name: version for name, (version, _) in sorted(versions.items())},
+        "docker_images": {image: docker_image_id(image) for image in installer_cls.DOCKER_IMAGES},
+        # Renames need the importing host's own MAC addresses (inventory or prompt); these are for reference
+        "network": {
+            "interface_names": list(installer_cls.INTERFACE_NAMES),
+            "loopback_alias": installer.LOOPBACK_ALIAS,
+            "source_macs": {name: macs.get(name) for name in installer_cls.INTERFACE_NAMES},
+        },
+        "trees": trees,
+    }
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"{installer_cls.ROLE_ALIAS}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+    size = sum(entry.get("size", 0) for entries in trees.values() for entry in entries)
+    logger.info(f"✅ Snapshot written to {path}: {size / 2**20:.1f} MB of content, "
+                f"{stored / 2**20:.1f} MB newly stored, in {time.monotonic() - started:.0f}s")
+    return path
+
+
+class Snapshot:
+    """One exported role: a manifest naming the stored objects of its trees, packages and images"""
+
+    def __init__(self, store_dir, manifest_path):
+        self.store = ObjectStore(store_dir)
+        self.manifest_path = manifest_path
+        with open(manifest_path) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format") != SNAPSHOT_FORMAT:
+            raise SnapshotError(f"Unsupported snapshot format in {manifest_path}")
+
+    @classmethod
+    def open(cls, path, alias=None):
+        """A manifest file, or the newest snapshot (of the role alias, if given) in a store directory"""
+        if not os.path.isdir(path):
+            return cls(os.path.dirname(os.path.abspath(path)), path)
+        manifests = glob.glob(os.path.join(path, f"{alias}-*.json" if alias else "*-*.json"))
+        if not manifests:
+            raise SnapshotError(f"No {alias + ' ' if alias else ''}snapshot found in {path}")
+        return cls(path, max(manifests, key=os.path.getmtime))
+
+    @property
+    def alias(self):
+        return self.manifest["alias"]
+
+    def check_host(self):
+        """Snapshots only clone onto the release (and Python) they were taken on"""
+        for name, here in (("os_release", os_release()), ("python_abi", python_abi())):
+            if self.manifest[name] != here:
+                raise SnapshotError(f"the snapshot was taken on {self.manifest[name]}, this host is {here}")
+
+    def restore(self, installer_cls):
+        """Unpack into the offline bundle layout and the local caches; returns the bundle to install from"""
+        self.check_host()
+        started = time.monotonic()
+        manifest = self.manifest
+        trees = manifest["trees"]
+        digest = hashlib.sha256(json.dumps(manifest, sort_keys=True).encode()).hexdigest()[:16]
+        directory = os.path.join(IMPORT_DIR, f"{self.alias}-{digest}")
+        logger.info(f"📂 Restoring snapshot {self.manifest_path} ({manifest['source_host']}, {manifest['created']})...")
+
+        manager = VenvManager(installer_cls.REQUIREMENTS_FILE)
+        with ThreadPoolExecutor(max_workers=COPY_WORKERS, thread_name_prefix="snapshot") as pool:
+            restore_tree(self.store, trees.get("debs", []), os.path.join(directory, "debs"), pool)
+            restore_tree(self.store, trees.get("program", []), directory, pool)
+            if "builds" in trees:
+                restore_builds(self.store, trees["builds"], pool)
+
+            restore_tree(self.store, trees.get("system_wheels", []), os.path.join(directory, "wheels"), pool)
+            if manager.key == manifest["venv_key"]:
+                wheelhouse = manager.wheelhouse
+                template_ready = os.path.exists(os.path.join(manager.template, COMPLETE_MARKER))
+                if "venv_template" in trees and not template_ready:
+                    restore_cache_dir(self.store, [trees["venv_template"]], manager.template, pool)
+                    manager.relocate_template(manifest["venv_template"])
+            else:
+                logger.warning("⚠️ The requirements changed since the snapshot; the venv is built from its wheels.")
+                wheelhouse = os.path.join(directory, "wheelhouse")
+            if not os.path.exists(os.path.join(wheelhouse, COMPLETE_MARKER)):
+                restore_cache_dir(self.store, [trees.get("wheelhouse", [])], wheelhouse, pool)
+
+        with open(os.path.join(directory, MANIFEST_NAME), "w") as f:
+            json.dump({
+                "format": BUNDLE_FORMAT,
+                "role": manifest["role"],
+                "created": manifest["created"],
+                "os_release": manifest["os_release"],
+                "python": platform.python_version(),
+                "apt_packages": manifest["apt_packages"],
+                "docker_images": list(manifest["docker_images"]),
+            }, f, indent=2)
+        logger.info(f"✅ Snapshot restored in {time.monotonic() - started:.1f}s.")
+        return SnapshotBundle(directory, self, wheelhouse)
+
+    def verify(self, installer):
+        """What differs from the snapshot after an import: the installer's own verification plus versions and images"""
+        problems = installer.verify_installation()
+        versions = installed_versions(self.manifest["packages"])
+        for name, version in self.manifest["packages"].items():
+            installed = versions.get(name, (None,))[0]
+            if installed != version:
+                problems.append(f"package {name}: {installed or 'not installed'}, the snapshot has {version}")
+        for image, image_id in self.manifest["docker_images"].items():
+            if image_id and docker_image_id(image) != image_id:
+                problems.append(f"Docker image {image} differs from the snapshot")
+        return problems
+
+
+class SnapshotBundle(OfflineBundle):
+    """An imported snapshot, installed through the offline bundle's code paths"""
+
+    def __init__(self, directory, snapshot, wheelhouse):
+        super().__init__(directory)
+        self.snapshot = snapshot
+        self.wheelhouse = wheelhouse
+        self._images_lock = threading.Lock()
+        self._images_loaded = False
+
+    def install_apt(self):
+        installed = super().install_apt()
+        # .debs that could not be collected at export time come from the apt mirror
+        missing = PackagePlan(self.manifest["apt_packages"]).missing()
+        if missing:
+            installed += PackagePlan(missing).apply()
+        return installed
+
+    def pip_args(self):
+        # The system pip packages' wheels are kept apart from the role's wheelhouse; anything
+        # missing from both comes from PyPI
+        return ["--find-links", self.wheelhouse, "--find-links", os.path.join(self.directory, "wheels")]
+
+    def load_image(self, image):
+        # Every image of the role was saved in one archive, so the first image step loads them all
+        with self._images_lock:
+            if not self._images_loaded:
+                logger.info("🐳 Loading the snapshot's Docker images...")
+                load_images(self.snapshot.store, self.snapshot.manifest["trees"].get("images", []))
+                self._images_loaded = True
@@ -0,0 +1,68 @@
+import glob
+import json
+import os
+from smartedge_installer.constants import JOURNAL_FILE, LOG_DIR, REPORTS_DIR, VENV_DIR
+from smartedge_installer.core.roles import all_roles
+
+# Only reads the files earlier runs left behind: no installer module, logger or subprocess is
+# loaded, so fleet tooling can poll it cheaply.
+
+
+def _load_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _latest(pattern):
+    paths = glob.glob(pattern)
+    return max(paths, key=os.path.getmtime) if paths else None
+
+
+def role_status(role, journal):
+    steps = (journal or {}).get("roles", {}).get(role.class_name, {}).get("steps", {})
+    failed = sorted(name for name, entry in steps.items() if entry.get("outcome") != "ok")
+    if not steps:
+        state = "not installed"
+    elif failed:
+        state = "failed"
+    else:
+        state = "installed"
+
+    bench_report = _latest(os.path.join(REPORTS_DIR, f"bench-{role.alias}-*.json"))
+    bench = _load_json(bench_report) if bench_report else None
+    return {
+        "role": role.alias,
+        "label": role.label,
+        "state": state,
+        "steps_ok": len(steps) - len(failed),
+        "steps_failed": failed,
+        "last_step_at": max((entry.get("finished_at") or "" for entry in steps.values()), default=None),
+        "last_report": _latest(os.path.join(REPORTS_DIR, f"run-{role.class_name}-*.json")),
+        "last_log": _latest(os.path.join(LOG_DIR, f"run-{role.class_name}-*.jsonl")),
+        "bench_passed": bench.get("passed") if bench else None,
+    }
+
+
+def collect_status(roles=None):
+    journal = _load_json(JOURNAL_FILE)
+    return {
+        "venv": os.path.exists(os.path.join(VENV_DIR, "bin", "python")),
+        "roles": [role_status(role, journal) for role in (roles or all_roles())],
+    }
+
+
+def format_status(status):
+    lines = [f"{'Role':<14} {'State':<14} {'Steps':>6} {'Last step':<20} {'Bench':<6}"]
+    for entry in status["roles"]:
+        bench = {True: "pass", False: "FAIL", None: "-"}[entry["bench_passed"]]
+        lines.append(f"{entry['label']:<14} {entry['state']:<14} {entry['steps_ok']:>6} "
+                     f"{entry['last_step_at'] or '-':<20} {bench:<6}")
+        if entry["steps_failed"]:
+            lines.append(f"  failed steps: {', '.join(entry['steps_failed'])}")
+        if entry["last_log"]:
+            lines.append(f"  last log: {entry['last_log']}")
+    lines.append(f"Python venv: {'present' if status['venv'] else 'missing'} ({VENV_DIR})")
+    return "\n".join(lines)
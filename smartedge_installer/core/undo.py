@@ -0,0 +1,98 @@
+import json
+import logging
+import os
+import shutil
+import subprocess
+from smartedge_installer.constants import INSTALLER_ROOT, VENV_DIR
+from smartedge_installer.utils.logger import get_logger
+from smartedge_installer.utils.runner import run_command
+
+logger = get_logger("Rollback")
+
+# Undo actions are plain JSON in the state journal ({"kind": ..., details}), so a later process
+# (`--rollback`) can run them after the one that made the changes has exited.
+
+
+def _sudo_xargs(command, paths):
+    if paths:
+        run_command(["sudo", "xargs", "-0", "--no-run-if-empty"] + command, "rollback", input="\0".join(paths))
+
+
+def undo_apt_packages(action):
+    logger.info(f"📦 Removing apt packages installed by the failed run: {', '.join(action['packages'])}")
+    # Their automatically installed dependencies are left for `apt autoremove`
+    run_command(["sudo", "apt-get", "remove", "-y"] + action["packages"], "apt")
+
+
+def undo_pip_packages(action):
+    logger.info(f"📦 Uninstalling pip packages: {', '.join(action['packages'])}")
+    run_command(["python3", "-m", "pip", "uninstall", "-y"] + action["packages"], "pip")
+
+
+def undo_files(action):
+    """Delete the files a build or cache restore added (never ones that existed before it)"""
+    with open(action["manifest"]) as f:
+        manifest = json.load(f)
+    root = manifest.get("root", "/")
+    files = [os.path.join(root, path) for path in manifest["files"]]
+    # Deepest first, and only if nothing else has been put in them since
+    dirs = sorted((os.path.join(root, path) for path in manifest["dirs"]), key=len, reverse=True)
+    logger.info(f"🗑️  Removing {len(files)} installed file(s) listed in {action['manifest']}")
+    _sudo_xargs(["rm", "-f", "--"], files)
+    _sudo_xargs(["rmdir", "--ignore-fail-on-non-empty", "--"], dirs)
+    run_command(["sudo", "ldconfig"], "rollback")
+    os.remove(action["manifest"])
+
+
+def undo_path(action):
+    logger.info(f"🗑️  Removing {action['path']}")
+    shutil.rmtree(action["path"], ignore_errors=True)
+
+
+def undo_interfaces(action):
+    python = os.path.join(VENV_DIR, "bin", "python")
+    if not os.path.exists(python):
+        raise FileNotFoundError(f"{python} is needed to restore the interfaces (pyroute2)")
+    logger.info("🔧 Restoring interface names and the loopback alias...")
+    run_command(["sudo", python, "-m", "smartedge_installer.scripts.restore_interfaces",
+                 "--record", action["record"]], "rollback", level=logging.INFO, cwd=INSTALLER_ROOT)
+    os.remove(action["record"])
+
+
+def undo_containers(action):
+    logger.info(f"🐳 Removing containers started by the installer: {', '.join(action['ids'])}")
+    run_command(["sudo", "docker", "rm", "-f"] + action["ids"], "docker")
+
+
+UNDO_ACTIONS = {
+    "apt_packages": undo_apt_packages,
+    "pip_packages": undo_pip_packages,
+    "files": undo_files,
+    "path": undo_path,
+    "interfaces": undo_interfaces,
+    "containers": undo_containers,
+}
+
+
+def rollback(journal, role):
+    """Run the role's undo actions newest first; returns the entries that could not be undone"""
+    entries = journal.undo_entries(role)
+    if not entries:
+        logger.info(f"Nothing to roll back for {role}.")
+    failed = []
+    for entry in reversed(entries):
+        action = entry["action"]
+        undo = UNDO_ACTIONS.get(action.get("kind"))
+        if undo is None:
+            logger.error(f"❌ Unknown undo action {action.get('kind')!r} (step '{entry['step']}')")
+            failed.append(entry)
+            continue
+        try:
+            undo(action)
+            journal.remove_undo(role, entry)
+        except (OSError, ValueError, KeyError, subprocess.SubprocessError) as e:
+            logger.error(f"❌ Could not undo {action['kind']} of step '{entry['step']}': {e}")
+            failed.append(entry)
+    # The checkpoints no longer describe the machine, so the next installation starts over
+    journal.forget_role(role)
+    return failed
@@ -0,0 +1,139 @@
+import hashlib
+import os
+import platform
+import shutil
+import sys
+import venv
+from smartedge_installer.constants import CACHE_DIR
+from smartedge_installer.utils.build_cache import cache_lock
+from smartedge_installer.utils.logger import get_logger
+from smartedge_installer.utils.runner import NETWORK_POLICY, run_command
+
+logger = get_logger("VenvManager")
+
+WHEELHOUSE_ROOT = os.path.join(CACHE_DIR, "wheelhouse")
+TEMPLATE_ROOT = os.path.join(CACHE_DIR, "venv-templates")
+COMPLETE_MARKER = ".complete"
+VENV_KEY_FILE = ".smartedge-venv-key"
+
+
+def python_abi():
+    return f"{sys.implementation.cache_tag}-{platform.machine()}"
+
+
+def requirements_key(requirements_file):
+    with open(requirements_file, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+def _site_packages(venv_dir):
+    version = f"python{sys.version_info.major}.{sys.version_info.minor}"
+    return os.path.join(venv_dir, "lib", version, "site-packages")
+
+
+def _clone_tree(source, dest):
+    """Copy a tree using copy-on-write where the filesystem supports it, hardlinks otherwise"""
+    for flags in (["-a", "--reflink=always"], ["-al"], ["-a"]):
+        result = run_command(["cp"] + flags + [source + "/.", dest], "cp", check=False, level=None)
+        if result.returncode == 0:
+            return flags
+        # A failed attempt can leave a partial tree behind
+        shutil.rmtree(dest, ignore_errors=True)
+        os.makedirs(dest)
+    raise RuntimeError(f"Failed to copy {source} to {dest}")
+
+
+class VenvManager:
+    """Builds a role's wheels once and creates its venvs from a cached, pre-installed template"""
+
+    def __init__(self, requirements_file, find_links=None):
+        self.requirements_file = requirements_file
+        self.find_links = find_links
+        self.key = f"{python_abi()}-{requirements_key(requirements_file)}"
+        self.wheelhouse = os.path.join(WHEELHOUSE_ROOT, self.key)
+        self.template = os.path.join(TEMPLATE_ROOT, self.key)
+
+    def offline_args(self):
+        return ["--no-index", "--find-links", self.find_links] if self.find_links else []
+
+    def ensure_wheelhouse(self):
+        with cache_lock(self.wheelhouse):
+            if os.path.exists(os.path.join(self.wheelhouse, COMPLETE_MARKER)):
+                return
+            logger.info(f"🛞 Building wheelhouse for {os.path.basename(self.requirements_file)}...")
+            shutil.rmtree(self.wheelhouse, ignore_errors=True)
+            run_command([sys.executable, "-m", "pip", "wheel", "-w", self.wheelhouse, "pip",
+                         "-r", self.requirements_file] + self.offline_args(), "pip", **NETWORK_POLICY)
+            open(os.path.join(self.wheelhouse, COMPLETE_MARKER), "w").close()
+
+    def ensure_template(self):
+        self.ensure_wheelhouse()
+        with cache_lock(self.template):
+            if os.path.exists(os.path.join(self.template, COMPLETE_MARKER)):
+                return
+            logger.info("🧪 Building venv template from the wheelhouse...")
+            shutil.rmtree(self.template, ignore_errors=True)
+            venv.create(self.template, with_pip=True)
+            run_command([os.path.join(self.template, "bin", "python"), "-m", "pip", "install",
+                         "--no-index", "--find-links", self.wheelhouse, "--upgrade", "pip",
+                         "-r", self.requirements_file], "pip")
+            open(os.path.join(self.template, COMPLETE_MARKER), "w").close()
+
+    def relocate_template(self, old_template):
+        """Point the console scripts of a template copied from old_template (e.g. a snapshot) at its new path"""
+        old_python = os.path.join(old_template, "bin", "python").encode()
+        new_python = os.path.join(self.template, "bin", "python").encode()
+        template_bin = os.path.join(self.template, "bin")
+        for name in os.listdir(template_bin):
+            path = os.path.join(template_bin, name)
+            if os.path.islink(path) or name.startswith("python"):
+                continue
+            with open(path, "rb") as f:
+                content = f.read()
+            first_line, _, rest = content.partition(b"\n")
+            if first_line.startswith(b"#!") and old_python in first_line:
+                with open(path, "wb") as f:
+                    f.write(first_line.replace(old_python, new_python) + b"\n" + rest)
+
+    def is_current(self, venv_dir):
+        try:
+            with open(os.path.join(venv_dir, VENV_KEY_FILE)) as f:
+                return f.read().strip() == self.key
+        except OSError:
+            return False
+
+    def create(self, venv_dir):
+        if self.is_current(venv_dir):
+            logger.info(f"✅ {venv_dir} already matches {os.path.basename(self.requirements_file)}.")
+            return
+
+        self.ensure_template()
+        logger.info(f"🐍 Creating {venv_dir} from the venv template...")
+        # A fresh venv gives correct interpreter links and activate scripts for the target path;
+        # the installed packages are then cloned from the template instead of being reinstalled
+        venv.create(venv_dir, with_pip=False, clear=True, symlinks=True)
+        flags = _clone_tree(_site_packages(self.template), _site_packages(venv_dir))
+        self._copy_entry_points(venv_dir)
+        with open(os.path.join(venv_dir, VENV_KEY_FILE), "w") as f:
+            f.write(self.key + "\n")
+        logger.info(f"✅ Virtual environment ready (packages cloned with cp {' '.join(flags)}).")
+
+    def _copy_entry_points(self, venv_dir):
+        # Console scripts (pip, uvicorn, ...) carry the template's interpreter path in their shebang
+        template_bin = os.path.join(self.template, "bin")
+        target_bin = os.path.join(venv_dir, "bin")
+        template_python = os.path.join(template_bin, "python").encode()
+        target_python = os.path.join(target_bin, "python").encode()
+        for name in os.listdir(template_bin):
+            target = os.path.join(target_bin, name)
+            source = os.path.join(template_bin, name)
+            if os.path.lexists(target) or os.path.islink(source) or name.startswith(("python", "activate")):
+                continue
+            with open(source, "rb") as f:
+                content = f.read()
+            first_line, _, rest = content.partition(b"\n")
+            if first_line.startswith(b"#!"):
+                first_line = first_line.replace(template_python, target_python)
+            with open(target, "wb") as f:
+                f.write(first_line + b"\n" + rest)
+            os.chmod(target, os.stat(source).st_mode)
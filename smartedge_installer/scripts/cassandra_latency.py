@@ -0,0 +1,51 @@
+import argparse
+import json
+import time
+from cassandra.cluster import Cluster
+
+KEYSPACE = "smartedge_bench"
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def measure(host, operations):
+    cluster = Cluster([host])
+    try:
+        session = cluster.connect()
+        session.execute(f"CREATE KEYSPACE IF NOT EXISTS {KEYSPACE} WITH replication = "
+                        "{'class': 'SimpleStrategy', 'replication_factor': 1}")
+        session.execute(f"CREATE TABLE IF NOT EXISTS {KEYSPACE}.kv (k int PRIMARY KEY, v text)")
+        insert = session.prepare(f"INSERT INTO {KEYSPACE}.kv (k, v) VALUES (?, ?)")
+        select = session.prepare(f"SELECT v FROM {KEYSPACE}.kv WHERE k = ?")
+
+        writes, reads = [], []
+        for i in range(operations):
+            started = time.perf_counter()
+            session.execute(insert, (i, "x" * 100))
+            writes.append((time.perf_counter() - started) * 1000)
+        for i in range(operations):
+            started = time.perf_counter()
+            session.execute(select, (i,)).one()
+            reads.append((time.perf_counter() - started) * 1000)
+        session.execute(f"DROP KEYSPACE {KEYSPACE}")
+    finally:
+        cluster.shutdown()
+
+    return {
+        "cassandra_write_p50_ms": round(percentile(writes, 0.50), 3),
+        "cassandra_write_p99_ms": round(percentile(writes, 0.99), 3),
+        "cassandra_read_p50_ms": round(percentile(reads, 0.50), 3),
+        "cassandra_read_p99_ms": round(percentile(reads, 0.99), 3),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure Cassandra read/write latency")
+    parser.add_argument("--host", required=True)
+    parser.add_argument("--operations", type=int, default=1000)
+    args = parser.parse_args()
+
+    print(json.dumps(measure(args.host, args.operations)))
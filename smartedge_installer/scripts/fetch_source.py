@@ -0,0 +1,16 @@
+import argparse
+import subprocess
+import sys
+from smartedge_installer.utils.source_cache import SourceCache
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clone a git repository through the installer's source cache")
+    parser.add_argument("url")
+    parser.add_argument("dest")
+    args = parser.parse_args()
+
+    try:
+        SourceCache(args.url).clone(args.dest)
+    except subprocess.SubprocessError as e:
+        print(f"❌ Failed to clone {args.url}: {e}")
+        sys.exit(1)
@@ -2,16 +2,26 @@
 
 set -e
 
-NIKSS_DIR="$HOME/nikss"
-
-# Install dependencies
-sudo apt update
-sudo apt install -y \
-  make cmake gcc git libgmp-dev libelf-dev zlib1g-dev libjansson-dev
+NIKSS_DIR="${NIKSS_DIR:-$HOME/nikss}"
+NIKSS_REPO_URL="https://github.com/NIKSS-vSwitch/nikss.git"
+# Optional: NIKSS_JOBS sets the make job count (the Python installer derives it from cores and free memory)
+NIKSS_JOBS="${NIKSS_JOBS:-$(nproc)}"
+
+# Install dependencies (skipped when the Python installer already did)
+if [ -z "$NIKSS_SKIP_APT" ]; then
+  sudo apt update
+  sudo apt install -y \
+    make cmake gcc git libgmp-dev libelf-dev zlib1g-dev libjansson-dev ccache
+fi
 
-# Clone the nikss repository with submodules
-echo "📥 Cloning NIKSS repository..."
-git clone --recursive https://github.com/NIKSS-vSwitch/nikss.git "$NIKSS_DIR"
+# Clone the nikss repository with submodules, or reuse an existing clone
+if [ -d "$NIKSS_DIR/.git" ]; then
+  echo "🔄 Reusing existing NIKSS repository in $NIKSS_DIR..."
+  git -C "$NIKSS_DIR" fetch --recurse-submodules origin
+else
+  echo "📥 Cloning NIKSS repository..."
+  git clone --recursive "$NIKSS_REPO_URL" "$NIKSS_DIR"
+fi
 cd "$NIKSS_DIR"
 
 # Build libbpf
@@ -21,9 +31,15 @@ cd "$NIKSS_DIR"
 mkdir -p build
 cd build
 
+# Compile through ccache when it is available
+if [ -z "$CMAKE_C_COMPILER_LAUNCHER" ] && command -v ccache > /dev/null; then
+  export CMAKE_C_COMPILER_LAUNCHER=ccache
+fi
+
 # Run cmake and build
 cmake -DCMAKE_BUILD_TYPE=Release ..
-make -j"$(nproc)"
+make -j"$NIKSS_JOBS"
+
 sudo make install
 
 # Ensure linker can find the shared libraries
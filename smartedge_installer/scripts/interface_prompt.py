@@ -1,32 +1,13 @@
-import psutil
-import subprocess
-
-def prompt_for_interface_rename():
-    print("\n🔧 Detecting network interfaces...\n")
-    interfaces = psutil.net_if_addrs().keys()
-    interfaces = [iface for iface in interfaces if not iface.startswith("lo")]
-    if not interfaces:
-        print("❌ No active network interfaces found.")
-        return
-
-    print("📡 Available network interfaces:")
-    for i, iface in enumerate(interfaces, start=1):
-        print(f"{i}. {iface}")
-
-    try:
-        selected = int(input("\nPlease select which interface to use as 'eth0': "))
-        selected_iface = list(interfaces)[selected - 1]
-        print(f"🔄 Renaming '{selected_iface}' to 'eth0'...")
-
-        subprocess.run(["sudo", "ip", "link", "set", selected_iface, "down"], check=True)
-        subprocess.run(["sudo", "ip", "link", "set", selected_iface, "name", "eth0"], check=True)
-        subprocess.run(["sudo", "ip", "link", "set", "eth0", "up"], check=True)
-
-        print("✅ Interface configured successfully.")
-    except (IndexError, ValueError):
-        print("❌ Invalid selection.")
-    except subprocess.CalledProcessError:
-        print("❌ Failed to rename interface. You may need to reboot or reconfigure.")
+import argparse
+from smartedge_installer.utils.interfaces import configure_interfaces
 
 if __name__ == "__main__":
-    prompt_for_interface_rename()
+    parser = argparse.ArgumentParser(description="Rename the backend interface to eth0")
+    parser.add_argument("--eth0-mac", help="rename the interface with this MAC address without prompting")
+    parser.add_argument("--loopback-alias", help="also add this address to lo as lo:0")
+    parser.add_argument("--no-prompt", action="store_true", help="leave interface names as they are")
+    parser.add_argument("--record", metavar="FILE", help="write what was changed here, for restore_interfaces")
+    args = parser.parse_args()
+
+    macs = {"eth0": args.eth0_mac} if args.eth0_mac else None
+    configure_interfaces(("eth0",), macs, args.loopback_alias, args.record, prompt=not args.no_prompt)
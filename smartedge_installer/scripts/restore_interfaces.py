@@ -0,0 +1,9 @@
+import argparse
+from smartedge_installer.utils.interfaces import revert_interfaces
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Undo the interface renames and loopback alias of an earlier run")
+    parser.add_argument("--record", required=True, metavar="FILE", help="file written by an interface script's --record")
+    args = parser.parse_args()
+
+    revert_interfaces(args.record)
@@ -0,0 +1,53 @@
+import argparse
+import json
+import socket
+import time
+
+# IEEE 802 "local experimental" EtherType
+BENCH_ETHERTYPE = 0x88B5
+
+
+def build_frame(size):
+    header = b"\xff" * 6 + b"\x02\x00\x00\x00\x00\x01" + BENCH_ETHERTYPE.to_bytes(2, "big")
+    return header + b"smartedge-bench".ljust(max(size - len(header), 46), b"\x00")
+
+
+def rx_packets(interface):
+    # Kernel counters instead of a receiving socket, which would drop frames long before the switch does
+    with open(f"/sys/class/net/{interface}/statistics/rx_packets") as f:
+        return int(f.read())
+
+
+def measure(tx_interface, rx_interface, seconds, size):
+    """Send frames into tx_interface for a while and count how many come out of rx_interface"""
+    tx = socket.socket(socket.AF_PACKET, socket.SOCK_RAW)
+    tx.bind((tx_interface, 0))
+    frame = build_frame(size)
+
+    received_before = rx_packets(rx_interface)
+    sent = 0
+    started = time.monotonic()
+    deadline = started + seconds
+    while time.monotonic() < deadline:
+        try:
+            tx.send(frame)
+            sent += 1
+        except BlockingIOError:
+            continue
+    elapsed = time.monotonic() - started
+    # Let frames still inside the switch drain
+    time.sleep(0.5)
+    received = rx_packets(rx_interface) - received_before
+    return {"sent": sent, "received": received, "seconds": round(elapsed, 3),
+            "pps": round(received / elapsed, 1), "frame_bytes": len(frame)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure packet forwarding between two interfaces (needs root)")
+    parser.add_argument("--tx", required=True, help="interface to send frames into")
+    parser.add_argument("--rx", required=True, help="interface the forwarded frames come out of")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--size", type=int, default=64, help="frame size in bytes")
+    args = parser.parse_args()
+
+    print(json.dumps(measure(args.tx, args.rx, args.seconds, args.size)))
@@ -0,0 +1,177 @@
+import contextlib
+import fcntl
+import glob
+import hashlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+from smartedge_installer.constants import CACHE_DIR
+from smartedge_installer.utils.logger import get_logger
+from smartedge_installer.utils.runner import query, run_command
+
+logger = get_logger("BuildCache")
+
+
+def compiler_version(compiler="gcc"):
+    try:
+        result = query([compiler, "-dumpfullversion", "-dumpversion"], check=True)
+        return f"{compiler}-{result.stdout.strip()}"
+    except (subprocess.SubprocessError, FileNotFoundError):
+        return f"{compiler}-unknown"
+
+
+def os_release():
+    release = platform.freedesktop_os_release()
+    return f"{release.get('ID', 'linux')}-{release.get('VERSION_ID', '')}-{platform.machine()}"
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@contextlib.contextmanager
+def cache_lock(path):
+    """Exclusive lock on a cache entry; hosts sharing one cache directory (NFS, USB stick) must not build it twice"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class BuildCache:
+    """Content-addressed store of packed install trees, keyed by the build inputs"""
+
+    def __init__(self, name, cache_dir=None):
+        self.name = name
+        self.directory = os.path.join(cache_dir or CACHE_DIR, "builds", name)
+
+    def key(self, inputs):
+        encoded = json.dumps(inputs, sort_keys=True).encode()
+        return hashlib.sha256(encoded).hexdigest()[:32]
+
+    def artifact_path(self, key):
+        return os.path.join(self.directory, f"{key}.tar.gz")
+
+    def metadata_path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def has(self, key):
+        return os.path.exists(self.artifact_path(key)) and os.path.exists(self.metadata_path(key))
+
+    def find(self, **inputs):
+        """Return the newest cached entry whose inputs include all of the given values"""
+        matches = []
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            try:
+                with open(path) as f:
+                    metadata = json.load(f)
+            except (OSError, ValueError):
+                continue
+            cached = metadata.get("inputs", {})
+            if all(cached.get(name) == value for name, value in inputs.items()):
+                matches.append((metadata.get("created", ""), metadata))
+        if not matches:
+            return None
+        return max(matches, key=lambda match: match[0])[1]
+
+    def store(self, key, staging_dir, inputs, build=None):
+        os.makedirs(self.directory, exist_ok=True)
+        # Write to a temporary name first so a shared cache never exposes half-written artifacts
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=f".{key}.", suffix=".tmp")
+        os.close(fd)
+        metadata_tmp = None
+        try:
+            # Pack the top-level entries rather than "." so restoring never touches the mode of /
+            entries = sorted(os.listdir(staging_dir))
+            run_command(["tar", "-czf", tmp_path, "--owner=0", "--group=0", "--numeric-owner",
+                         "-C", staging_dir] + entries, "tar")
+            metadata = {
+                "name": self.name,
+                "inputs": inputs,
+                "sha256": file_sha256(tmp_path),
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                # How the artifact was built (jobs, per-target seconds, compiler cache hits)
+                "build": build,
+            }
+            fd, metadata_tmp = tempfile.mkstemp(dir=self.directory, prefix=f".{key}.", suffix=".json.tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(metadata, f, indent=2)
+            os.chmod(metadata_tmp, 0o644)
+            # Concurrent stores of one key (parallel hosts on a shared cache) publish the artifact and its
+            # metadata as a pair
+            with cache_lock(self.artifact_path(key)):
+                os.replace(tmp_path, self.artifact_path(key))
+                os.replace(metadata_tmp, self.metadata_path(key))
+        except BaseException:
+            # Neither temp file may be left behind in the shared cache directory
+            for path in (tmp_path, metadata_tmp):
+                if path and os.path.exists(path):
+                    os.remove(path)
+            raise
+        logger.info(f"📦 Cached {self.name} build as {self.artifact_path(key)}")
+
+    def members(self, key):
+        """(files, dirs) the cached artifact would install, relative to the destination"""
+        result = run_command(["tar", "-tzf", self.artifact_path(key)], "tar", capture=True, level=None)
+        entries = [entry.removeprefix("./") for entry in result.stdout.splitlines() if entry.strip("./")]
+        return ([entry for entry in entries if not entry.endswith("/")],
+                [entry.rstrip("/") for entry in entries if entry.endswith("/")])
+
+    def restore(self, key, dest="/"):
+        if not self.has(key):
+            return False
+        artifact = self.artifact_path(key)
+        with open(self.metadata_path(key)) as f:
+            metadata = json.load(f)
+        if file_sha256(artifact) != metadata.get("sha256"):
+            logger.warning(f"⚠️ Cached {self.name} artifact {artifact} is corrupt. Ignoring it.")
+            return False
+
+        logger.info(f"♻️  Restoring cached {self.name} build from {artifact}")
+        run_command(["sudo", "tar", "-xzf", artifact, "--no-same-owner", "--no-overwrite-dir", "-C", dest], "tar")
+        run_command(["sudo", "ldconfig"], "ldconfig")
+        return True
+
+
+def install_staging_dir(staging_dir, dest="/"):
+    entries = sorted(os.listdir(staging_dir))
+    # The packer only produces the byte stream the (logged) extracting tar reads
+    packer = subprocess.Popen(["tar", "-cf", "-", "-C", staging_dir] + entries, stdout=subprocess.PIPE)
+    run_command(["sudo", "tar", "-xf", "-", "--no-same-owner", "--no-overwrite-dir", "-C", dest], "tar",
+                stdin=packer.stdout)
+    packer.stdout.close()
+    if packer.wait() != 0:
+        raise subprocess.CalledProcessError(packer.returncode, packer.args)
+    run_command(["sudo", "ldconfig"], "ldconfig")
+
+
+def staged_paths(staging_dir):
+    """(files, dirs) of a staging tree, relative to it, as install_staging_dir() would install them"""
+    files, dirs = [], []
+    for directory, subdirs, names in os.walk(staging_dir):
+        relative = os.path.relpath(directory, staging_dir)
+        for name in subdirs:
+            path = os.path.normpath(os.path.join(relative, name))
+            # Symlinked directories are installed as links, i.e. like files
+            (files if os.path.islink(os.path.join(directory, name)) else dirs).append(path)
+        files.extend(os.path.normpath(os.path.join(relative, name)) for name in names)
+    return files, dirs
+
+
+def make_staging_dir(name):
+    return tempfile.mkdtemp(prefix=f"smartedge-{name}-")
+
+
+def remove_staging_dir(path):
+    shutil.rmtree(path, ignore_errors=True)
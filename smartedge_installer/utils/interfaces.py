@@ -0,0 +1,425 @@
+import glob
+import json
+import os
+import shutil
+import socket
+import subprocess
+import time
+
+try:
+    from pyroute2 import IPRoute
+    from pyroute2.netlink.exceptions import NetlinkError
+except ImportError:  # pyroute2 is only guaranteed inside the SmartEdge venv
+    IPRoute = None
+    NetlinkError = OSError
+
+SYS_CLASS_NET = "/sys/class/net"
+IFF_UP = 0x1
+LOOPBACK_LABEL = "lo:0"
+# Persistent configuration: udev renames by these .link files at boot (with networkd, NetworkManager or
+# netplan alike), and a oneshot unit re-adds the loopback alias before the network comes up
+NETWORK_CONFIG_DIR = "/etc/systemd/network"
+SYSTEMD_UNIT_DIR = "/etc/systemd/system"
+LINK_FILE_PREFIX = "10-smartedge-"
+LOOPBACK_UNIT = "smartedge-loopback.service"
+# udev and network managers react to renames asynchronously; how long to wait for the links to settle
+CONVERGE_TIMEOUT = 10.0
+
+
+class Link:
+    def __init__(self, index, name, mac, up, operstate, kind=None, permanent_mac=None):
+        self.index = index
+        self.name = name
+        self.mac = mac
+        # The burned-in address; virtual devices (VLANs, bridges) that copy the MAC have none
+        self.permanent_mac = permanent_mac
+        self.up = up
+        self.operstate = operstate
+        self.kind = kind
+        # Not part of the netlink message, but sysfs is a plain read (no fork)
+        self.wireless = os.path.isdir(os.path.join(SYS_CLASS_NET, name, "wireless")) or \
+            os.path.exists(os.path.join(SYS_CLASS_NET, name, "phy80211"))
+        driver = os.path.join(SYS_CLASS_NET, name, "device", "driver")
+        self.driver = os.path.basename(os.readlink(driver)) if os.path.islink(driver) else kind
+
+    def describe(self):
+        kind = "wireless" if self.wireless else (self.driver or "virtual")
+        return f"{self.name:<16} {self.mac or '-':<18} {kind:<12} {self.operstate.lower()}"
+
+
+def _require_pyroute2():
+    if IPRoute is None:
+        raise RuntimeError("Interface management needs pyroute2; run it with the SmartEdge venv's python")
+
+
+def _link_from_message(message):
+    info = message.get_attr("IFLA_LINKINFO")
+    return Link(
+        index=message["index"],
+        name=message.get_attr("IFLA_IFNAME"),
+        mac=(message.get_attr("IFLA_ADDRESS") or "").lower() or None,
+        up=bool(message["flags"] & IFF_UP),
+        operstate=message.get_attr("IFLA_OPERSTATE") or "UNKNOWN",
+        kind=info.get_attr("IFLA_INFO_KIND") if info else None,
+        permanent_mac=(message.get_attr("IFLA_PERM_ADDRESS") or "").lower() or None,
+    )
+
+
+def list_links(ipr=None, include_loopback=False):
+    """Every interface with its MAC, driver, wireless flag and state, from a single netlink dump"""
+    _require_pyroute2()
+    if ipr is None:
+        with IPRoute() as ipr:
+            return list_links(ipr, include_loopback)
+    links = [_link_from_message(message) for message in ipr.get_links()]
+    return [link for link in links if include_loopback or not link.name.startswith("lo")]
+
+
+def list_interfaces():
+    """Return {name: mac} for every non-loopback interface"""
+    return {link.name: link.mac for link in list_links()}
+
+
+def find_interface_by_mac(mac, links=None):
+    mac = mac.lower()
+    for link in links if links is not None else list_links():
+        if link.mac == mac:
+            return link.name
+    return None
+
+
+def loopback_alias_present(ipr, address):
+    lo_index = ipr.link_lookup(ifname="lo")[0]
+    return any(message.get_attr("IFA_ADDRESS") == address
+               for message in ipr.get_addr(family=socket.AF_INET, index=lo_index))
+
+
+class InterfaceChanges:
+    """Interface renames and the loopback alias, applied together and rolled back together"""
+
+    def __init__(self):
+        self.renames = {}
+        # {name: Link} to keep across reboots, whether or not it is renamed now
+        self.pins = {}
+        self.loopback_alias = None
+        self.removed_alias = None
+        # What apply() actually changed, as {"renames": {new: old}, "loopback_alias": address or None}
+        self.applied = None
+
+    def rename(self, current, new):
+        if current != new:
+            self.renames[current] = new
+
+    def pin(self, name, link):
+        self.pins[name] = link
+
+    def add_loopback_alias(self, address):
+        self.loopback_alias = address
+
+    def remove_loopback_alias(self, address):
+        self.removed_alias = address
+
+    def __bool__(self):
+        return bool(self.renames or self.loopback_alias or self.removed_alias)
+
+    def apply(self):
+        _require_pyroute2()
+        undo = []
+        with IPRoute() as ipr:
+            try:
+                self._apply(ipr, undo)
+            except (NetlinkError, LookupError):
+                for action in reversed(undo):
+                    try:
+                        action(ipr)
+                    except NetlinkError:
+                        pass
+                raise
+
+    def _apply(self, ipr, undo):
+        links = {link.name: link for link in list_links(ipr)}
+        for current, new in self.renames.items():
+            if current not in links:
+                raise LookupError(f"No interface named '{current}'")
+            if new in links and new not in self.renames:
+                raise LookupError(f"'{new}' already exists and is not being renamed")
+
+        def set_link(link, **changes):
+            ipr.link("set", index=link.index, **changes)
+
+        # Rename through temporary names first, so swaps (eth0 <-> wlan0) cannot collide
+        for current in self.renames:
+            link = links[current]
+            set_link(link, state="down")
+            undo.append(lambda ipr, link=link: set_link(link, state="up" if link.up else "down"))
+            set_link(link, ifname=f"se-tmp{link.index}")
+            undo.append(lambda ipr, link=link: set_link(link, ifname=link.name))
+        for current, new in self.renames.items():
+            link = links[current]
+            set_link(link, ifname=new)
+            undo.append(lambda ipr, link=link: set_link(link, ifname=f"se-tmp{link.index}"))
+            set_link(link, state="up")
+            undo.append(lambda ipr, link=link: set_link(link, state="down"))
+
+        if self.loopback_alias and not loopback_alias_present(ipr, self.loopback_alias):
+            lo_index = ipr.link_lookup(ifname="lo")[0]
+            ipr.addr("add", index=lo_index, address=self.loopback_alias, prefixlen=32, label=LOOPBACK_LABEL)
+            undo.append(lambda ipr: ipr.addr("del", index=lo_index, address=self.loopback_alias, prefixlen=32))
+            alias_added = True
+        elif self.loopback_alias:
+            print(f"Loopback alias {self.loopback_alias}/32 is already configured.")
+            alias_added = False
+
+        if self.removed_alias and loopback_alias_present(ipr, self.removed_alias):
+            lo_index = ipr.link_lookup(ifname="lo")[0]
+            ipr.addr("del", index=lo_index, address=self.removed_alias, prefixlen=32)
+            undo.append(lambda ipr: ipr.addr("add", index=lo_index, address=self.removed_alias, prefixlen=32,
+                                             label=LOOPBACK_LABEL))
+            print(f"✅ Loopback alias {self.removed_alias}/32 removed.")
+
+        for current, new in self.renames.items():
+            print(f"✅ Interface '{current}' renamed to '{new}'.")
+        if self.loopback_alias and alias_added:
+            print(f"✅ Loopback alias {LOOPBACK_LABEL} configured with {self.loopback_alias}/32.")
+        self.applied = {"renames": {new: current for current, new in self.renames.items()},
+                        "loopback_alias": self.loopback_alias if self.loopback_alias and alias_added else None}
+
+
+def plan_by_mac(changes, macs, links=None):
+    """Add renames for {new_name: mac} to changes"""
+    links = links if links is not None else list_links()
+    for new_name, mac in macs.items():
+        current = find_interface_by_mac(mac, links)
+        if current is None:
+            raise LookupError(f"No interface with MAC address {mac} (wanted for '{new_name}')")
+        if current == new_name:
+            print(f"✅ '{new_name}' ({mac}) is already named correctly.")
+        changes.rename(current, new_name)
+
+
+def prompt_for_renames(changes, names, links=None):
+    """Ask which interface should get each of names; returns False on an invalid selection"""
+    available = links if links is not None else list_links()
+    if not available:
+        print("❌ No usable interfaces found.")
+        return False
+    for new_name in names:
+        print("\n📡 Available interfaces:")
+        for i, link in enumerate(available, start=1):
+            print(f"{i}. {link.describe()}")
+        try:
+            selected = int(input(f"\nPlease select which interface to use as '{new_name}': "))
+            if selected < 1:
+                raise IndexError(selected)
+            link = available[selected - 1]
+        except (IndexError, ValueError):
+            print("❌ Invalid selection.")
+            return False
+        changes.rename(link.name, new_name)
+        available = [other for other in available if other is not link]
+    return True
+
+
+def pin_names(changes, names, links):
+    """Pin each of names this run renames an interface to; a name the kernel or udev gave stays theirs"""
+    by_name = {link.name: link for link in links}
+    for current, new in changes.renames.items():
+        if new in names and current in by_name:
+            changes.pin(new, by_name[current])
+
+
+def link_file_path(name):
+    return os.path.join(NETWORK_CONFIG_DIR, f"{LINK_FILE_PREFIX}{name}.link")
+
+
+def loopback_unit_path():
+    return os.path.join(SYSTEMD_UNIT_DIR, LOOPBACK_UNIT)
+
+
+def link_file_content(name, link):
+    # Matching the permanent MAC keeps VLANs and bridges that share the address from being renamed too
+    match = f"PermanentMACAddress={link.permanent_mac}" if link.permanent_mac else f"MACAddress={link.mac}"
+    return (f"# Written by the SmartEdge installer: keeps the name {name} across reboots\n"
+            f"[Match]\n{match}\n\n[Link]\nName={name}\n")
+
+
+def loopback_unit_content(address):
+    ip = shutil.which("ip") or "/usr/sbin/ip"
+    return (f"# Written by the SmartEdge installer: adds the loopback alias at boot\n"
+            f"[Unit]\nDescription=SmartEdge loopback alias {address}/32\nDefaultDependencies=no\n"
+            f"Before=network-pre.target\nWants=network-pre.target\n\n"
+            f"[Service]\nType=oneshot\nRemainAfterExit=yes\n"
+            f"ExecStart={ip} address replace {address}/32 dev lo label {LOOPBACK_LABEL}\n"
+            f"ExecStop=-{ip} address del {address}/32 dev lo\n\n"
+            f"[Install]\nWantedBy=multi-user.target\n")
+
+
+def systemd_running():
+    return os.path.isdir("/run/systemd/system")
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _write(path, content):
+    """Write path if its content differs; returns whether it changed"""
+    if _read(path) == content:
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        f.write(content)
+    os.replace(path + ".tmp", path)
+    return True
+
+
+def _refresh_boot_config(link_files_changed):
+    subprocess.run(["systemctl", "daemon-reload"], check=True)
+    if link_files_changed:
+        subprocess.run(["udevadm", "control", "--reload"], check=False)
+        # The initramfs carries its own copy of the .link files and renames interfaces before the root mounts
+        if shutil.which("update-initramfs"):
+            print("🔄 Updating the initramfs with the new .link files...")
+            subprocess.run(["update-initramfs", "-u"], check=False, stdout=subprocess.DEVNULL)
+
+
+def persist_interfaces(pins, loopback_alias):
+    """Write the .link files for {name: Link} and the loopback alias unit; returns the files created"""
+    wanted = {link_file_path(name): link_file_content(name, link) for name, link in pins.items()}
+    created = [path for path in wanted if not os.path.exists(path)]
+    link_files_changed = False
+    for path, content in wanted.items():
+        link_files_changed |= _write(path, content)
+    # A name pinned earlier to one of these interfaces would compete with its new name
+    macs = {address for link in pins.values() for address in (link.mac, link.permanent_mac) if address}
+    for path in glob.glob(os.path.join(NETWORK_CONFIG_DIR, f"{LINK_FILE_PREFIX}*.link")):
+        content = _read(path) or ""
+        if path not in wanted and any(mac in content.lower() for mac in macs):
+            os.remove(path)
+            link_files_changed = True
+    if loopback_alias:
+        unit = loopback_unit_path()
+        if not os.path.exists(unit):
+            created.append(unit)
+        _write(unit, loopback_unit_content(loopback_alias))
+    _refresh_boot_config(link_files_changed)
+    if loopback_alias:
+        subprocess.run(["systemctl", "enable", "--quiet", LOOPBACK_UNIT], check=True)
+    for name in pins:
+        print(f"✅ '{name}' is kept across reboots by {link_file_path(name)}.")
+    if loopback_alias:
+        print(f"✅ Loopback alias {loopback_alias}/32 is added at boot by {LOOPBACK_UNIT}.")
+    return created
+
+
+def remove_persistent_config(paths):
+    """Undo persist_interfaces() for the files it created"""
+    if loopback_unit_path() in paths and os.path.exists(loopback_unit_path()):
+        subprocess.run(["systemctl", "disable", "--quiet", LOOPBACK_UNIT], check=False)
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+            print(f"✅ Removed {path}.")
+    if paths and systemd_running():
+        _refresh_boot_config(any(path.endswith(".link") for path in paths))
+
+
+def convergence_problems(pins, loopback_alias, persistent):
+    """What differs between the wanted and the live (and, if persistent, the boot) configuration"""
+    problems = []
+    with IPRoute() as ipr:
+        links = {link.name: link for link in list_links(ipr)}
+        for name, pinned in pins.items():
+            link = links.get(name)
+            if link is None:
+                problems.append(f"no interface is named '{name}'")
+            elif link.index != pinned.index:
+                problems.append(f"'{name}' is {link.mac}, expected {pinned.mac}")
+            elif not link.up:
+                # Only renamed links are pinned, and _apply brings every one of them up
+                problems.append(f"'{name}' is down")
+        if loopback_alias and not loopback_alias_present(ipr, loopback_alias):
+            problems.append(f"loopback alias {loopback_alias}/32 is missing")
+    if persistent:
+        for name, pinned in pins.items():
+            if _read(link_file_path(name)) != link_file_content(name, pinned):
+                problems.append(f"{link_file_path(name)} is missing or outdated")
+        if loopback_alias and _read(loopback_unit_path()) != loopback_unit_content(loopback_alias):
+            problems.append(f"{loopback_unit_path()} is missing or outdated")
+    return problems
+
+
+def wait_until_converged(pins, loopback_alias, persistent, timeout=CONVERGE_TIMEOUT):
+    deadline = time.monotonic() + timeout
+    while True:
+        problems = convergence_problems(pins, loopback_alias, persistent)
+        if not problems or time.monotonic() >= deadline:
+            return problems
+        time.sleep(0.2)
+
+
+def configure_interfaces(names, macs=None, loopback_alias=None, record=None, prompt=True):
+    """Entry point shared by the prompt scripts: pick interfaces (by MAC or interactively), apply and persist
+
+    Interfaces renamed to one of names are pinned to it with a .link file.
+    record: file to write what was changed to, so revert_interfaces() can undo it later.
+    """
+    print("\n🔧 Detecting network interfaces...")
+    changes = InterfaceChanges()
+    links = list_links()
+    try:
+        if macs:
+            plan_by_mac(changes, macs, links)
+        elif prompt and not prompt_for_renames(changes, names, links):
+            print("❌ Nothing was changed.")
+            raise SystemExit(1)
+        pin_names(changes, names, links)
+        if loopback_alias:
+            changes.add_loopback_alias(loopback_alias)
+        if changes:
+            changes.apply()
+    except (NetlinkError, LookupError) as e:
+        print(f"❌ Failed to configure interfaces ({e}). All changes were rolled back.")
+        raise SystemExit(1)
+
+    applied = changes.applied or {"renames": {}, "loopback_alias": None}
+    persistent = systemd_running()
+    if persistent:
+        try:
+            applied["files"] = persist_interfaces(changes.pins, loopback_alias)
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"⚠️ Could not write the boot configuration ({e}); the changes last until the next reboot.")
+            persistent = False
+    else:
+        print("⚠️ systemd is not running here; the changes last until the next reboot.")
+    if record:
+        with open(record, "w") as f:
+            json.dump(applied, f, indent=2)
+
+    problems = wait_until_converged(changes.pins, loopback_alias, persistent)
+    if problems:
+        print(f"❌ The network configuration did not converge: {'; '.join(problems)}.")
+        raise SystemExit(1)
+    print("✅ Network configuration converged.")
+
+
+def revert_interfaces(record):
+    """Undo the changes written to record by configure_interfaces(), in one transaction"""
+    with open(record) as f:
+        applied = json.load(f)
+    changes = InterfaceChanges()
+    for new, old in applied.get("renames", {}).items():
+        changes.rename(new, old)
+    if applied.get("loopback_alias"):
+        changes.remove_loopback_alias(applied["loopback_alias"])
+    try:
+        if changes:
+            changes.apply()
+    except (NetlinkError, LookupError) as e:
+        print(f"❌ Failed to restore interfaces ({e}). Nothing was changed.")
+        raise SystemExit(1)
+    remove_persistent_config(applied.get("files", []))
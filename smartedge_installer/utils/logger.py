@@ -1,25 +1,125 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import socket
 import sys
+import threading
+import time
+from smartedge_installer.constants import LOG_DIR
+
+LOG_LEVEL = os.environ.get("SMARTEDGE_LOG_LEVEL", "DEBUG").upper()
+LOG_FILE_MAX_BYTES = 10 * 2**20
+LOG_FILE_BACKUPS = 3
+# Run logs older than the newest KEEP_RUN_LOGS are deleted when a new run starts
+KEEP_RUN_LOGS = 20
+CONSOLE_FORMAT = '[%(asctime)s] %(levelname)s - %(name)s: %(message)s'
+HOSTNAME = socket.gethostname()
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per record, so logs from a whole fleet can be grepped and aggregated"""
+
+    def __init__(self, run_id=None):
+        super().__init__()
+        self.run_id = run_id
+
+    def format(self, record):
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+            "host": HOSTNAME,
+            "run": self.run_id,
+        }
+        # Set by utils.runner: the tag of the command whose output this is, and its pid
+        for key in ("stream", "pid"):
+            if hasattr(record, key):
+                entry[key] = getattr(record, key)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+# Loggers only put records on a queue; one listener thread does the (slow) console and file I/O,
+# so parallel steps never block on each other's output
+_queue = queue.SimpleQueue()
+_queue_handler = logging.handlers.QueueHandler(_queue)
+_console = logging.StreamHandler(sys.stdout)
+_console.setFormatter(logging.Formatter(CONSOLE_FORMAT, datefmt='%Y-%m-%d %H:%M:%S'))
+_console.setLevel(LOG_LEVEL)
+_listener = logging.handlers.QueueListener(_queue, _console, respect_handler_level=True)
+_listener_lock = threading.Lock()
+_listener_started = False
+
+
+def _start_listener():
+    global _listener_started
+    with _listener_lock:
+        if not _listener_started:
+            _listener.start()
+            # Flush everything still queued before the interpreter exits
+            atexit.register(_listener.stop)
+            _listener_started = True
+
 
 def get_logger(name: str) -> logging.Logger:
     logger = logging.getLogger(name)
 
     if not logger.handlers:
+        _start_listener()
         logger.setLevel(logging.DEBUG)
-
-        # Console handler
-        ch = logging.StreamHandler(sys.stdout)
-        ch.setLevel(logging.DEBUG)
-
-        # Formatter
-        formatter = logging.Formatter(
-            '[%(asctime)s] %(levelname)s - %(name)s: %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
-        ch.setFormatter(formatter)
-        logger.addHandler(ch)
+        logger.addHandler(_queue_handler)
 
         # Prevent propagation to root logger
         logger.propagate = False
 
     return logger
+
+
+def flush():
+    """Wait until every queued record is written, e.g. before printing a table or prompting"""
+    with _listener_lock:
+        if _listener_started:
+            # stop() drains the queue and joins the listener thread
+            _listener.stop()
+            _listener.start()
+
+
+def set_level(level):
+    """Console log level (the run log file always records everything)"""
+    _console.setLevel(level.upper() if isinstance(level, str) else level)
+
+
+def _run_started(name):
+    # run-<Role>-<YYYYmmdd>-<HHMMSS>-<pid>.jsonl: order by start time, whatever the role
+    return name.split("-")[2:4]
+
+
+def _prune_run_logs(directory):
+    runs = sorted((name for name in os.listdir(directory) if name.startswith("run-") and name.endswith(".jsonl")),
+                  key=_run_started)
+    for name in runs[:-KEEP_RUN_LOGS]:
+        for path in (os.path.join(directory, name),
+                     *(os.path.join(directory, f"{name}.{i}") for i in range(1, LOG_FILE_BACKUPS + 1))):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def start_run_log(role, directory=LOG_DIR):
+    """Also write every record of this run to a rotating JSON-lines file; returns its path"""
+    os.makedirs(directory, exist_ok=True)
+    run_id = f"{role}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+    path = os.path.join(directory, f"run-{run_id}.jsonl")
+    handler = logging.handlers.RotatingFileHandler(path, maxBytes=LOG_FILE_MAX_BYTES,
+                                                   backupCount=LOG_FILE_BACKUPS, encoding="utf-8")
+    handler.setFormatter(JsonLinesFormatter(run_id))
+    handler.setLevel(logging.DEBUG)
+    _listener.handlers = _listener.handlers + (handler,)
+    _prune_run_logs(directory)
+    return path
+
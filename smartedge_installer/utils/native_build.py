@@ -0,0 +1,113 @@
+import contextlib
+import os
+import shutil
+import time
+from smartedge_installer.constants import CACHE_DIR
+from smartedge_installer.utils.logger import get_logger
+from smartedge_installer.utils.runner import query, run_command
+
+logger = get_logger("NativeBuild")
+
+CCACHE_DIR = os.path.join(CACHE_DIR, "ccache")
+CCACHE_MAX_SIZE = os.environ.get("SMARTEDGE_CCACHE_SIZE", "5G")
+# Forces a job count instead of deriving it from cores and memory
+BUILD_JOBS = os.environ.get("SMARTEDGE_BUILD_JOBS")
+
+
+def available_memory_mb():
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return None
+
+
+def build_jobs(memory_per_job_mb):
+    """Parallel compile jobs: one per usable core, as long as each gets memory_per_job_mb of free RAM"""
+    if BUILD_JOBS:
+        return max(1, int(BUILD_JOBS))
+    cores = len(os.sched_getaffinity(0))
+    memory = available_memory_mb()
+    if memory is None:
+        return cores
+    # Swapping compilers are far slower than fewer parallel ones
+    return max(1, min(cores, memory // memory_per_job_mb))
+
+
+def ccache_env(base_dir):
+    """Environment that routes gcc/g++ through ccache (autotools via CC/CXX, CMake via compiler launchers)"""
+    if not shutil.which("ccache"):
+        return {}
+    os.makedirs(CCACHE_DIR, exist_ok=True)
+    return {
+        "CCACHE_DIR": CCACHE_DIR,
+        "CCACHE_MAXSIZE": CCACHE_MAX_SIZE,
+        # Paths below base_dir are hashed relative to it, so a fresh checkout elsewhere still hits
+        "CCACHE_BASEDIR": base_dir,
+        "CCACHE_NOHASHDIR": "1",
+        # Checkouts and generated headers are always newer than the cache entries
+        "CCACHE_SLOPPINESS": "include_file_mtime,include_file_ctime,time_macros",
+        "CC": "ccache gcc",
+        "CXX": "ccache g++",
+        "CMAKE_C_COMPILER_LAUNCHER": "ccache",
+        "CMAKE_CXX_COMPILER_LAUNCHER": "ccache",
+    }
+
+
+def ccache_stats():
+    """(hits, misses) of the compiler cache so far, or None without ccache"""
+    if not shutil.which("ccache"):
+        return None
+    result = query(["ccache", "--print-stats"], env=dict(os.environ, CCACHE_DIR=CCACHE_DIR))
+    if result.returncode != 0:
+        return None
+    stats = dict(line.split("\t", 1) for line in result.stdout.splitlines() if "\t" in line)
+    hits = sum(int(stats.get(name, 0)) for name in ("direct_cache_hit", "preprocessed_cache_hit"))
+    return hits, int(stats.get("cache_miss", 0))
+
+
+class NativeBuild:
+    """Compile one project from source: shared job count, compiler cache and per-target timings"""
+
+    def __init__(self, name, source_dir, memory_per_job_mb=1024):
+        self.name = name
+        self.source_dir = source_dir
+        self.jobs = build_jobs(memory_per_job_mb)
+        self.env = dict(os.environ, MAKEFLAGS=f"-j{self.jobs}", **ccache_env(source_dir))
+        self.timings = {}
+        self._stats_before = ccache_stats()
+        logger.info(f"🔨 Building {self.name} with {self.jobs} job(s)"
+                    + (" and ccache" if "CCACHE_DIR" in self.env else ""))
+
+    @contextlib.contextmanager
+    def target(self, label):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.timings[label] = round(time.monotonic() - started, 3)
+            logger.info(f"⏱️  {self.name} {label}: {self.timings[label]:.1f}s")
+
+    def run(self, label, command, cwd=None, env=None):
+        """Run one build target (configure, make, install, ...) with the build environment"""
+        with self.target(label):
+            run_command(command, self.name, progress="make", cwd=cwd or self.source_dir,
+                        env=dict(self.env, **(env or {})))
+
+    def make(self, label, *targets, cwd=None):
+        self.run(label, ["make", f"-j{self.jobs}"] + list(targets), cwd=cwd)
+
+    def summary(self):
+        summary = {"jobs": self.jobs, "targets": self.timings, "seconds": round(sum(self.timings.values()), 3)}
+        after = ccache_stats()
+        if self._stats_before and after:
+            summary["ccache_hits"] = after[0] - self._stats_before[0]
+            summary["ccache_misses"] = after[1] - self._stats_before[1]
+        targets = ", ".join(f"{label} {seconds:.1f}s" for label, seconds in self.timings.items())
+        cached = (f"; ccache {summary['ccache_hits']} hits / {summary['ccache_misses']} misses"
+                  if "ccache_hits" in summary else "")
+        logger.info(f"🔨 {self.name} built in {summary['seconds']:.1f}s ({targets}){cached}")
+        return summary
@@ -0,0 +1,198 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from smartedge_installer.constants import REPORTS_DIR
+from smartedge_installer.utils.logger import get_logger
+from smartedge_installer.utils.runner import command_history
+
+try:
+    import psutil
+except ImportError:  # psutil is only guaranteed inside the SmartEdge venv
+    psutil = None
+
+logger = get_logger("RunProfiler")
+
+SAMPLE_INTERVAL = float(os.environ.get("SMARTEDGE_PROFILE_INTERVAL", "1.0"))
+METRICS = ("cpu_seconds", "net_rx_bytes", "net_tx_bytes", "disk_read_bytes", "disk_write_bytes")
+
+
+def _read_net_bytes():
+    rx = tx = 0
+    try:
+        with open("/proc/net/dev") as f:
+            for line in f.readlines()[2:]:
+                name, _, data = line.partition(":")
+                if name.strip() == "lo":
+                    continue
+                fields = data.split()
+                rx += int(fields[0])
+                tx += int(fields[8])
+    except OSError:
+        pass
+    return rx, tx
+
+
+def _read_disk_bytes():
+    read = written = 0
+    try:
+        # Only whole block devices, so partitions are not counted twice
+        disks = {name for name in os.listdir("/sys/block") if not name.startswith(("loop", "ram"))}
+        with open("/proc/diskstats") as f:
+            for line in f:
+                fields = line.split()
+                if fields[2] in disks:
+                    read += int(fields[5]) * 512
+                    written += int(fields[9]) * 512
+    except OSError:
+        pass
+    return read, written
+
+
+def _read_cpu_and_rss():
+    # Own CPU plus reaped children, plus whatever live subprocesses (apt, make, docker) have used so far
+    times = os.times()
+    cpu = times.user + times.system + times.children_user + times.children_system
+    rss = 0
+    if psutil is not None:
+        try:
+            process = psutil.Process()
+            rss = process.memory_info().rss
+            for child in process.children(recursive=True):
+                try:
+                    child_times = child.cpu_times()
+                    cpu += child_times.user + child_times.system
+                    rss += child.memory_info().rss
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    continue
+        except psutil.Error:
+            pass
+    return cpu, rss
+
+
+def _read_counters():
+    cpu, rss = _read_cpu_and_rss()
+    rx, tx = _read_net_bytes()
+    disk_read, disk_write = _read_disk_bytes()
+    return {
+        "cpu_seconds": cpu, "net_rx_bytes": rx, "net_tx_bytes": tx,
+        "disk_read_bytes": disk_read, "disk_write_bytes": disk_write, "rss_bytes": rss,
+    }
+
+
+class RunProfiler:
+    """Times every step and samples CPU, network and disk usage while it runs"""
+
+    def __init__(self, role, interval=SAMPLE_INTERVAL):
+        self.role = role
+        self.interval = interval
+        self.steps = {}
+        self.samples = []
+        self._active = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._started_wall = time.time()
+        self._started = time.monotonic()
+        self._last = _read_counters()
+        self._last_time = self._started
+
+    def start(self):
+        self._thread = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self._sample()
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        with self._lock:
+            now = time.monotonic()
+            counters = _read_counters()
+            delta = {metric: max(0, counters[metric] - self._last[metric]) for metric in METRICS}
+            # Usage in an interval is shared evenly between the steps that were running in it
+            if self._active:
+                share = 1.0 / len(self._active)
+                for name in self._active:
+                    record = self.steps[name]
+                    for metric in METRICS:
+                        record[metric] += delta[metric] * share
+                    record["peak_rss_bytes"] = max(record["peak_rss_bytes"], counters["rss_bytes"])
+            self.samples.append({
+                "t": round(now - self._started, 3),
+                "interval": round(now - self._last_time, 3),
+                "active": sorted(self._active),
+                **{metric: delta[metric] for metric in METRICS},
+                "rss_bytes": counters["rss_bytes"],
+            })
+            self._last = counters
+            self._last_time = now
+
+    @contextlib.contextmanager
+    def step(self, name):
+        self._sample()
+        with self._lock:
+            record = {
+                "name": name, "status": "running",
+                "start": round(time.monotonic() - self._started, 3), "duration": None,
+                "peak_rss_bytes": 0, **{metric: 0.0 for metric in METRICS},
+            }
+            self.steps[name] = record
+            self._active.add(name)
+        try:
+            yield record
+            if record["status"] == "running":
+                record["status"] = "ok"
+        except BaseException:
+            record["status"] = "failed"
+            raise
+        finally:
+            self._sample()
+            with self._lock:
+                self._active.discard(name)
+                record["duration"] = round(time.monotonic() - self._started - record["start"], 3)
+
+    def report(self):
+        return {
+            "role": self.role,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self._started_wall)),
+            "duration": round(time.monotonic() - self._started, 3),
+            "process_tree_sampling": psutil is not None,
+            "steps": list(self.steps.values()),
+            "samples": self.samples,
+            "commands": command_history(since=self._started_wall),
+        }
+
+    def write_report(self, directory=REPORTS_DIR):
+        report = self.report()
+        os.makedirs(directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self._started_wall))
+        base = os.path.join(directory, f"run-{self.role}-{stamp}")
+        with open(base + ".json", "w") as f:
+            json.dump(report, f, indent=2)
+        # Folded stacks (one "role;step milliseconds" line each) feed straight into flamegraph.pl
+        with open(base + ".folded", "w") as f:
+            for record in report["steps"]:
+                f.write(f"{self.role};{record['name']} {int((record['duration'] or 0) * 1000)}\n")
+        logger.info(f"📊 Run report written to {base}.json")
+        return base + ".json"
+
+    def summary_table(self):
+        header = f"{'Step':<24} {'Status':<8} {'Time (s)':>9} {'CPU (s)':>8} {'Net RX (MB)':>12} {'Disk W (MB)':>12}"
+        lines = [header, "-" * len(header)]
+        for record in sorted(self.steps.values(), key=lambda r: r["start"]):
+            lines.append(
+                f"{record['name']:<24} {record['status']:<8} {record['duration'] or 0:>9.1f} "
+                f"{record['cpu_seconds']:>8.1f} {record['net_rx_bytes'] / 2**20:>12.1f} "
+                f"{record['disk_write_bytes'] / 2**20:>12.1f}"
+            )
+        lines.append("-" * len(header))
+        lines.append(f"{'Total wall-clock':<24} {'':<8} {time.monotonic() - self._started:>9.1f}")
+        return "\n".join(lines)
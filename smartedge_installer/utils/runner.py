@@ -0,0 +1,369 @@
+import collections
+import logging
+import os
+import re
+import shlex
+import signal
+import subprocess
+import threading
+import time
+from smartedge_installer.utils.logger import get_logger
+
+logger = get_logger("Runner")
+
+# Limits for commands that download (apt, pip, docker pull, git fetch); 0 disables them
+NETWORK_TIMEOUT = float(os.environ.get("SMARTEDGE_NETWORK_TIMEOUT", "3600"))
+# A download that prints nothing for this long is considered hung
+STALL_TIMEOUT = float(os.environ.get("SMARTEDGE_STALL_TIMEOUT", "600"))
+NETWORK_RETRIES = int(os.environ.get("SMARTEDGE_NETWORK_RETRIES", "2"))
+# run_command(..., **NETWORK_POLICY) for anything that downloads
+NETWORK_POLICY = {"timeout": NETWORK_TIMEOUT, "stall_timeout": STALL_TIMEOUT, "retries": NETWORK_RETRIES}
+# Inspection commands (docker inspect, dpkg-query, ...) that should answer at once
+QUERY_TIMEOUT = 60
+RETRY_BACKOFF = 5.0
+# Progress lines are logged at most this often per command
+PROGRESS_INTERVAL = 2.0
+TAIL_LINES = 20
+KILL_GRACE = 10
+
+_history = collections.deque(maxlen=5000)
+_history_lock = threading.Lock()
+
+
+class CommandTimeout(subprocess.TimeoutExpired):
+    """The command ran past its timeout, or printed nothing for its stall timeout"""
+
+    def __init__(self, cmd, timeout, reason, output=None):
+        super().__init__(cmd, timeout, output)
+        self.reason = reason
+
+    def __str__(self):
+        return f"Command '{describe(self.cmd)}' {self.reason}"
+
+
+class CommandResult(subprocess.CompletedProcess):
+    def __init__(self, args, returncode, stdout=None, stderr=None, seconds=0.0, attempts=1):
+        super().__init__(args, returncode, stdout, stderr)
+        self.seconds = seconds
+        self.attempts = attempts
+
+
+def describe(command, limit=120):
+    text = command if isinstance(command, str) else shlex.join(str(arg) for arg in command)
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+class ProgressParser:
+    """Turns a tool's output lines into short progress messages (None when a line says nothing new)"""
+
+    def feed(self, line):
+        return None
+
+
+class AptProgress(ProgressParser):
+    SUMMARY = re.compile(r"(\d+) upgraded, (\d+) newly installed")
+
+    def __init__(self):
+        self.total = None
+        self.fetched = 0
+        self.set_up = 0
+
+    def feed(self, line):
+        match = self.SUMMARY.match(line)
+        if match:
+            self.total = int(match.group(1)) + int(match.group(2))
+            return f"{self.total} package(s) to install"
+        if line.startswith("Get:"):
+            self.fetched += 1
+            return f"downloaded {self.fetched}/{self.total}" if self.total else f"fetched {self.fetched} file(s)"
+        if line.startswith("Setting up "):
+            self.set_up += 1
+            return f"set up {self.set_up}/{self.total or '?'}: {line.split()[2]}"
+        return None
+
+
+class PipProgress(ProgressParser):
+    DOWNLOAD = re.compile(r"\s*Downloading (\S+) \(([\d.]+ [kMG]?B)\)")
+
+    def __init__(self):
+        self.collected = 0
+
+    def feed(self, line):
+        if line.startswith("Collecting "):
+            self.collected += 1
+            return f"resolving {self.collected}: {line.split()[1]}"
+        match = self.DOWNLOAD.match(line)
+        if match:
+            return f"downloading {match.group(1).rsplit('/', 1)[-1]} ({match.group(2)})"
+        if line.startswith("Installing collected packages:"):
+            return f"installing {len(line.split(':', 1)[1].split(','))} package(s)"
+        if line.startswith("Successfully installed"):
+            return f"installed {len(line.split()) - 2} package(s)"
+        return None
+
+
+class DockerPullProgress(ProgressParser):
+    def __init__(self):
+        self.layers = set()
+        self.complete = set()
+
+    def feed(self, line):
+        layer, _, status = line.partition(": ")
+        if status in ("Pulling fs layer", "Waiting", "Already exists"):
+            self.layers.add(layer)
+        if status in ("Pull complete", "Already exists") and layer not in self.complete:
+            self.complete.add(layer)
+            return f"{len(self.complete)}/{len(self.layers)} layers"
+        return None
+
+
+class MakeProgress(ProgressParser):
+    # CMake prints "[ 45%] Building ..."; automake's silent rules print "  CXX  file.lo"
+    PERCENT = re.compile(r"^\[\s*(\d+)%\]")
+    COMPILE = re.compile(r"^\s*(CC|CXX)\s+\S")
+
+    def __init__(self):
+        self.compiled = 0
+
+    def feed(self, line):
+        match = self.PERCENT.match(line)
+        if match:
+            return f"{match.group(1)}%"
+        if self.COMPILE.match(line):
+            self.compiled += 1
+            return f"compiled {self.compiled} file(s)"
+        return None
+
+
+PROGRESS_PARSERS = {
+    "apt": AptProgress,
+    "pip": PipProgress,
+    "docker": DockerPullProgress,
+    "make": MakeProgress,
+}
+
+
+class _Output:
+    """Line sink shared by a command's stdout/stderr reader threads"""
+
+    def __init__(self, tag, pid, level, parser, on_line, capture):
+        self.log = get_logger(tag)
+        self.extra = {"stream": tag, "pid": pid}
+        self.level = level
+        self.parser = parser
+        self.on_line = on_line
+        self.captured = {"stdout": [], "stderr": []} if capture else None
+        self.tail = collections.deque(maxlen=TAIL_LINES)
+        self.last_output = time.monotonic()
+        self._progress = None
+        self._progress_logged_at = 0.0
+        self._lock = threading.Lock()
+
+    def line(self, stream, line):
+        with self._lock:
+            self.last_output = time.monotonic()
+            if self.captured is not None:
+                self.captured[stream].append(line)
+            line = line.rstrip()
+            if not line:
+                return
+            self.tail.append(line)
+            # Whole lines, each tagged with the command and its pid: parallel commands never interleave mid-line
+            if self.level is not None:
+                self.log.log(self.level, line, extra=self.extra)
+            if self.on_line is not None:
+                self.on_line(line)
+            message = self.parser.feed(line) if self.parser else None
+            if message:
+                self._progress = message
+                if self.last_output - self._progress_logged_at >= PROGRESS_INTERVAL:
+                    self.flush_progress()
+
+    def flush_progress(self):
+        if self._progress:
+            self.log.info(f"⏳ {self._progress}", extra=self.extra)
+            self._progress = None
+            self._progress_logged_at = time.monotonic()
+
+    def text(self, stream):
+        if self.captured is None:
+            return None
+        return "\n".join(self.captured[stream]) + ("\n" if self.captured[stream] else "")
+
+
+def _read_lines(pipe, stream, output):
+    with pipe:
+        for line in pipe:
+            output.line(stream, line.rstrip("\n"))
+
+
+def _write_input(pipe, data):
+    try:
+        with pipe:
+            pipe.write(data)
+    except BrokenPipeError:
+        pass
+
+
+def _descendants(pid):
+    children = collections.defaultdict(list)
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The process name may contain spaces and parentheses; the fields after it do not
+                ppid = int(f.read().rpartition(")")[2].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children[ppid].append(int(entry))
+    found, stack = [], [pid]
+    while stack:
+        for child in children.get(stack.pop(), []):
+            found.append(child)
+            stack.append(child)
+    return found
+
+
+def _terminate(process):
+    """SIGTERM the command and everything it started, then SIGKILL what is left"""
+    # Processes sudo started as root cannot be signalled from here, but sudo relays SIGTERM to them
+    pids = _descendants(process.pid) + [process.pid]
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        for pid in pids:
+            try:
+                os.kill(pid, sig)
+            except (ProcessLookupError, PermissionError):
+                pass
+        try:
+            process.wait(timeout=KILL_GRACE)
+            if sig == signal.SIGTERM:
+                pids = [pid for pid in pids if os.path.exists(f"/proc/{pid}")]
+        except subprocess.TimeoutExpired:
+            pass
+
+
+def _run_once(command, tag, timeout, stall_timeout, capture, input, level, progress, on_line, interactive, kwargs):
+    popen = dict(kwargs)
+    if input is not None:
+        popen["stdin"] = subprocess.PIPE
+    if not interactive:
+        popen.setdefault("stdout", subprocess.PIPE)
+        # Captured stdout is kept apart from stderr, so callers parse only what they asked for
+        merge = not capture and popen["stdout"] == subprocess.PIPE
+        popen.setdefault("stderr", subprocess.STDOUT if merge else subprocess.PIPE)
+    if input is not None or not interactive:
+        popen.update(text=True, errors="replace")
+
+    started = time.monotonic()
+    process = subprocess.Popen(command, **popen)
+    parser_cls = PROGRESS_PARSERS.get(progress or tag)
+    output = _Output(tag, process.pid, level, parser_cls() if parser_cls else None, on_line, capture)
+    threads = []
+    for stream in ("stdout", "stderr"):
+        pipe = getattr(process, stream)
+        if pipe is not None:
+            threads.append(threading.Thread(target=_read_lines, args=(pipe, stream, output), daemon=True,
+                                            name=f"{tag}-{stream}"))
+    if input is not None:
+        threads.append(threading.Thread(target=_write_input, args=(process.stdin, input), daemon=True))
+    for thread in threads:
+        thread.start()
+
+    timed_out = None
+    if not timeout and not (stall_timeout and threads):
+        returncode = process.wait()
+    else:
+        while True:
+            try:
+                returncode = process.wait(timeout=0.5)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+            now = time.monotonic()
+            if timeout and now - started > timeout:
+                timed_out = f"did not finish within {timeout:.0f}s"
+            elif stall_timeout and threads and now - output.last_output > stall_timeout:
+                timed_out = f"printed nothing for {stall_timeout:.0f}s"
+            if timed_out:
+                _terminate(process)
+                returncode = process.returncode
+                break
+    # A daemon the command left behind (screen -dm, ...) may hold the pipes open; do not wait for it
+    for thread in threads:
+        thread.join(timeout=KILL_GRACE)
+    output.flush_progress()
+    seconds = time.monotonic() - started
+    return CommandResult(command, returncode, output.text("stdout"), output.text("stderr"), seconds), output, timed_out
+
+
+def run_command(command, tag="cmd", check=True, timeout=None, stall_timeout=None, retries=0,
+                retry_delay=RETRY_BACKOFF, capture=False, input=None, level=logging.DEBUG, progress=None,
+                on_line=None, interactive=False, **kwargs):
+    """Run a command, streaming each output line into the log under tag, and record its exit code and timing
+
+    capture keeps stdout (and stderr) as text on the result; level=None runs quietly; progress picks a parser
+    from PROGRESS_PARSERS (default: the tag's); interactive leaves the terminal to the command (prompts).
+    Failures and timeouts are retried `retries` times with a doubling delay. Returns a CommandResult.
+    """
+    log = get_logger(tag)
+    attempts = retries + 1
+    total = 0.0
+    for attempt in range(1, attempts + 1):
+        result, output, timed_out = _run_once(command, tag, timeout, stall_timeout, capture, input, level,
+                                              progress, on_line, interactive, kwargs)
+        total += result.seconds
+        failed = timed_out or result.returncode != 0
+        if failed and attempt < attempts:
+            delay = retry_delay * 2 ** (attempt - 1)
+            reason = timed_out or f"exited with {result.returncode}"
+            log.warning(f"⚠️ {describe(command)} {reason}; retrying in {delay:.0f}s (attempt {attempt + 1}/{attempts})")
+            time.sleep(delay)
+            continue
+        break
+
+    result.seconds = total
+    result.attempts = attempt
+    _record(command, tag, result, timed_out)
+    if level is not None:
+        log.debug(f"⏱️ {describe(command)} exited with {result.returncode} in {total:.1f}s"
+                  + (f" after {attempt} attempts" if attempt > 1 else ""), extra=output.extra)
+    if timed_out:
+        if level is not None:
+            log.error(f"❌ {describe(command)} {timed_out}; stopped it.", extra=output.extra)
+        raise CommandTimeout(command, timeout or stall_timeout, timed_out, "\n".join(output.tail))
+    if check and result.returncode != 0:
+        # The last lines usually say what went wrong; show them even when the console level hides DEBUG.
+        # Quiet commands (level=None) leave them to the caller, in the exception.
+        if level is not None:
+            for line in output.tail:
+                log.error(line, extra=output.extra)
+        raise subprocess.CalledProcessError(result.returncode, command,
+                                            output=result.stdout if capture else "\n".join(output.tail),
+                                            stderr=result.stderr)
+    return result
+
+
+def query(command, timeout=QUERY_TIMEOUT, **kwargs):
+    """Quietly run an inspection command and return its result (stdout captured, failures not raised)"""
+    kwargs.setdefault("check", False)
+    return run_command(command, kwargs.pop("tag", "query"), timeout=timeout, capture=True, level=None, **kwargs)
+
+
+def _record(command, tag, result, timed_out):
+    with _history_lock:
+        _history.append({
+            "tag": tag,
+            "command": describe(command),
+            "returncode": result.returncode,
+            "seconds": round(result.seconds, 3),
+            "attempts": result.attempts,
+            "timed_out": bool(timed_out),
+            "finished": time.time(),
+        })
+
+
+def command_history(since=None):
+    """Every command run in this process (newest last), or only those finished after since (time.time())"""
+    with _history_lock:
+        return [entry for entry in _history if since is None or entry["finished"] >= since]
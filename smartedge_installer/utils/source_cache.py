@@ -0,0 +1,209 @@
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+from smartedge_installer.constants import CACHE_DIR
+from smartedge_installer.utils.build_cache import cache_lock
+from smartedge_installer.utils.logger import get_logger
+from smartedge_installer.utils.runner import NETWORK_TIMEOUT, QUERY_TIMEOUT, query, run_command
+
+logger = get_logger("SourceCache")
+
+SOURCES_DIR = os.path.join(CACHE_DIR, "sources")
+FETCH_RETRIES = int(os.environ.get("SMARTEDGE_FETCH_RETRIES", "4"))
+RETRY_BACKOFF = 5.0
+SHA_PATTERN = re.compile(r"^[0-9a-f]{40}$")
+# Fetched revisions are kept under their own namespace so gc never drops them
+LOCAL_REF_PREFIX = "refs/smartedge/"
+# git aborts a transfer that stays below 1 KB/s for a minute, instead of hanging on a dead connection
+LOW_SPEED_ARGS = ["-c", "http.lowSpeedLimit=1000", "-c", "http.lowSpeedTime=60"]
+
+
+def _git(*args, capture=False, check=True, **kwargs):
+    result = run_command(["git"] + list(args), "git", check=check, capture=capture, **kwargs)
+    return result.stdout.strip() if capture else result
+
+
+def clone_into(source, dest, origin):
+    """Working clone of source in dest, which may already hold untracked files; origin becomes the remote"""
+    if os.path.isdir(dest) and os.listdir(dest):
+        # git clone refuses a non-empty directory: move a clone's .git in and check out around the files there
+        tmp = dest.rstrip("/") + ".clone"
+        shutil.rmtree(tmp, ignore_errors=True)
+        _git("clone", "--quiet", "--no-checkout", source, tmp)
+        os.rename(os.path.join(tmp, ".git"), os.path.join(dest, ".git"))
+        shutil.rmtree(tmp)
+        _git("-C", dest, "reset", "--quiet", "--hard")
+    else:
+        _git("clone", "--quiet", source, dest)
+    _git("-C", dest, "remote", "set-url", "origin", origin)
+
+
+def _cache_name(url):
+    base = url.rstrip("/").rsplit("/", 1)[-1]
+    if base.endswith(".git"):
+        base = base[:-4]
+    return f"{base}-{hashlib.sha256(url.encode()).hexdigest()[:12]}"
+
+
+def _resolve_url(base_url, url):
+    # .gitmodules may use URLs relative to the superproject's remote
+    if not url.startswith(("../", "./")):
+        return url
+    parts = base_url.rstrip("/").split("/")
+    for segment in url.split("/"):
+        if segment == "..":
+            parts.pop()
+        elif segment not in (".", ""):
+            parts.append(segment)
+    return "/".join(parts)
+
+
+class SourceCache:
+    """Bare mirror of one upstream git repository; clones are made from it instead of the network"""
+
+    def __init__(self, url, cache_dir=SOURCES_DIR):
+        self.url = url
+        self.name = _cache_name(url)
+        self.path = os.path.join(cache_dir, self.name + ".git")
+        # A git bundle next to the mirror (e.g. on the USB stick) seeds it without any network access
+        self.seed_bundle = os.path.join(cache_dir, self.name + ".bundle")
+
+    def _git(self, *args, **kwargs):
+        return _git("-C", self.path, *args, **kwargs)
+
+    def _init(self):
+        if os.path.isdir(self.path):
+            return
+        tmp = self.path + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        if os.path.exists(self.seed_bundle):
+            logger.info(f"🌱 Seeding the {self.name} mirror from {self.seed_bundle}...")
+            _git("bundle", "verify", "--quiet", self.seed_bundle)
+            _git("clone", "--mirror", "--quiet", self.seed_bundle, tmp)
+            _git("-C", tmp, "remote", "set-url", "origin", self.url)
+        else:
+            _git("init", "--quiet", "--bare", tmp)
+            _git("-C", tmp, "remote", "add", "origin", self.url)
+        # Branches and tags only: a pruning fetch must not drop the refs/smartedge/ revisions
+        _git("-C", tmp, "config", "--replace-all", "remote.origin.fetch", "+refs/heads/*:refs/heads/*")
+        _git("-C", tmp, "config", "--add", "remote.origin.fetch", "+refs/tags/*:refs/tags/*")
+        # Lets clones (and submodule updates) fetch any commit of the mirror by its hash
+        _git("-C", tmp, "config", "uploadpack.allowAnySHA1InWant", "true")
+        os.rename(tmp, self.path)
+
+    def _local_ref(self, ref):
+        return LOCAL_REF_PREFIX + re.sub(r"[^A-Za-z0-9._/-]", "_", ref)
+
+    def resolve(self, ref):
+        """Commit the mirror already has for ref, without touching the network"""
+        if not os.path.isdir(self.path):
+            return None
+        for candidate in (self._local_ref(ref), ref, f"refs/tags/{ref}", f"refs/heads/{ref}"):
+            result = query(["git", "-C", self.path, "rev-parse", "--verify", "--quiet", f"{candidate}^{{commit}}"])
+            if result.returncode == 0:
+                return result.stdout.strip()
+        return None
+
+    def _fetch_with_retries(self, args):
+        # Objects from earlier successful fetches stay in the mirror, so a retry only
+        # transfers what is still missing
+        _git(*LOW_SPEED_ARGS, "-C", self.path, "fetch", "--quiet", *args, timeout=NETWORK_TIMEOUT,
+             retries=FETCH_RETRIES - 1, retry_delay=RETRY_BACKOFF)
+
+    def _verify(self, commit):
+        self._git("fsck", "--connectivity-only", "--no-dangling", "--no-progress", commit)
+
+    def fetch(self, ref, depth=1, pinned=False):
+        """Make ref available in the mirror and return its commit
+
+        Commit hashes and pinned refs (release tags) that are already mirrored need no network.
+        """
+        pinned = pinned or bool(SHA_PATTERN.match(ref))
+        with cache_lock(self.path):
+            self._init()
+            if pinned:
+                commit = self.resolve(ref)
+                if commit:
+                    logger.info(f"✅ {self.name} {ref} is already in the source cache.")
+                    return commit
+
+            logger.info(f"📥 Fetching {ref} of {self.url} into the source cache...")
+            is_commit = bool(SHA_PATTERN.match(ref))
+            depth_args = [f"--depth={depth}"] if depth else []
+            self._fetch_with_retries(depth_args + ["origin", ref if is_commit else f"+{ref}:{self._local_ref(ref)}"])
+            if is_commit:
+                self._git("update-ref", self._local_ref(ref), ref)
+            commit = self._git("rev-parse", f"{self._local_ref(ref)}^{{commit}}", capture=True)
+            if is_commit and commit != ref:
+                raise RuntimeError(f"{self.url}: fetched {commit} but expected {ref}")
+            self._verify(commit)
+            return commit
+
+    def update(self):
+        """Fetch every branch and tag, for working clones that keep following upstream"""
+        with cache_lock(self.path):
+            self._init()
+            args = ["--prune", "origin"]
+            if os.path.exists(os.path.join(self.path, "shallow")):
+                args.insert(0, "--unshallow")
+            logger.info(f"📥 Updating the source cache of {self.url}...")
+            self._fetch_with_retries(args)
+            # Check out the same default branch as upstream does
+            try:
+                head = _git(*LOW_SPEED_ARGS, "ls-remote", "--symref", self.url, "HEAD", capture=True, check=False,
+                            timeout=QUERY_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                head = None
+            match = re.match(r"ref: (refs/heads/\S+)\s+HEAD", head or "")
+            if match:
+                self._git("symbolic-ref", "HEAD", match.group(1))
+            self._verify("HEAD")
+
+    def checkout(self, ref, dest, submodules=False, depth=1, pinned=False):
+        """Check out ref (and optionally its submodules) in dest, a new or existing clone"""
+        commit = self.fetch(ref, depth, pinned)
+        if not os.path.exists(os.path.join(dest, ".git")):
+            os.makedirs(dest, exist_ok=True)
+            _git("init", "--quiet", dest)
+            _git("-C", dest, "remote", "add", "origin", self.url)
+        has_commit = query(["git", "-C", dest, "cat-file", "-e", f"{commit}^{{commit}}"]).returncode == 0
+        if not has_commit:
+            depth_args = [f"--depth={depth}"] if depth else []
+            _git("-C", dest, "fetch", "--quiet", "--no-tags", *depth_args, f"file://{self.path}", commit)
+        _git("-C", dest, "checkout", "--quiet", "--force", "--detach", commit)
+
+        if submodules:
+            self._checkout_submodules(dest, commit)
+        return commit
+
+    def _checkout_submodules(self, dest, commit):
+        if not os.path.exists(os.path.join(dest, ".gitmodules")):
+            return
+        paths = _git("-C", dest, "config", "-f", ".gitmodules", "--get-regexp", r"^submodule\..*\.path$",
+                     capture=True, check=False)
+        for line in (paths or "").splitlines():
+            key, path = line.split(" ", 1)
+            name = key[len("submodule."):-len(".path")]
+            url = _git("-C", dest, "config", "-f", ".gitmodules", f"submodule.{name}.url", capture=True)
+            entry = _git("-C", dest, "ls-tree", commit, path, capture=True)
+            if not entry:
+                continue
+            submodule_commit = entry.split()[2]
+            SourceCache(_resolve_url(self.url, url)).checkout(submodule_commit, os.path.join(dest, path),
+                                                              submodules=True)
+
+    def clone(self, dest):
+        """Full working clone of the default branch that later pulls straight from upstream"""
+        try:
+            self.update()
+        except subprocess.SubprocessError:
+            if self.resolve("HEAD") is None:
+                raise
+            logger.warning(f"⚠️ Could not update the source cache of {self.url}; cloning the cached copy.")
+        clone_into(self.path, dest, self.url)
+
+    def export_bundle(self, path):
+        """Write the mirror as a git bundle, e.g. to seed the cache on the USB stick"""
+        self._git("bundle", "create", path, "--all")